@@ -0,0 +1,212 @@
+# Analítica de evaluaciones con NumPy: percentil y posición de cada empleado dentro
+# de su área y año, correlaciones entre competencias y estadísticas de distribución.
+#
+# Las columnas de puntaje se cargan una vez por versión de la tabla Colaboradores
+# (versiones_tablas) en arreglos columnares y todo se calcula con operaciones
+# vectorizadas sobre ellos. Los resultados se guardan en caché con la versión en la
+# clave, así que dejan de usarse en cuanto se escribe una evaluación. Se conservan los
+# arreglos de las últimas versiones (ANALYTICS_DATA_VERSIONS): con réplicas de lectura
+# en versiones distintas, alternar entre ellas no obliga a recargar la tabla.
+#
+# Requiere numpy (incluido en requirements.txt); si falta en la instalación, las rutas
+# /analytics/* responden 503.
+import threading
+import warnings
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from cache import AUSENTE, TTLCache
+
+CUANTILES = (0, 25, 50, 75, 100)
+
+
+def disponible():
+    return np is not None
+
+
+def _numero(valor, decimales=2):
+    # NaN (sin datos) se devuelve como null
+    return None if valor is None or np.isnan(valor) else round(float(valor), decimales)
+
+
+def rangos(valores):
+    # Rango promedio con empates (como scipy.stats.rankdata), para Spearman
+    orden = np.argsort(valores, kind='mergesort')
+    inversa = np.empty_like(orden)
+    inversa[orden] = np.arange(len(orden))
+    ordenados = valores[orden]
+    nuevos = np.r_[True, ordenados[1:] != ordenados[:-1]]
+    denso = nuevos.cumsum()[inversa]
+    limites = np.r_[np.flatnonzero(nuevos), len(nuevos)]
+    return 0.5 * (limites[denso] + limites[denso - 1] + 1)
+
+
+class DatosEvaluaciones:
+    def __init__(self, filas, competencias):
+        """`filas`: (cedula, nombre, anio, area, porcentaje, *competencias) ordenadas por
+        cédula, año y antigüedad, de modo que la última de cada (cédula, año) es la vigente."""
+        self.competencias = list(competencias)
+        columnas = list(zip(*filas)) or [()] * (5 + len(self.competencias))
+        self.cedula = np.array([c or 0 for c in columnas[0]], dtype=np.int64)
+        self.nombre = np.array(columnas[1], dtype=object)
+        self.anio = np.array([a or 0 for a in columnas[2]], dtype=np.int64)
+        self.areas, self.area = np.unique(np.array([a or '' for a in columnas[3]], dtype=str), return_inverse=True)
+        self.porcentaje = np.array(columnas[4], dtype=np.float64)
+        self.puntajes = np.array(columnas[5:], dtype=np.float64).T.reshape(len(self.cedula), len(self.competencias))
+
+        cambia = (self.cedula[1:] != self.cedula[:-1]) | (self.anio[1:] != self.anio[:-1])
+        self.vigente = np.r_[cambia, True] if len(self.cedula) else np.zeros(0, dtype=bool)
+        self._calcular_percentiles()
+
+    def _calcular_percentiles(self):
+        # Grupo = (área, año). Ordenando la clave grupo * escala + porcentaje, los
+        # empleados de un grupo quedan contiguos y ordenados por puntaje; searchsorted da
+        # cuántos tienen menos (y menos o igual) puntaje sin recorrer grupo por grupo
+        self.evaluados = np.flatnonzero(self.vigente & ~np.isnan(self.porcentaje))
+        puntaje = self.porcentaje[self.evaluados]
+        _, grupo = np.unique(np.stack([self.area[self.evaluados], self.anio[self.evaluados]], axis=1),
+                             axis=0, return_inverse=True)
+        grupo = grupo.reshape(-1)
+        escala = (np.abs(puntaje).max() + 1) * 2 if len(puntaje) else 1
+        clave = grupo * escala + puntaje
+        ordenadas = np.sort(clave)
+        menores = np.searchsorted(ordenadas, clave, 'left')
+        menores_o_iguales = np.searchsorted(ordenadas, clave, 'right')
+        inicio = np.searchsorted(ordenadas, grupo * escala - escala / 2, 'left')
+        self.total_grupo = np.bincount(grupo)[grupo] if len(grupo) else np.zeros(0, dtype=np.int64)
+        # Percentil de rango medio: los empates cuentan la mitad
+        self.percentil = (menores - inicio + 0.5 * (menores_o_iguales - menores)) / np.maximum(self.total_grupo, 1) * 100
+        # Posición de competencia: 1 + cuántos tienen un puntaje mayor
+        self.posicion = inicio + self.total_grupo - menores_o_iguales + 1
+
+    def mascara(self, anio=None, area=None):
+        mascara = np.ones(len(self.cedula), dtype=bool)
+        if anio:
+            mascara &= self.anio == anio
+        if area:
+            indice = np.searchsorted(self.areas, area)
+            if indice >= len(self.areas) or self.areas[indice] != area:
+                return np.zeros(len(self.cedula), dtype=bool)
+            mascara &= self.area == indice
+        return mascara
+
+    def __len__(self):
+        return len(self.cedula)
+
+
+def percentiles(datos, anio=None, area=None, cedula=None):
+    filas = datos.evaluados
+    seleccion = datos.mascara(anio, area)[filas]
+    if cedula:
+        seleccion &= datos.cedula[filas] == cedula
+    indices = np.flatnonzero(seleccion)
+    # Por área, año (el más reciente primero) y posición
+    indices = indices[np.lexsort((datos.posicion[indices], -datos.anio[filas[indices]], datos.area[filas[indices]]))]
+    return [
+        {
+            "cedula": int(datos.cedula[fila]),
+            "nombres_apellidos": datos.nombre[fila],
+            "area_jefe_pertenencia": datos.areas[datos.area[fila]] or None,
+            "anio": int(datos.anio[fila]),
+            "porcentaje_calificacion": _numero(datos.porcentaje[fila]),
+            "percentil": _numero(datos.percentil[i], 1),
+            "posicion": int(datos.posicion[i]),
+            "total": int(datos.total_grupo[i]),
+        }
+        for i, fila in zip(indices, filas[indices])
+    ]
+
+
+def correlaciones(datos, metodo='pearson', anio=None, area=None):
+    puntajes = datos.puntajes[datos.mascara(anio, area)]
+    puntajes = puntajes[~np.isnan(puntajes).any(axis=1)]
+    if metodo == 'spearman' and len(puntajes):
+        puntajes = np.column_stack([rangos(columna) for columna in puntajes.T])
+    if len(puntajes) < 2:
+        matriz = np.full((len(datos.competencias),) * 2, np.nan)
+    else:
+        # Una competencia sin variación no tiene correlación definida (null)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            matriz = np.corrcoef(puntajes, rowvar=False)
+    return {
+        "method": metodo,
+        "n": int(len(puntajes)),
+        "competencies": datos.competencias,
+        "matrix": [[_numero(valor, 4) for valor in fila] for fila in matriz],
+    }
+
+
+def distribucion(datos, anio=None, area=None):
+    mascara = datos.mascara(anio, area)
+    columnas = np.column_stack([datos.puntajes[mascara], datos.porcentaje[mascara]])
+    presentes = ~np.isnan(columnas)
+    with warnings.catch_warnings():
+        # nanmean y compañía avisan cuando una columna no tiene datos: se devuelve null
+        warnings.simplefilter('ignore', RuntimeWarning)
+        promedios = np.nanmean(columnas, axis=0)
+        desviaciones = np.nanstd(columnas, axis=0)
+        cuantiles = np.nanpercentile(columnas, CUANTILES, axis=0) if len(columnas) else np.full((len(CUANTILES), columnas.shape[1]), np.nan)
+
+    def resumen(j):
+        return {
+            "count": int(presentes[:, j].sum()),
+            "mean": _numero(promedios[j]),
+            "std": _numero(desviaciones[j]),
+            "min": _numero(cuantiles[0, j]),
+            "p25": _numero(cuantiles[1, j]),
+            "median": _numero(cuantiles[2, j]),
+            "p75": _numero(cuantiles[3, j]),
+            "max": _numero(cuantiles[4, j]),
+        }
+
+    competencias = []
+    for j, nombre in enumerate(datos.competencias):
+        valores = columnas[presentes[:, j], j].astype(np.int64)
+        conteos = np.bincount(valores) if len(valores) else np.zeros(0, dtype=np.int64)
+        competencias.append({
+            "name": nombre,
+            **resumen(j),
+            "histogram": {str(valor): int(n) for valor, n in enumerate(conteos) if n},
+        })
+
+    porcentajes = columnas[presentes[:, -1], -1]
+    conteos, bordes = np.histogram(porcentajes, bins=10, range=(0, 100))
+    return {
+        "totalEvaluations": int(mascara.sum()),
+        "competencies": competencias,
+        "porcentaje_calificacion": {
+            **resumen(columnas.shape[1] - 1),
+            "histogram": [
+                {"desde": int(desde), "hasta": int(hasta), "value": int(n)}
+                for desde, hasta, n in zip(bordes[:-1], bordes[1:], conteos)
+            ],
+        },
+    }
+
+
+class Analitica:
+    def __init__(self, maxsize=128, ttl=3600, versiones=2):
+        self._lock = threading.Lock()
+        self._datos = TTLCache(maxsize=versiones, ttl=ttl)
+        self._filas = 0
+        self.resultados = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def datos(self, version, cargar):
+        # Una sola carga por versión aunque lleguen varias peticiones a la vez
+        with self._lock:
+            datos = self._datos.get(version)
+            if datos is AUSENTE:
+                datos = cargar()
+                self._datos.set(version, datos)
+                self._filas = len(datos)
+            return datos
+
+    def calcular(self, version, clave, funcion, cargar):
+        """Resultado de `funcion(datos)` en caché para (versión, clave)."""
+        return self.resultados.get_or_load((version, *clave), lambda _: funcion(self.datos(version, cargar)))
+
+    def stats(self):
+        return {**self.resultados.stats(), "rows": self._filas, "data_versions": self._datos.stats()["size"]}
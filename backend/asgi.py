@@ -0,0 +1,228 @@
+# Punto de entrada ASGI (opcional; el despliegue por defecto sigue siendo wsgi.py):
+#   pip install -r requirements-asgi.txt
+#   uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 4
+#   gunicorn -k uvicorn.workers.UvicornWorker -c gunicorn.conf.py asgi:app
+#
+# Las rutas de lectura más consultadas durante el periodo de evaluación se atienden con
+# handlers async y un motor async de SQLAlchemy: mientras una consulta espera a MySQL
+# no ocupa un hilo, así la concurrencia queda acotada por el pool de conexiones y no
+# por el número de hilos. El resto de rutas se delega a la aplicación Flask a través
+# de a2wsgi. Las consultas, esquemas y caché de usuarios son los mismos de main.py, y
+# la caché se descarta igual que allí cuando otro proceso cambia la tabla de usuarios.
+#
+# Diferencias con las mismas rutas en Flask:
+# - Leen siempre de la primaria: el motor async no pasa por las réplicas de replicas.py
+#   (ninguna de estas rutas depende de leer lo recién escrito, así que no se pierde nada
+#   salvo el reparto de carga).
+# - No aparecen en las métricas HTTP de /metrics, que se toman en los hooks de Flask;
+#   sus consultas sí cuentan como consultas lentas (bajo la ruta "sin_ruta").
+# - El limitador no aplica, igual que en Flask: ninguna de ellas lleva @limitar. Las
+#   rutas que validan credenciales siguen en Flask.
+import logging
+import os
+
+from a2wsgi import WSGIMiddleware
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+from werkzeug.http import http_date, parse_date, parse_etags
+
+import main
+from config import opciones_motor
+from http_cache import en_utc, etag_para, no_modificado, politica_para
+from tokens import TokenInvalido
+
+DRIVERS_ASYNC = {
+    'mysql+mysqldb': 'mysql+asyncmy',
+    'mysql+pymysql': 'mysql+asyncmy',
+    'mysql': 'mysql+asyncmy',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def uri_async(uri):
+    esquema, resto = uri.split('://', 1)
+    return f"{DRIVERS_ASYNC.get(esquema, esquema)}://{resto}"
+
+
+flask_app = main.create_app()
+uri = flask_app.config['SQLALCHEMY_DATABASE_URI']
+engine = create_async_engine(os.getenv('ASYNC_DATABASE_URL') or uri_async(uri), **opciones_motor(uri))
+
+
+def respuesta_json(cuerpo, estado=200, encabezados=None):
+    # Mismo proveedor JSON que Flask para que ambos caminos devuelvan los mismos bytes
+    datos = flask_app.json.dumps(cuerpo, separators=(",", ":")) + "\n"
+    return Response(datos, status_code=estado, headers=encabezados, media_type='application/json')
+
+
+async def _cargar_usuario(cedula):
+    async with engine.connect() as conn:
+        fila = (await conn.execute(main.consulta_usuario(cedula))).first()
+    return main.UsuarioCacheado(*fila) if fila else None
+
+
+async def sincronizar_cache_usuarios():
+    if not main.version_usuarios.debe_revisar():
+        return
+    tablas = (main.Usuario.__tablename__,)
+    async with engine.connect() as conn:
+        filas = (await conn.execute(main.consulta_versiones(*tablas))).all()
+    version, _ = main.resumir_versiones(filas, tablas)
+    main.observar_version_usuarios(version)
+
+
+async def obtener_usuario(cedula):
+    try:
+        cedula = int(str(cedula).strip())
+    except (TypeError, ValueError):
+        return None
+    await sincronizar_cache_usuarios()
+    return await main.usuarios_cache.get_or_load_async(cedula, _cargar_usuario)
+
+
+def _identidad(encabezado):
+    # Puede recargar las revocaciones con el motor síncrono: se llama en un hilo aparte
+    with flask_app.app_context():
+        return main.identidad_de_encabezado(encabezado)
+
+
+async def _json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+async def user_info(request):
+    try:
+        if request.headers.get('authorization'):
+            identidad = await run_in_threadpool(_identidad, request.headers['authorization'])
+            if identidad:
+                return respuesta_json({"success": True, "name": identidad['nombre'], "role": identidad['rol']})
+
+        cedula = request.query_params.get('cedula')
+        if not cedula:
+            return respuesta_json({"success": False, "error": "Cédula es requerida"}, 400)
+
+        usuario = await obtener_usuario(cedula)
+
+        if usuario:
+            return respuesta_json({"success": True, "name": usuario.NOMBRE, "role": usuario.rol})
+        return respuesta_json({"success": False, "error": "Usuario no encontrado"}, 404)
+
+    except TokenInvalido as e:
+        return respuesta_json({"success": False, "error": str(e)}, 401)
+    except Exception as e:
+        logging.error(f"Error al obtener información del usuario: {str(e)}")
+        return respuesta_json({"success": False, "error": str(e)}, 500)
+
+
+async def validate_cedula(request):
+    try:
+        data = await _json(request)
+        if not data or 'cedula' not in data:
+            return respuesta_json({"error": "Se requiere la cédula"}, 400)
+
+        try:
+            cedula = int(data['cedula'])
+        except ValueError:
+            return respuesta_json({"error": "La cédula debe ser un número válido"}, 400)
+
+        user = await obtener_usuario(cedula)
+
+        if user:
+            return respuesta_json({"valid": True, **main.ESQUEMA_PERFIL_USUARIO.desde_objeto(user)})
+        return respuesta_json({"valid": False, "error": "Usuario no encontrado"}, 404)
+
+    except Exception as e:
+        logging.error(f"Error al validar la cédula: {str(e)}")
+        return respuesta_json({"error": "Error interno del servidor"}, 500)
+
+
+async def get_evaluation_history(request):
+    try:
+        data = await _json(request)
+        if not data or 'cedula' not in data:
+            return respuesta_json({"error": "Se requiere la cédula"}, 400)
+
+        async with engine.connect() as conn:
+            resultado = await conn.execute(main.consulta_historial_evaluaciones(data['cedula']))
+        history = [main.ESQUEMA_HISTORIAL_EVALUACIONES.serializar(fila) for fila in resultado]
+
+        return respuesta_json({"success": True, "history": history})
+    except Exception as e:
+        logging.error(f"Error al obtener el historial de evaluaciones: {str(e)}")
+        return respuesta_json({"error": "Error al obtener el historial de evaluaciones"}, 500)
+
+
+async def historial(request):
+    # ETag igual que el decorador condicional de la ruta Flask
+    tablas = (main.Evaluacion.__tablename__, main.Usuario.__tablename__)
+    async with engine.connect() as conn:
+        filas = (await conn.execute(main.consulta_versiones(*tablas))).all()
+    version, modificado = main.resumir_versiones(filas, tablas)
+    modificado = en_utc(modificado)
+    etag = etag_para(request.url.path, request.query_params.multi_items(), version)
+    encabezados = {"ETag": f'"{etag}"', "Cache-Control": politica_para(flask_app.config, '/historial')}
+    if modificado is not None:
+        encabezados["Last-Modified"] = http_date(modificado)
+    if no_modificado(etag, modificado, parse_etags(request.headers.get('if-none-match')),
+                     parse_date(request.headers.get('if-modified-since'))):
+        return Response(status_code=304, headers=encabezados)
+
+    try:
+        cedula = int(request.query_params.get('cedula', ''))
+    except ValueError:
+        cedula = None
+    if not cedula:
+        return respuesta_json({"error": "Se requiere la cédula del usuario"}, 400)
+
+    usuario = await obtener_usuario(cedula)
+    if not usuario:
+        return respuesta_json({"error": "Usuario no encontrado"}, 404)
+
+    if not main.puede_ver_historial(usuario):
+        return respuesta_json({"error": "No tienes permiso para ver el historial"}, 403)
+
+    async with engine.connect() as conn:
+        filas = await conn.execute(main.consulta_historial_area(usuario))
+    return respuesta_json(main.respuesta_historial(usuario, filas), 200, encabezados)
+
+
+async def get_employee_stats(request):
+    cedula = request.query_params.get('cedula')
+    if not cedula:
+        return respuesta_json({"error": "Se requiere la cédula del empleado"}, 400)
+
+    async with engine.connect() as conn:
+        filas = (await conn.execute(main.consulta_estadisticas_empleado(cedula))).all()
+
+    if not filas:
+        return respuesta_json({"error": "No se encontraron evaluaciones para este empleado"}, 404)
+
+    return respuesta_json(main.respuesta_estadisticas_empleado(filas))
+
+
+async def _cerrar_motor():
+    await engine.dispose()
+
+
+app = Starlette(
+    routes=[
+        Route('/user-info', user_info, methods=['GET']),
+        Route('/validate_cedula', validate_cedula, methods=['POST']),
+        Route('/get_evaluation_history', get_evaluation_history, methods=['POST']),
+        Route('/historial', historial, methods=['GET']),
+        Route('/get_employee_stats', get_employee_stats, methods=['GET']),
+        # Todo lo demás (escrituras, lecturas masivas, /metrics, ...) sigue en Flask
+        Mount('/', app=WSGIMiddleware(flask_app)),
+    ],
+    # Mismo CORS abierto que flask_cors en create_app()
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    on_shutdown=[_cerrar_motor],
+)
@@ -0,0 +1,309 @@
+# Prueba de carga y latencia de todas las rutas.
+#
+# Por defecto levanta la aplicación contra un SQLite local sembrado con data.json y
+# usuarios_data.json (multiplicados por --escala) y la sirve con el servidor WSGI
+# de werkzeug en un hilo. Con --url se usa un servidor ya en marcha (por ejemplo
+# gunicorn contra un MySQL local en Docker); en ese caso la base de datos debe estar
+# sembrada y NO debe ser la de producción, porque se ejecutan rutas de escritura.
+#
+#   python -m benchmarks.load_test --escala 10 --peticiones 200 --concurrencia 8
+#   python -m benchmarks.load_test --url http://localhost:5000 --rutas login,historial
+#   python -m benchmarks.load_test --rutas get_all --accept-encoding gzip
+import argparse
+import http.client
+import itertools
+import json
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlparse
+
+from werkzeug.serving import make_server
+
+from benchmarks.seed import BASE_CEDULAS_SINTETICAS, motor_sqlite, sembrar
+
+# Cédulas para usuarios creados durante la prueba, por encima de las sintéticas
+BASE_CEDULAS_PRUEBA = BASE_CEDULAS_SINTETICAS + 500_000_000
+
+
+class Cliente:
+    # Una conexión keep-alive por hilo
+    def __init__(self, url):
+        destino = urlparse(url)
+        self.host, self.port = destino.hostname, destino.port or 80
+        self._local = threading.local()
+
+    def _conexion(self):
+        if not hasattr(self._local, 'conexion'):
+            self._local.conexion = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        return self._local.conexion
+
+    def peticion(self, metodo, ruta, cuerpo=None, encabezados=None):
+        encabezados = dict(encabezados or {})
+        datos = None
+        if cuerpo is not None:
+            datos = json.dumps(cuerpo).encode()
+            encabezados['Content-Type'] = 'application/json'
+        for intento in range(2):
+            conexion = self._conexion()
+            try:
+                conexion.request(metodo, ruta, body=datos, headers=encabezados)
+                respuesta = conexion.getresponse()
+                contenido = respuesta.read()
+                return respuesta.status, contenido, dict(respuesta.getheaders())
+            except (http.client.HTTPException, ConnectionError):
+                conexion.close()
+                del self._local.conexion
+                if intento:
+                    raise
+
+
+def descubrir(cliente):
+    # Parámetros de prueba obtenidos de la misma API
+    _, cuerpo, _ = cliente.peticion('GET', '/get_all_users?' + urlencode({'fields': 'CEDULA,CARGO,LIDER'}))
+    usuarios = json.loads(cuerpo)['users']
+    _, cuerpo, _ = cliente.peticion('GET', '/get_all_evaluations?' + urlencode({'fields': 'cedula,area_jefe_pertenencia'}))
+    evaluaciones = json.loads(cuerpo)['evaluations']
+
+    lideres = Counter(u['LIDER'] for u in usuarios if u['LIDER'])
+    evaluados = Counter(e['cedula'] for e in evaluaciones)
+    jefes = [u['CEDULA'] for u in usuarios if (u['CARGO'] or '').startswith(('DIRECTOR', 'COORDINADOR'))]
+    # Instantánea completa de evaluaciones, si el servidor tiene alguna generada
+    estado, cuerpo, _ = cliente.peticion('GET', '/snapshots/manifest.json')
+    snapshot = json.loads(cuerpo)['conjuntos']['data']['archivo'] if estado == 200 else None
+    return {
+        'usuarios': [u['CEDULA'] for u in usuarios],
+        'evaluados': [cedula for cedula, _ in evaluados.most_common(50)],
+        'lideres': [cedula for cedula, _ in lideres.most_common(20)],
+        'jefes': jefes or [usuarios[0]['CEDULA']],
+        'area': evaluaciones[0]['area_jefe_pertenencia'] if evaluaciones else '',
+        'snapshot': snapshot,
+        'cursor': json.loads(cliente.peticion('GET', '/changes')[1])['cursor'],
+    }
+
+
+def evaluacion_de_prueba(cedula):
+    return {
+        'datos': {'nombres': 'PRUEBA DE CARGA', 'cedula': cedula, 'cargo': 'ANALISTA', 'jefe': 'JEFE',
+                  'area': 'Gestion Humana', 'cargoJefe': 'DIRECTOR'},
+        'valores': {'compromiso': 4, 'honestidad': 4, 'respeto': 3, 'sencillez': 4, 'servicio': 4,
+                    'trabajo_equipo': 3, 'conocimiento_trabajo': 4, 'productividad': 4, 'cumple_sistema_gestion': 4},
+        'acuerdos': {'colaborador_acuerdos': '', 'jefe_acuerdos': '', 'desarrollo_necesidades': '',
+                     'aspectos_positivos': ''},
+    }
+
+
+def escenarios(p, cliente):
+    ciclo = lambda valores: itertools.cycle(valores).__next__
+    usuario, evaluado, lider, jefe = ciclo(p['usuarios']), ciclo(p['evaluados']), ciclo(p['lideres']), ciclo(p['jefes'])
+    nuevos = itertools.count(BASE_CEDULAS_PRUEBA)
+    creados = []
+
+    def agregar_usuario():
+        cedula = next(nuevos)
+        creados.append(cedula)
+        return 'POST', '/add_user', {
+            'CEDULA': cedula, 'NOMBRE': 'PRUEBA', 'CARGO': 'ANALISTA', 'CENTRO_DE_COSTO': 'Gestion Humana',
+            'LIDER_EVALUADOR': 'JEFE', 'CARGO_DE_LIDER_EVALUADOR': 'DIRECTOR', 'ESTADO': 'Activo',
+            'CLAVE': str(cedula), 'SEGURIDAD': 'mascota:firulais', 'LIDER': str(p['lideres'][0]), 'rol': 'usuario',
+        }
+
+    def borrar_usuario():
+        cedula = creados.pop() if creados else next(nuevos)
+        return 'DELETE', f'/delete_user/{cedula}', None
+
+    def login():
+        cedula = usuario()
+        return 'POST', '/login', {'cedula': str(cedula), 'clave': str(cedula)}
+
+    def importar_usuarios():
+        # Siempre las mismas cédulas: la primera vez se insertan y después se actualizan
+        base = BASE_CEDULAS_PRUEBA + 1_000_000
+        return 'POST', '/import_users?format=json', [
+            {'CEDULA': base + i, 'NOMBRE': 'PRUEBA IMPORTADA', 'CARGO': 'ANALISTA',
+             'CENTRO_DE_COSTO': 'Gestion Humana', 'ESTADO': 'Activo', 'LIDER': str(p['lideres'][0])}
+            for i in range(100)
+        ], {'Authorization': f"Bearer {p['token_admin']}"} if p.get('token_admin') else None
+
+    def sesion():
+        # Los tokens de refresco sirven una sola vez: cada petición inicia una sesión nueva
+        # (fuera de la medición, que solo toma la petición que devuelve el generador)
+        cedula = usuario()
+        _, cuerpo, _ = cliente.peticion('POST', '/validate_user', {'username': cedula, 'password': str(cedula)})
+        return json.loads(cuerpo).get('refreshToken')
+
+    prefijos = ciclo(['A', 'GA', 'MAR', 'LOPEZ', 'JUAN CA', 'ñu'])
+
+    return {
+        '/': lambda: ('GET', '/', None),
+        '/login': login,
+        '/user-info': lambda: ('GET', f'/user-info?cedula={usuario()}', None),
+        '/validate_cedula': lambda: ('POST', '/validate_cedula', {'cedula': usuario()}),
+        '/validate_user': lambda: ('POST', '/validate_user', {'username': (c := usuario()), 'password': str(c)}),
+        '/get_user_role': lambda: ('POST', '/get_user_role', {'cedula': (c := usuario()), 'clave': str(c)}),
+        '/get_user_details': lambda: ('GET', f'/get_user_details?cedula={usuario()}', None),
+        '/get_security_question': lambda: ('POST', '/get_security_question', {'username': usuario()}),
+        '/verify_security_answer': lambda: ('POST', '/verify_security_answer',
+                                            {'username': usuario(), 'securityAnswer': 'firulais'}),
+        '/evaluaciones': lambda: ('GET', f'/evaluaciones?cedula={evaluado()}', None),
+        '/get_evaluation_history': lambda: ('POST', '/get_evaluation_history', {'cedula': evaluado()}),
+        '/get_employee_stats': lambda: ('GET', f'/get_employee_stats?cedula={evaluado()}', None),
+        '/get_employees_under_leader': lambda: ('GET', f'/get_employees_under_leader?cedula={lider()}', None),
+        '/get_area_members': lambda: ('GET', '/get_area_members?' + urlencode({'area': p['area']}), None),
+        '/historial': lambda: ('GET', f'/historial?cedula={jefe()}', None),
+        '/get_all_evaluations': lambda: ('GET', '/get_all_evaluations', None),
+        '/get_all_evaluations?limit': lambda: ('GET', '/get_all_evaluations?limit=500', None),
+        '/get_all_users': lambda: ('GET', '/get_all_users', None),
+        '/stats/summary': lambda: ('GET', '/stats/summary', None),
+        '/stats/areas': lambda: ('GET', '/stats/areas', None),
+        '/stats/years': lambda: ('GET', '/stats/years', None),
+        '/stats/competencies': lambda: ('GET', '/stats/competencies', None),
+        '/stats/distribution': lambda: ('GET', '/stats/distribution', None),
+        '/stats/top_performers': lambda: ('GET', '/stats/top_performers?por_area=1', None),
+        '/submit_evaluation': lambda: ('POST', '/submit_evaluation', evaluacion_de_prueba(evaluado())),
+        '/submit_evaluations/batch': lambda: ('POST', '/submit_evaluations/batch',
+                                              {'evaluaciones': [evaluacion_de_prueba(evaluado()) for _ in range(20)]}),
+        '/add_user': agregar_usuario,
+        '/update_user': lambda: ('PUT', f'/update_user/{p["usuarios"][-1]}', {'NOMBRE': 'PRUEBA ACTUALIZADA'}),
+        '/delete_user': borrar_usuario,
+        '/update_security_question': lambda: ('POST', '/update_security_question',
+                                              {'username': usuario(), 'securityQuestion': 'mascota',
+                                               'securityAnswer': 'firulais'}),
+        '/import_users': importar_usuarios,
+        # Solo un área para que los trabajos en segundo plano no dominen el resto de la prueba
+        '/exports': lambda: ('POST', '/exports', {'formato': 'csv', 'area': p['area']}),
+        '/exports?list': lambda: ('GET', '/exports', None),
+        '/refresh_token': lambda: ('POST', '/refresh_token', {'refreshToken': sesion()}),
+        '/logout': lambda: ('POST', '/logout', {'refreshToken': sesion()}),
+        '/users/search': lambda: ('GET', '/users/search?' + urlencode({'q': prefijos()}), None),
+        '/analytics/percentiles': lambda: ('GET', '/analytics/percentiles?' + urlencode({'area': p['area']}), None),
+        '/analytics/correlations': lambda: ('GET', '/analytics/correlations', None),
+        '/analytics/distribution': lambda: ('GET', '/analytics/distribution', None),
+        '/snapshots/manifest.json': lambda: ('GET', '/snapshots/manifest.json', None),
+        '/snapshots/<nombre>': lambda: ('GET', f"/snapshots/{p['snapshot'] or 'manifest.json'}", None),
+        # Un cliente al día (respuesta vacía) y uno que sincroniza desde el principio
+        '/changes': lambda: ('GET', '/changes?' + urlencode({'since': p['cursor']}), None),
+        '/changes?since=0.0': lambda: ('GET', '/changes?since=0.0', None),
+    }
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def medir_ruta(cliente, generar, peticiones, concurrencia, encabezados=None):
+    lock = threading.Lock()
+
+    def una():
+        with lock:
+            # El generador puede agregar encabezados propios de la ruta (Authorization)
+            metodo, ruta, cuerpo, *propios = generar()
+        propios = propios[0] if propios else None
+        inicio = time.perf_counter()
+        estado, contenido, _ = cliente.peticion(metodo, ruta, cuerpo, {**(encabezados or {}), **(propios or {})})
+        return (time.perf_counter() - inicio) * 1000, estado, len(contenido)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as ejecutor:
+        resultados = list(ejecutor.map(lambda _: una(), range(peticiones)))
+    duracion = time.perf_counter() - inicio
+
+    latencias = [latencia for latencia, _, _ in resultados]
+    return {
+        'peticiones': peticiones,
+        'errores': sum(1 for _, estado, _ in resultados if estado >= 500),
+        'estados': dict(Counter(estado for _, estado, _ in resultados)),
+        'rps': peticiones / duracion,
+        'p50': percentil(latencias, 50),
+        'p95': percentil(latencias, 95),
+        'p99': percentil(latencias, 99),
+        'max': max(latencias),
+        'bytes': int(statistics.mean(tamano for _, _, tamano in resultados)),
+    }
+
+
+def levantar_servidor(escala, ruta_db):
+    from main import create_app, db
+    from tokens import emisor_tokens
+
+    engine = motor_sqlite(ruta_db)
+    sembrar(engine, db.metadata, escala)
+    engine.dispose()
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{ruta_db}",
+        'SQLALCHEMY_ENGINE_OPTIONS': {'connect_args': {'timeout': 30, 'check_same_thread': False}},
+        # Se mide la aplicación, no el limitador: con él casi todo serían 429
+        'RATE_LIMIT_ENABLED': False,
+    })
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    servidor = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    # Token de administrador firmado por el mismo proceso, para las rutas protegidas
+    with app.app_context():
+        token_admin = emisor_tokens.emitir(0, app.config['ADMIN_ROLES'][0], 'PRUEBA DE CARGA')['token']
+    # Instantáneas para /snapshots/<nombre>, como las generaría el comando en producción
+    app.test_cli_runner().invoke(args=['generate-snapshots', '--forzar'])
+    return servidor, f"http://127.0.0.1:{servidor.server_port}", token_admin
+
+
+def imprimir(resultados):
+    print(f"\n{'ruta':<32}{'n':>6}{'5xx':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'bytes':>10}  estados")
+    for ruta, r in resultados.items():
+        estados = ' '.join(f"{estado}:{n}" for estado, n in sorted(r['estados'].items()))
+        print(f"{ruta:<32}{r['peticiones']:>6}{r['errores']:>6}{r['rps']:>9.1f}{r['p50']:>9.2f}{r['p95']:>9.2f}"
+              f"{r['p99']:>9.2f}{r['max']:>9.2f}{r['bytes']:>10}  {estados}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga y latencia de las rutas del backend")
+    parser.add_argument('--url', help="Servidor ya en marcha; por defecto se levanta uno local con SQLite")
+    parser.add_argument('--escala', type=int, default=1, help="Multiplicador sintético de los datos semilla")
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'evaluaciones_load_test.db'))
+    parser.add_argument('--peticiones', type=int, default=100, help="Peticiones por ruta")
+    parser.add_argument('--concurrencia', type=int, default=4)
+    parser.add_argument('--rutas', help="Lista separada por comas de rutas a ejecutar (subcadenas)")
+    parser.add_argument('--json', help="Guarda los resultados en este archivo")
+    parser.add_argument('--token-admin', help="Token Bearer de un administrador para /import_users; "
+                                               "con el servidor local se genera uno")
+    parser.add_argument('--accept-encoding', help="Valor de Accept-Encoding (por ejemplo 'gzip' o 'br, gzip'); "
+                                                  "la columna bytes mide entonces los bytes comprimidos")
+    args = parser.parse_args()
+
+    servidor = None
+    url, token_admin = args.url, args.token_admin
+    if not url:
+        print(f"Sembrando datos x{args.escala} en {args.db}")
+        servidor, url, token_admin = levantar_servidor(args.escala, args.db)
+
+    cliente = Cliente(url)
+    parametros = descubrir(cliente)
+    parametros['token_admin'] = token_admin
+    generadores = escenarios(parametros, cliente)
+    if args.rutas:
+        filtros = args.rutas.split(',')
+        generadores = {ruta: g for ruta, g in generadores.items() if any(f in ruta for f in filtros)}
+
+    print(f"{len(generadores)} rutas x {args.peticiones} peticiones, concurrencia {args.concurrencia}, contra {url}")
+    encabezados = {'Accept-Encoding': args.accept_encoding} if args.accept_encoding else None
+    resultados = {}
+    for ruta, generar in generadores.items():
+        resultados[ruta] = medir_ruta(cliente, generar, args.peticiones, args.concurrencia, encabezados)
+    imprimir(resultados)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as archivo:
+            json.dump({'url': url, 'escala': args.escala, 'concurrencia': args.concurrencia,
+                       'accept_encoding': args.accept_encoding, 'resultados': resultados}, archivo, indent=2)
+    if servidor:
+        servidor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# Costo del hash de contraseñas frente al objetivo de latencia de /login.
+#
+# Para cada N de scrypt mide la latencia de verificar una contraseña con
+# --concurrencia logins simultáneos pasando por el pool acotado de passwords.py (el
+# mismo camino que /login), y sugiere el mayor N cuyo p95 queda por debajo de --slo-ms.
+# Conviene correrlo en una máquina con los mismos núcleos que producción y con
+# --workers igual a PASSWORD_HASH_WORKERS * workers de gunicorn que comparten la CPU.
+#
+#   python -m benchmarks.password_cost
+#   python -m benchmarks.password_cost --costos 14,15,16 --concurrencia 16 --slo-ms 250
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash
+
+from benchmarks.load_test import percentil
+from passwords import Hasher
+
+
+def medir_costo(metodo, peticiones, concurrencia, workers):
+    hasher = Hasher(metodo, max_workers=workers, max_pendientes=peticiones)
+    almacenado = generate_password_hash('clave-de-prueba-123', metodo)
+
+    def una(_):
+        inicio = time.perf_counter()
+        hasher.verificar(almacenado, 'clave-de-prueba-123')
+        return (time.perf_counter() - inicio) * 1000
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as ejecutor:
+        latencias = list(ejecutor.map(una, range(peticiones)))
+    duracion = time.perf_counter() - inicio
+    return {
+        'rps': peticiones / duracion,
+        'p50': percentil(latencias, 50),
+        'p95': percentil(latencias, 95),
+        'max': max(latencias),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia del hash de contraseñas según el costo de scrypt")
+    parser.add_argument('--costos', default='14,15,16,17', help="Exponentes de N (N = 2**costo) separados por comas")
+    parser.add_argument('--r', type=int, default=8)
+    parser.add_argument('--p', type=int, default=1)
+    parser.add_argument('--peticiones', type=int, default=100)
+    parser.add_argument('--concurrencia', type=int, default=8, help="Logins simultáneos")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Hilos del pool de hash")
+    parser.add_argument('--slo-ms', type=float, default=250, help="Objetivo de p95 para /login")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} núcleos, pool de {args.workers} hilos, concurrencia {args.concurrencia}, "
+          f"{args.peticiones} verificaciones por costo")
+    print(f"\n{'método':<24}{'memoria':>10}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}")
+    sugerido = None
+    for costo in (int(c) for c in args.costos.split(',')):
+        metodo = f"scrypt:{2 ** costo}:{args.r}:{args.p}"
+        r = medir_costo(metodo, args.peticiones, args.concurrencia, args.workers)
+        memoria = 128 * args.r * 2 ** costo // (1024 * 1024)
+        print(f"{metodo:<24}{memoria:>8}MB{r['rps']:>9.1f}{r['p50']:>9.2f}{r['p95']:>9.2f}{r['max']:>9.2f}")
+        if r['p95'] <= args.slo_ms:
+            sugerido = metodo
+
+    if sugerido:
+        print(f"\nPASSWORD_HASH_METHOD={sugerido} (mayor costo con p95 <= {args.slo_ms:g} ms)")
+    else:
+        print(f"\nNingún costo cumple p95 <= {args.slo_ms:g} ms con esta concurrencia")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+# Base de datos local de prueba sembrada a partir de data.json y usuarios_data.json,
+# opcionalmente multiplicada de forma sintética (10x, 100x, ...).
+import json
+import os
+import random
+from datetime import datetime
+from decimal import Decimal
+
+import sqlalchemy as sa
+
+from summary import recalcular
+
+DIRECTORIO_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Las cédulas sintéticas se ubican por encima de las reales y dentro del rango de INT
+BASE_CEDULAS_SINTETICAS = 1_500_000_000
+
+TAMANO_LOTE = 5000
+
+
+def cargar_json(nombre):
+    with open(os.path.join(DIRECTORIO_BACKEND, nombre), encoding='utf-8') as archivo:
+        return json.load(archivo)
+
+
+def _indices_cedulas():
+    # Posición estable para cada cédula real, tanto de usuarios como de evaluaciones
+    usuarios = cargar_json('usuarios_data.json')
+    cedulas = [usuario['CEDULA'] for usuario in usuarios]
+    cedulas += [usuario['Cedula'] for usuario in usuarios if usuario.get('Cedula')]
+    cedulas += [evaluacion['cedula'] for evaluacion in cargar_json('data.json')]
+    return {cedula: posicion for posicion, cedula in enumerate(dict.fromkeys(cedulas))}
+
+
+def _cedula(cedula, copia, indices):
+    if copia == 0 or cedula not in indices:
+        return cedula
+    return BASE_CEDULAS_SINTETICAS + (copia - 1) * len(indices) + indices[cedula]
+
+
+def filas_usuarios(escala=1):
+    usuarios = cargar_json('usuarios_data.json')
+    indices = _indices_cedulas()
+
+    for copia in range(escala):
+        for usuario in usuarios:
+            cedula = _cedula(usuario['CEDULA'], copia, indices)
+            lider = usuario.get('Cedula')
+            yield {
+                'CEDULA': cedula,
+                'NOMBRE': usuario['NOMBRE'],
+                'CARGO': usuario['CARGO'],
+                'CENTRO DE COSTO': usuario['CENTRO DE COSTO'],
+                'LIDER EVALUADOR': usuario['LIDER EVALUADOR'],
+                'CARGO DE LIDER EVALUADOR': usuario['CARGO DE LIDER EVALUADOR'],
+                'ESTADO': usuario['ESTADO'],
+                'Año ingreso': usuario['Año ingreso'],
+                'mes ingreso': usuario['mes ingreso'],
+                'Años': usuario['Años'],
+                'Antiguedad': usuario['Antiguedad'],
+                # La clave de prueba es la misma cédula
+                'CLAVE': str(cedula),
+                'SEGURIDAD': 'mascota:firulais',
+                'LIDER': str(_cedula(lider, copia, indices)) if lider else None,
+                'rol': 'usuario',
+            }
+
+
+def filas_evaluaciones(escala=1, semilla=0):
+    indices = _indices_cedulas()
+    evaluaciones = cargar_json('data.json')
+    aleatorio = random.Random(semilla)
+
+    for copia in range(escala):
+        # Cada copia se desplaza algunos años hacia atrás para tener historia por año
+        desplazamiento = copia % 5
+        for evaluacion in evaluaciones:
+            fila = {clave: valor for clave, valor in evaluacion.items() if clave != 'id'}
+            fila['cedula'] = _cedula(evaluacion['cedula'], copia, indices)
+            if copia:
+                fila['anio'] = evaluacion['anio'] - desplazamiento
+                anio_marca = int(evaluacion['marca_temporal'][:4]) - desplazamiento
+                fila['marca_temporal'] = f"{anio_marca}{evaluacion['marca_temporal'][4:]}"
+                puntajes = ['compromiso_pasion_entrega', 'honestidad', 'respeto', 'sencillez', 'servicio',
+                            'trabajo_equipo', 'conocimiento_trabajo', 'productividad', 'cumple_sistema_gestion']
+                for campo in puntajes:
+                    fila[campo] = aleatorio.randint(2, 4)
+                fila['total_puntos'] = sum(fila[campo] for campo in puntajes)
+                fila['porcentaje_calificacion'] = Decimal(f"{(fila['total_puntos'] / 36) * 100:.2f}")
+            else:
+                fila['porcentaje_calificacion'] = Decimal(f"{float(evaluacion['porcentaje_calificacion']):.2f}")
+            fila['marca_temporal'] = datetime.strptime(fila['marca_temporal'], "%Y-%m-%d %H:%M:%S")
+            yield fila
+
+
+def _insertar_por_lotes(conn, tabla, filas):
+    lote = []
+    for fila in filas:
+        lote.append({clave: valor for clave, valor in fila.items() if clave in tabla.c})
+        if len(lote) >= TAMANO_LOTE:
+            conn.execute(tabla.insert(), lote)
+            lote = []
+    if lote:
+        conn.execute(tabla.insert(), lote)
+
+
+def sembrar(engine, metadata, escala=1):
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        _insertar_por_lotes(conn, metadata.tables['usuarios'], filas_usuarios(escala))
+        _insertar_por_lotes(conn, metadata.tables['Colaboradores'], filas_evaluaciones(escala))
+        if 'resumen_empleado_anio' in metadata.tables:
+            recalcular(conn, metadata.tables['Colaboradores'], metadata.tables['resumen_empleado_anio'])
+
+
+def motor_sqlite(ruta):
+    if os.path.exists(ruta):
+        os.remove(ruta)
+    return sa.create_engine(f"sqlite:///{ruta}")
@@ -0,0 +1,117 @@
+# Caché en memoria acotada (LRU) con expiración por tiempo, segura entre hilos.
+import threading
+import time
+from collections import OrderedDict
+
+AUSENTE = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize=1024, ttl=300, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        # Cambia con cada invalidación: una carga que empezó antes no debe guardar datos viejos
+        self._generacion = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                self.misses += 1
+                return AUSENTE
+            valor, expira = entrada
+            if expira <= self._clock():
+                del self._datos[clave]
+                self.misses += 1
+                return AUSENTE
+            self._datos.move_to_end(clave)
+            self.hits += 1
+            return valor
+
+    def set(self, clave, valor):
+        with self._lock:
+            self._guardar(clave, valor)
+
+    def _guardar(self, clave, valor):
+        self._datos[clave] = (valor, self._clock() + self.ttl)
+        self._datos.move_to_end(clave)
+        while len(self._datos) > self.maxsize:
+            self._datos.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_load(self, clave, cargar):
+        # La carga se hace fuera del lock para no serializar las consultas a la base de datos
+        valor = self.get(clave)
+        if valor is AUSENTE:
+            generacion = self._generacion
+            valor = cargar(clave)
+            with self._lock:
+                if generacion == self._generacion:
+                    self._guardar(clave, valor)
+        return valor
+
+    async def get_or_load_async(self, clave, cargar):
+        # Igual que get_or_load, con una carga asíncrona (ver asgi.py)
+        valor = self.get(clave)
+        if valor is AUSENTE:
+            generacion = self._generacion
+            valor = await cargar(clave)
+            with self._lock:
+                if generacion == self._generacion:
+                    self._guardar(clave, valor)
+        return valor
+
+    def invalidate(self, *claves):
+        with self._lock:
+            self._generacion += 1
+            for clave in claves:
+                self._datos.pop(clave, None)
+
+    def clear(self):
+        with self._lock:
+            self._generacion += 1
+            self._datos.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._datos),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class VersionObservada:
+    """Última versión vista de una tabla (versiones_tablas), revisada como mucho cada `intervalo` segundos.
+
+    Sirve para que cada proceso descarte su caché cuando otro proceso escribió en la tabla.
+    """
+
+    def __init__(self, intervalo, clock=time.monotonic):
+        self.intervalo = intervalo
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._proxima = 0
+        self.version = None
+
+    def debe_revisar(self):
+        with self._lock:
+            if self._clock() < self._proxima:
+                return False
+            self._proxima = self._clock() + self.intervalo
+            return True
+
+    def actualizar(self, version):
+        # True si cambió respecto de una versión ya vista
+        with self._lock:
+            anterior, self.version = self.version, version
+        return anterior is not None and anterior != version
@@ -0,0 +1,119 @@
+# Compresión de respuestas negociada con Accept-Encoding.
+#
+# Usa brotli si está instalado (pip install brotli) y el cliente lo acepta; si no,
+# gzip. Las respuestas normales solo se comprimen a partir de COMPRESS_MIN_SIZE bytes;
+# las respuestas en streaming (NDJSON) se comprimen por partes a medida que se generan.
+# Las respuestas con ETag fuerte (lecturas masivas de http_cache) guardan el cuerpo
+# comprimido: mientras los datos no cambien, cada sondeo reutiliza el mismo resultado.
+import gzip
+import hashlib
+import zlib
+
+from flask import request
+
+from cache import AUSENTE, TTLCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+TIPOS_COMPRIMIBLES = ('application/json', 'application/x-ndjson', 'text/')
+
+
+class Compresion:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.umbral = app.config.get('COMPRESS_MIN_SIZE', 1024)
+        self.nivel_gzip = app.config.get('COMPRESS_GZIP_LEVEL', 6)
+        self.calidad_br = app.config.get('COMPRESS_BR_QUALITY', 4)
+        self.algoritmos = [algoritmo for algoritmo in app.config.get('COMPRESS_ALGORITHMS', ('br', 'gzip'))
+                           if algoritmo == 'gzip' or (algoritmo == 'br' and brotli is not None)]
+        self.comprimidos = TTLCache(maxsize=app.config.get('COMPRESS_CACHE_SIZE', 32), ttl=300)
+        app.after_request(self._comprimir)
+
+    def _negociar(self):
+        aceptadas = request.accept_encodings
+        for algoritmo in self.algoritmos:
+            if aceptadas[algoritmo]:
+                return algoritmo
+        return None
+
+    def _comprimible(self, response):
+        return (response.status_code in (200, 201, 304)
+                and 'Content-Encoding' not in response.headers
+                and not response.direct_passthrough
+                and request.method != 'HEAD'
+                and response.mimetype.startswith(TIPOS_COMPRIMIBLES))
+
+    def _comprimir(self, response):
+        if not self.algoritmos or not self._comprimible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        algoritmo = self._negociar()
+        if algoritmo is None:
+            return response
+
+        if response.status_code == 304:
+            self._etag_codificada(response, algoritmo)
+            return response
+
+        if response.is_streamed:
+            response.response = self._comprimir_flujo(response.response, algoritmo)
+            response.headers.pop('Content-Length', None)
+        else:
+            datos = response.get_data()
+            if len(datos) < self.umbral:
+                return response
+            response.set_data(self._comprimir_con_cache(response, datos, algoritmo))
+
+        response.headers['Content-Encoding'] = algoritmo
+        self._etag_codificada(response, algoritmo)
+        return response
+
+    def _etag_codificada(self, response, algoritmo):
+        # Cada codificación es una representación distinta y necesita su propia ETag
+        # fuerte; http_cache acepta el sufijo al validar If-None-Match.
+        etag, debil = response.get_etag()
+        if etag and not etag.endswith(f"-{algoritmo}"):
+            response.set_etag(f"{etag}-{algoritmo}", debil)
+
+    def _comprimir_con_cache(self, response, datos, algoritmo):
+        etag, debil = response.get_etag()
+        if not etag or debil or not self.comprimidos.maxsize:
+            return self._comprimir_datos(datos, algoritmo)
+        # El resumen del cuerpo evita servir una versión comprimida de otro contenido
+        clave = (etag, algoritmo, hashlib.blake2b(datos, digest_size=16).digest())
+        comprimido = self.comprimidos.get(clave)
+        if comprimido is AUSENTE:
+            comprimido = self._comprimir_datos(datos, algoritmo)
+            self.comprimidos.set(clave, comprimido)
+        return comprimido
+
+    def _comprimir_datos(self, datos, algoritmo):
+        if algoritmo == 'br':
+            return brotli.compress(datos, quality=self.calidad_br)
+        return gzip.compress(datos, compresslevel=self.nivel_gzip, mtime=0)
+
+    def _comprimir_flujo(self, partes, algoritmo):
+        if algoritmo == 'br':
+            compresor = brotli.Compressor(quality=self.calidad_br)
+            comprimir, terminar = compresor.process, compresor.finish
+        else:
+            compresor = zlib.compressobj(self.nivel_gzip, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            comprimir, terminar = compresor.compress, compresor.flush
+        try:
+            for parte in partes:
+                if isinstance(parte, str):
+                    parte = parte.encode('utf-8')
+                # El compresor acumula internamente y solo devuelve bloques completos
+                bloque = comprimir(parte)
+                if bloque:
+                    yield bloque
+            yield terminar()
+        finally:
+            if hasattr(partes, 'close'):
+                partes.close()
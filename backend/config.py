@@ -0,0 +1,112 @@
+# Configuración de la aplicación a partir de variables de entorno.
+import json
+import os
+import tempfile
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+
+from replicas import binds_replicas
+
+load_dotenv()
+
+
+def _uri_railway():
+    db_url = urlparse(os.getenv('URL_ENV_RAILWAY'))
+    db_host = db_url.hostname
+    db_port = db_url.port or os.getenv('PORT_ENV_RAILWAY')
+    return f"mysql+mysqldb://{os.getenv('USER_ENV_RAILWAY')}:{os.getenv('PASSWORD_ENV_RAILWAY')}@{db_host}:{db_port}/{os.getenv('DATABASE_ENV_RAILWAY')}"
+
+
+def opciones_motor(uri):
+    # SQLite (pruebas y benchmarks locales) no usa un pool de conexiones configurable
+    if uri.startswith('sqlite'):
+        return {}
+    return {
+        # Conexiones por proceso: pool_size fijas más max_overflow temporales
+        "pool_size": int(os.getenv('DB_POOL_SIZE', 5)),
+        "max_overflow": int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        "pool_timeout": float(os.getenv('DB_POOL_TIMEOUT', 30)),
+        # El proxy de Railway corta las conexiones inactivas: se reciclan antes
+        # y se verifican con un ping al tomarlas del pool
+        "pool_recycle": int(os.getenv('DB_POOL_RECYCLE', 280)),
+        "pool_pre_ping": os.getenv('DB_POOL_PRE_PING', '1') != '0',
+    }
+
+
+class Config:
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL') or _uri_railway()
+    SQLALCHEMY_ENGINE_OPTIONS = opciones_motor(SQLALCHEMY_DATABASE_URI)
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Réplicas de lectura (ver replicas.py): URIs separadas por comas, cada una como el
+    # bind "replica_N". Sin ellas todo se lee y escribe en la primaria.
+    SQLALCHEMY_BINDS = binds_replicas(
+        [uri.strip() for uri in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if uri.strip()], opciones_motor
+    )
+    REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', 5))
+    REPLICA_CHECK_INTERVAL = float(os.getenv('REPLICA_CHECK_INTERVAL', 2))
+    REPLICA_READ_AFTER_WRITE = float(os.getenv('REPLICA_READ_AFTER_WRITE', 10))
+    REPLICA_STICKY_CLIENTS = int(os.getenv('REPLICA_STICKY_CLIENTS', 10000))
+
+    # Cache-Control de las lecturas con ETag. CACHE_CONTROL es un JSON {ruta: política}
+    # para sobrescribir la política por defecto en rutas concretas.
+    CACHE_CONTROL_DEFAULT = os.getenv('CACHE_CONTROL_DEFAULT', 'private, no-cache')
+    CACHE_CONTROL = json.loads(os.getenv('CACHE_CONTROL') or '{}')
+
+    # JSON_PROVIDER: 'auto' usa orjson si está instalado; 'std' fuerza el de Flask
+    JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'auto')
+
+    # Compresión gzip/brotli de respuestas (ver compression.py)
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BR_QUALITY = int(os.getenv('COMPRESS_BR_QUALITY', 4))
+    COMPRESS_CACHE_SIZE = int(os.getenv('COMPRESS_CACHE_SIZE', 32))
+    COMPRESS_ALGORITHMS = tuple(a.strip() for a in os.getenv('COMPRESS_ALGORITHMS', 'br,gzip').split(',') if a.strip())
+
+    # Exportaciones en segundo plano (ver exports.py). EXPORT_DIR debe ser un directorio
+    # local compartido por todos los workers de la máquina.
+    EXPORT_DIR = os.getenv('EXPORT_DIR') or os.path.join(tempfile.gettempdir(), 'evaluaciones_exports')
+    EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', 1))
+    EXPORT_RETENTION_HOURS = float(os.getenv('EXPORT_RETENTION_HOURS', 24))
+    EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 5000))
+
+    # Limitación de intentos en las rutas de autenticación (ver ratelimit.py).
+    # Los límites son "intentos/segundos". Sin RATE_LIMIT_REDIS_URL cada worker lleva su cuenta.
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', '1') != '0'
+    RATE_LIMIT_IP = os.getenv('RATE_LIMIT_IP', '60/60')
+    RATE_LIMIT_CEDULA = os.getenv('RATE_LIMIT_CEDULA', '10/60')
+    RATE_LIMIT_FAILURES_FREE = int(os.getenv('RATE_LIMIT_FAILURES_FREE', 3))
+    RATE_LIMIT_BACKOFF_BASE = float(os.getenv('RATE_LIMIT_BACKOFF_BASE', 1))
+    RATE_LIMIT_BACKOFF_MAX = float(os.getenv('RATE_LIMIT_BACKOFF_MAX', 300))
+    RATE_LIMIT_FAILURE_WINDOW = float(os.getenv('RATE_LIMIT_FAILURE_WINDOW', 900))
+    RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', 100000))
+    RATE_LIMIT_REDIS_URL = os.getenv('RATE_LIMIT_REDIS_URL')
+    # Número de proxies delante de la app para tomar la IP del cliente de X-Forwarded-For.
+    # Por defecto 1, el proxy de Railway; sin proxy (desarrollo local) debe ser 0, si no
+    # el cliente puede elegir su IP. Con 0 detrás de un proxy todas las peticiones
+    # comparten la IP del proxy y su cubeta.
+    PROXY_FIX_X_FOR = int(os.getenv('PROXY_FIX_X_FOR', 1))
+
+    # Hash de contraseñas (ver passwords.py). PASSWORD_HASH_METHOD sigue el formato de
+    # werkzeug, "scrypt:N:r:p"; benchmarks/password_cost.py mide el costo de cada N.
+    # PASSWORD_HASH_WORKERS es por proceso: el total es workers de gunicorn * este valor.
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 16))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 30))
+
+    # Tokens de sesión (ver tokens.py). SECRET_KEY debe ser la misma en todos los
+    # workers y máquinas; sin ella se genera una por proceso y los tokens solo valen
+    # en el worker que los emitió.
+    SECRET_KEY = os.getenv('SECRET_KEY')
+    ACCESS_TOKEN_TTL = int(os.getenv('ACCESS_TOKEN_TTL', 15 * 60))
+    REFRESH_TOKEN_TTL = int(os.getenv('REFRESH_TOKEN_TTL', 7 * 24 * 3600))
+    TOKEN_REVOCATION_REFRESH = float(os.getenv('TOKEN_REVOCATION_REFRESH', 5))
+    # Roles (columna usuarios.rol) que pueden usar las operaciones de administración por HTTP
+    ADMIN_ROLES = tuple(r.strip() for r in os.getenv('ADMIN_ROLES', 'admin').split(',') if r.strip())
+
+    # Instantáneas JSON para el frontend (ver snapshots.py)
+    SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR') or os.path.join(tempfile.gettempdir(), 'evaluaciones_snapshots')
+    SNAPSHOT_RETENTION_HOURS = float(os.getenv('SNAPSHOT_RETENTION_HOURS', 24))
+    SNAPSHOT_BR_QUALITY = int(os.getenv('SNAPSHOT_BR_QUALITY', 11))
@@ -0,0 +1,254 @@
+# Exportaciones en segundo plano a CSV, XLSX o Parquet.
+#
+# Los trabajos corren en un pool de hilos propio del proceso (sin broker externo) y
+# escriben el resultado por lotes en EXPORT_DIR. El estado de cada trabajo se guarda en
+# un JSON junto al archivo, así cualquier worker de gunicorn de la misma máquina puede
+# responder por su progreso y servir la descarga.
+#
+# XLSX requiere openpyxl y Parquet requiere pyarrow (pip install -r
+# requirements-exports.txt); si no están instalados esos formatos no se ofrecen y
+# POST /exports los rechaza con 400.
+import csv
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import sqlalchemy as sa
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+except ImportError:
+    pyarrow = None
+
+ID_VALIDO = re.compile(r'^[0-9a-f]{32}$')
+
+TIPOS_MIME = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+# Formato -> librería que necesita
+LIBRERIAS_FORMATO = {'xlsx': 'openpyxl', 'parquet': 'pyarrow'}
+
+
+def formatos_disponibles():
+    formatos = ['csv']
+    if openpyxl is not None:
+        formatos.append('xlsx')
+    if pyarrow is not None:
+        formatos.append('parquet')
+    return formatos
+
+
+class EscritorCSV:
+    def __init__(self, ruta, esquema):
+        # utf-8-sig para que Excel reconozca los acentos al abrir el archivo
+        self._archivo = open(ruta, 'w', newline='', encoding='utf-8-sig')
+        self._csv = csv.writer(self._archivo)
+        self._csv.writerow(esquema.nombres)
+
+    def escribir(self, filas):
+        self._csv.writerows(filas)
+
+    def cerrar(self):
+        self._archivo.close()
+
+
+class EscritorXLSX:
+    def __init__(self, ruta, esquema):
+        # En modo write_only openpyxl vuelca las filas a disco en lugar de retenerlas
+        self._ruta = ruta
+        self._libro = openpyxl.Workbook(write_only=True)
+        self._hoja = self._libro.create_sheet('datos')
+        self._hoja.append(list(esquema.nombres))
+
+    def escribir(self, filas):
+        for fila in filas:
+            self._hoja.append(list(fila))
+
+    def cerrar(self):
+        self._libro.save(self._ruta)
+
+
+def _tipo_arrow(tipo):
+    if isinstance(tipo, sa.Integer):
+        return pyarrow.int64()
+    if isinstance(tipo, sa.Float):
+        return pyarrow.float64()
+    if isinstance(tipo, sa.Numeric):
+        return pyarrow.decimal128(tipo.precision or 18, tipo.scale or 2)
+    if isinstance(tipo, sa.DateTime):
+        return pyarrow.timestamp('s')
+    return pyarrow.string()
+
+
+class EscritorParquet:
+    def __init__(self, ruta, esquema):
+        # Tipos nativos por columna; cada lote se escribe como un row group
+        self._esquema = pyarrow.schema([
+            (nombre, _tipo_arrow(columna.type)) for nombre, columna in zip(esquema.nombres, esquema.columnas)
+        ])
+        self._escritor = pq.ParquetWriter(ruta, self._esquema, compression='zstd')
+
+    def escribir(self, filas):
+        if not filas:
+            return
+        columnas = list(zip(*filas))
+        self._escritor.write_table(pyarrow.Table.from_arrays(
+            [pyarrow.array(valores, type=campo.type) for valores, campo in zip(columnas, self._esquema)],
+            schema=self._esquema,
+        ))
+
+    def cerrar(self):
+        self._escritor.close()
+
+
+ESCRITORES = {'csv': EscritorCSV, 'xlsx': EscritorXLSX, 'parquet': EscritorParquet}
+
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class GestorExportaciones:
+    def __init__(self, directorio, max_workers=1, retencion=24 * 3600):
+        self.directorio = directorio
+        self.max_workers = max_workers
+        self.retencion = retencion
+        self._pool = None
+        self._lock = threading.Lock()
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ejecutor(self):
+        # Se crea al primer uso: los hilos no sobreviven a un fork del proceso maestro
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='exportacion')
+            return self._pool
+
+    def _ruta(self, trabajo_id, extension):
+        return os.path.join(self.directorio, f"{trabajo_id}.{extension}")
+
+    def _guardar(self, trabajo):
+        temporal = self._ruta(trabajo['id'], 'json.tmp')
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump(trabajo, archivo, ensure_ascii=False)
+        os.replace(temporal, self._ruta(trabajo['id'], 'json'))
+
+    def crear(self, formato, esquema, lotes, contar=None, parametros=None):
+        """`lotes()` produce listas de filas con las columnas de `esquema`; `contar()` el total."""
+        self.limpiar()
+        trabajo = {
+            "id": uuid.uuid4().hex,
+            "formato": formato,
+            "estado": "pendiente",
+            "parametros": parametros or {},
+            "filas": 0,
+            "total": None,
+            "bytes": None,
+            "error": None,
+            "creado": datetime.now().isoformat(timespec='seconds'),
+            "terminado": None,
+            "pid": os.getpid(),
+        }
+        self._guardar(trabajo)
+        self._ejecutor().submit(self._correr, trabajo, esquema, lotes, contar)
+        return self.publico(trabajo)
+
+    def _correr(self, trabajo, esquema, lotes, contar):
+        destino = self._ruta(trabajo['id'], trabajo['formato'])
+        parcial = destino + '.parcial'
+        try:
+            trabajo['estado'] = 'en_curso'
+            if contar is not None:
+                trabajo['total'] = contar()
+            self._guardar(trabajo)
+
+            escritor = ESCRITORES[trabajo['formato']](parcial, esquema)
+            try:
+                for lote in lotes():
+                    escritor.escribir(lote)
+                    trabajo['filas'] += len(lote)
+                    self._guardar(trabajo)
+            finally:
+                escritor.cerrar()
+
+            os.replace(parcial, destino)
+            trabajo.update(estado='terminado', bytes=os.path.getsize(destino),
+                           terminado=datetime.now().isoformat(timespec='seconds'))
+        except Exception as e:
+            logging.error(f"Error en la exportación {trabajo['id']}: {str(e)}")
+            if os.path.exists(parcial):
+                os.remove(parcial)
+            trabajo.update(estado='error', error=str(e), terminado=datetime.now().isoformat(timespec='seconds'))
+        self._guardar(trabajo)
+
+    def obtener(self, trabajo_id):
+        if not ID_VALIDO.match(trabajo_id or ''):
+            return None
+        try:
+            with open(self._ruta(trabajo_id, 'json'), encoding='utf-8') as archivo:
+                trabajo = json.load(archivo)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        # Si el worker que lo ejecutaba se reinició, el trabajo no va a terminar
+        if trabajo['estado'] in ('pendiente', 'en_curso') and not _proceso_vivo(trabajo['pid']):
+            trabajo.update(estado='error', error="El proceso que ejecutaba la exportación terminó")
+        return trabajo
+
+    def archivo(self, trabajo):
+        return self._ruta(trabajo['id'], trabajo['formato'])
+
+    def publico(self, trabajo):
+        datos = {clave: valor for clave, valor in trabajo.items() if clave != 'pid'}
+        if trabajo['total']:
+            datos['progreso'] = round(trabajo['filas'] / trabajo['total'] * 100, 1)
+        return datos
+
+    def listar(self):
+        trabajos = []
+        for nombre in os.listdir(self.directorio):
+            if nombre.endswith('.json'):
+                trabajo = self.obtener(nombre[:-len('.json')])
+                if trabajo:
+                    trabajos.append(trabajo)
+        return sorted(trabajos, key=lambda trabajo: trabajo['creado'], reverse=True)
+
+    def eliminar(self, trabajo_id):
+        trabajo = self.obtener(trabajo_id)
+        if trabajo is None:
+            return False
+        for ruta in (self.archivo(trabajo), self._ruta(trabajo_id, 'json')):
+            if os.path.exists(ruta):
+                os.remove(ruta)
+        return True
+
+    def limpiar(self):
+        limite = time.time() - self.retencion
+        for nombre in os.listdir(self.directorio):
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                if os.path.getmtime(ruta) < limite:
+                    os.remove(ruta)
+            except OSError:
+                continue
@@ -0,0 +1,20 @@
+# Configuración de gunicorn (gunicorn -c gunicorn.conf.py wsgi:app).
+# Cada worker es un proceso con su propio pool de conexiones (DB_POOL_SIZE +
+# DB_MAX_OVERFLOW), así que el total de conexiones a MySQL es
+# workers * (pool_size + max_overflow): ajustar según el límite del servidor.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Las rutas pasan la mayor parte del tiempo esperando a MySQL: varios hilos por worker
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+# Reinicia los workers periódicamente para acotar el crecimiento de memoria
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = 100
+accesslog = '-'
+errorlog = '-'
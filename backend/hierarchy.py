@@ -0,0 +1,123 @@
+# Índice en memoria de la jerarquía organizacional construido a partir de usuarios.LIDER.
+#
+# Responde subordinados directos, subordinados transitivos, miembros de un área y la
+# búsqueda de empleados (search.py) sin ir a la base de datos. Se recarga completo cuando vence su TTL (para recoger cambios
+# hechos por otros procesos) y se actualiza fila por fila cuando este proceso modifica
+# un usuario.
+import threading
+import time
+from collections import defaultdict
+
+from search import IndiceBusqueda
+
+
+def _cedula(valor):
+    try:
+        return int(str(valor).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+class JerarquiaOrganizacional:
+    def __init__(self, ttl=300, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._lock_carga = threading.Lock()
+        self._cargada_en = None
+        self._miembros = {}
+        self._reportes = defaultdict(dict)
+        self._areas = defaultdict(dict)
+        self._busqueda = IndiceBusqueda()
+
+    def vigente(self, cargar):
+        # Recarga si venció el TTL; `cargar` devuelve las filas de todos los usuarios
+        if self._cargada_en is not None and self._clock() - self._cargada_en < self.ttl:
+            return self
+        with self._lock_carga:
+            if self._cargada_en is None or self._clock() - self._cargada_en >= self.ttl:
+                self.cargar(cargar())
+        return self
+
+    def cargar(self, filas):
+        miembros, reportes, areas = {}, defaultdict(dict), defaultdict(dict)
+        for fila in filas:
+            miembros[fila.CEDULA] = fila
+            lider = _cedula(fila.LIDER)
+            if lider is not None:
+                reportes[lider][fila.CEDULA] = fila
+            areas[fila.CENTRO_DE_COSTO][fila.CEDULA] = fila
+        busqueda = IndiceBusqueda(miembros.values())
+        with self._lock:
+            self._miembros, self._reportes, self._areas = miembros, reportes, areas
+            self._busqueda = busqueda
+            self._cargada_en = self._clock()
+
+    def invalidar(self):
+        with self._lock:
+            self._cargada_en = None
+
+    def _quitar(self, cedula):
+        anterior = self._miembros.pop(cedula, None)
+        if anterior is None:
+            return
+        lider = _cedula(anterior.LIDER)
+        if lider is not None:
+            self._reportes[lider].pop(cedula, None)
+        self._areas[anterior.CENTRO_DE_COSTO].pop(cedula, None)
+        self._busqueda.quitar(cedula)
+
+    def actualizar(self, fila):
+        with self._lock:
+            self._quitar(fila.CEDULA)
+            self._miembros[fila.CEDULA] = fila
+            lider = _cedula(fila.LIDER)
+            if lider is not None:
+                self._reportes[lider][fila.CEDULA] = fila
+            self._areas[fila.CENTRO_DE_COSTO][fila.CEDULA] = fila
+            self._busqueda.agregar(fila)
+
+    def eliminar(self, cedula):
+        with self._lock:
+            self._quitar(cedula)
+
+    def miembro(self, cedula):
+        with self._lock:
+            return self._miembros.get(_cedula(cedula))
+
+    def subordinados_directos(self, cedula):
+        with self._lock:
+            return list(self._reportes.get(_cedula(cedula), {}).values())
+
+    def subordinados(self, cedula):
+        # Recorrido en anchura: O(k) en el número de subordinados, tolera ciclos en los datos
+        raiz = _cedula(cedula)
+        with self._lock:
+            visitados, resultado, pendientes = {raiz}, [], [raiz]
+            while pendientes:
+                siguiente = []
+                for lider in pendientes:
+                    for subordinado, fila in self._reportes.get(lider, {}).items():
+                        if subordinado not in visitados:
+                            visitados.add(subordinado)
+                            resultado.append(fila)
+                            siguiente.append(subordinado)
+                pendientes = siguiente
+            return resultado
+
+    def miembros_area(self, area):
+        with self._lock:
+            return list(self._areas.get(area, {}).values())
+
+    def buscar(self, consulta, limite=10):
+        with self._lock:
+            return [self._miembros[cedula] for cedula in self._busqueda.buscar(consulta, limite)]
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._busqueda.stats(),
+                "miembros": len(self._miembros),
+                "lideres": sum(1 for reportes in self._reportes.values() if reportes),
+                "areas": sum(1 for miembros in self._areas.values() if miembros),
+            }
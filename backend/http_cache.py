@@ -0,0 +1,78 @@
+# Peticiones condicionales (ETag / Last-Modified) para las lecturas masivas.
+#
+# La vista decorada solo se ejecuta si cambió la versión de los datos de los que
+# depende; si el cliente ya tiene esa versión se responde 304 sin consultar ni
+# serializar nada.
+import hashlib
+import logging
+from datetime import timezone
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+# Sufijos que compression.py añade a la ETag de las representaciones comprimidas
+SUFIJOS_CODIFICACION = ('', '-gzip', '-br')
+
+
+def politica_para(config, ruta):
+    politicas = config.get('CACHE_CONTROL', {})
+    return politicas.get(ruta, config.get('CACHE_CONTROL_DEFAULT', 'private, no-cache'))
+
+
+def politica_cache():
+    return politica_para(current_app.config, request.url_rule.rule if request.url_rule else request.path)
+
+
+def etag_para(ruta, argumentos, version):
+    # El cuerpo depende de la ruta, de los parámetros y de la versión de los datos
+    parametros = '&'.join(f"{clave}={valor}" for clave, valor in sorted(argumentos))
+    return hashlib.sha1(f"{ruta}?{parametros}#{version}".encode('utf-8')).hexdigest()[:32]
+
+
+def calcular_etag(version):
+    return etag_para(request.path, request.args.items(multi=True), version)
+
+
+def en_utc(fecha):
+    if fecha is not None and fecha.tzinfo is None:
+        return fecha.replace(tzinfo=timezone.utc)
+    return fecha
+
+
+def no_modificado(etag, modificado, if_none_match, if_modified_since):
+    # If-None-Match tiene prioridad sobre If-Modified-Since (RFC 9110, 13.2.2)
+    if if_none_match:
+        return any(if_none_match.contains(etag + sufijo) for sufijo in SUFIJOS_CODIFICACION)
+    if modificado and if_modified_since:
+        return modificado.replace(microsecond=0) <= if_modified_since
+    return False
+
+
+def condicional(obtener_version):
+    """`obtener_version()` devuelve (version, ultima_modificacion UTC o None)."""
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            try:
+                version, modificado = obtener_version()
+            except Exception as e:
+                logging.error(f"No se pudo obtener la versión de los datos: {str(e)}")
+                return vista(*args, **kwargs)
+
+            etag = calcular_etag(version)
+            modificado = en_utc(modificado)
+
+            if no_modificado(etag, modificado, request.if_none_match, request.if_modified_since):
+                respuesta = current_app.response_class(status=304)
+            else:
+                respuesta = make_response(vista(*args, **kwargs))
+                if respuesta.status_code != 200:
+                    return respuesta
+
+            respuesta.set_etag(etag)
+            if modificado is not None:
+                respuesta.last_modified = modificado
+            respuesta.headers['Cache-Control'] = politica_cache()
+            return respuesta
+        return envoltura
+    return decorador
@@ -0,0 +1,250 @@
+# Importación masiva de usuarios desde CSV o JSON.
+#
+# Los archivos se leen de forma incremental y se escriben por lotes con un upsert
+# (INSERT ... ON DUPLICATE KEY UPDATE en MySQL), así el tamaño del archivo no afecta
+# la memoria ni el número de transacciones. Los encabezados pueden ser los nombres
+# de columna de la tabla ("CENTRO DE COSTO", "Año ingreso") o los de la API
+# ("CENTRO_DE_COSTO"); "Cedula" (la cédula del líder evaluador) se guarda en LIDER.
+# En motores sin upsert se actualizan las cédulas existentes y se inserta el resto.
+# El importador no pone valores por defecto a la clave ni a la pregunta de seguridad:
+# un usuario nuevo sin CLAVE queda sin acceso hasta que se le asigne una.
+# Si el archivo está mal formado a mitad, lo anterior queda importado y el resumen
+# lleva "interrupted" con el número de registro.
+import csv
+import json
+
+import sqlalchemy as sa
+
+TAMANO_BLOQUE = 64 * 1024
+MAXIMO_ERRORES_REPORTADOS = 50
+
+# Cuando el usuario ya existe solo se reemplazan las columnas presentes en el archivo,
+# excepto la clave, la pregunta de seguridad y el rol, que solo se asignan al crearlo.
+SOLO_AL_CREAR = ('CLAVE', 'SEGURIDAD', 'rol')
+
+ALIAS = {
+    'CEDULA LIDER': 'LIDER',
+    'CEDULA DEL LIDER': 'LIDER',
+}
+
+
+def _normalizar_encabezado(nombre):
+    return ' '.join(str(nombre).replace('_', ' ').split()).upper()
+
+
+def iterar_json(archivo):
+    # Lee un arreglo JSON elemento por elemento sin cargar el archivo completo
+    decoder = json.JSONDecoder()
+    buffer, posicion, iniciado, fin_archivo = '', 0, False, False
+
+    while True:
+        while posicion < len(buffer) and (buffer[posicion].isspace() or (iniciado and buffer[posicion] == ',')):
+            posicion += 1
+
+        if posicion < len(buffer):
+            if not iniciado:
+                if buffer[posicion] != '[':
+                    raise ValueError("El archivo JSON debe contener un arreglo de usuarios")
+                iniciado, posicion = True, posicion + 1
+                continue
+            if buffer[posicion] == ']':
+                return
+            try:
+                elemento, fin = decoder.raw_decode(buffer, posicion)
+                yield elemento
+                posicion = fin
+                continue
+            except json.JSONDecodeError:
+                if fin_archivo:
+                    raise
+
+        if fin_archivo:
+            if not iniciado:
+                raise ValueError("El archivo JSON está vacío")
+            raise ValueError("El arreglo JSON no está cerrado")
+
+        bloque = archivo.read(TAMANO_BLOQUE)
+        fin_archivo = not bloque
+        buffer = buffer[posicion:] + bloque
+        posicion = 0
+
+
+def iterar_csv(archivo):
+    yield from csv.DictReader(archivo)
+
+
+class ImportadorUsuarios:
+    def __init__(self, tabla, alias=None, tamano_lote=500, al_escribir=None, preparar=None,
+                 vigiladas=(), al_cambiar=None):
+        self.tabla = tabla
+        self.tamano_lote = tamano_lote
+        # preparar(fila) completa cada fila nueva antes de insertarla (hashear la clave,
+        # por ejemplo); corre fuera de la transacción porque puede ser lento
+        self.preparar = preparar
+        # al_cambiar(claves) recibe, tras confirmar cada lote, los registros existentes
+        # en los que cambió alguna de las columnas `vigiladas`
+        self.vigiladas = [c for c in vigiladas if c in tabla.c]
+        self.al_cambiar = al_cambiar
+        # al_escribir(conn, claves) corre dentro de la transacción de cada lote
+        self.al_escribir = al_escribir
+        self.clave = tabla.primary_key.columns.values()[0].name
+        self._columnas = {}
+        for columna in tabla.columns:
+            self._columnas[_normalizar_encabezado(columna.name)] = columna
+        for nombre, destino in {**ALIAS, **(alias or {})}.items():
+            self._columnas[_normalizar_encabezado(nombre)] = tabla.c[destino]
+        self._columnas['CEDULA'] = tabla.c[self.clave]
+
+    def normalizar(self, registro):
+        if not isinstance(registro, dict):
+            raise ValueError("El registro no es un objeto")
+
+        fila = {}
+        # "Cedula" (líder) y "CEDULA" (usuario) solo difieren en mayúsculas
+        lider = registro.get('Cedula')
+        for nombre, valor in registro.items():
+            if nombre == 'Cedula':
+                continue
+            columna = self._columnas.get(_normalizar_encabezado(nombre))
+            if columna is not None:
+                fila[columna.name] = self._convertir(columna, valor)
+        if lider not in (None, '') and fila.get('LIDER') is None:
+            fila['LIDER'] = str(lider).strip()
+
+        if fila.get(self.clave) is None:
+            raise ValueError("Falta la cédula")
+        return fila
+
+    def _convertir(self, columna, valor):
+        if valor is None or (isinstance(valor, str) and not valor.strip()):
+            return None
+        if isinstance(columna.type, sa.Integer):
+            return int(float(str(valor).strip()))
+        if isinstance(columna.type, sa.Float):
+            return float(str(valor).strip().replace(',', '.'))
+        return str(valor).strip()
+
+    def _actualizables(self, columnas):
+        return [c for c in columnas if c not in SOLO_AL_CREAR and c != self.clave]
+
+    def _upsert(self, conn, columnas):
+        actualizables = self._actualizables(columnas)
+        # Sin columnas que actualizar (solo cédula y clave, por ejemplo) la fila existente se deja igual
+        if conn.dialect.name == 'mysql':
+            from sqlalchemy.dialects.mysql import insert
+            sentencia = insert(self.tabla)
+            if not actualizables:
+                return sentencia.prefix_with('IGNORE')
+            return sentencia.on_duplicate_key_update({c: sentencia.inserted[c] for c in actualizables})
+        if conn.dialect.name == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+            sentencia = insert(self.tabla)
+            if not actualizables:
+                return sentencia.on_conflict_do_nothing(index_elements=[self.clave])
+            return sentencia.on_conflict_do_update(
+                index_elements=[self.clave],
+                set_={c: sentencia.excluded[c] for c in actualizables},
+            )
+        return None
+
+    def _insertar_o_actualizar(self, conn, columnas, filas, existentes):
+        # Sin upsert nativo: las cédulas que ya existen se actualizan y el resto se inserta
+        nuevas = [fila for fila in filas if fila[self.clave] not in existentes]
+        if nuevas:
+            conn.execute(self.tabla.insert(), nuevas)
+        actualizables = self._actualizables(columnas)
+        viejas = [fila for fila in filas if fila[self.clave] in existentes]
+        if viejas and actualizables:
+            # Parámetros con nombre propio: los nombres de columna están reservados en el SET
+            sentencia = (
+                self.tabla.update()
+                .where(self.tabla.c[self.clave] == sa.bindparam('_clave'))
+                .values({c: sa.bindparam(f"_v{i}") for i, c in enumerate(actualizables)})
+            )
+            conn.execute(sentencia, [
+                {'_clave': fila[self.clave], **{f"_v{i}": fila[c] for i, c in enumerate(actualizables)}}
+                for fila in viejas
+            ])
+
+    def importar(self, engine, registros):
+        resumen = {"inserted": 0, "updated": 0, "rejected": 0, "errors": []}
+        vistos = set()
+        lote = {}
+
+        def escribir():
+            with engine.connect() as conn:
+                actuales = {
+                    fila[0]: fila[1:] for fila in conn.execute(
+                        sa.select(self.tabla.c[self.clave], *(self.tabla.c[c] for c in self.vigiladas))
+                        .where(self.tabla.c[self.clave].in_(list(lote)))
+                    )
+                }
+            existentes = set(actuales)
+            cambiadas = []
+            # Un upsert por cada combinación de columnas (normalmente una sola por archivo).
+            # A los existentes no se les envían las columnas que solo se asignan al crear;
+            # si otro proceso inserta la cédula entretanto, el upsert tampoco las actualiza.
+            grupos = {}
+            for cedula, fila in lote.items():
+                if cedula in existentes:
+                    fila = {c: v for c, v in fila.items() if c not in SOLO_AL_CREAR}
+                    if not self._actualizables(fila):
+                        continue
+                    if any(c in fila and fila[c] != actual for c, actual in zip(self.vigiladas, actuales[cedula])):
+                        cambiadas.append(cedula)
+                elif self.preparar:
+                    fila = self.preparar(fila)
+                grupos.setdefault(tuple(sorted(fila)), []).append(fila)
+            with engine.begin() as conn:
+                for columnas, filas in grupos.items():
+                    upsert = self._upsert(conn, columnas)
+                    if upsert is None:
+                        self._insertar_o_actualizar(conn, columnas, filas, existentes)
+                    else:
+                        conn.execute(upsert, filas)
+                if self.al_escribir:
+                    self.al_escribir(conn, list(lote))
+            if cambiadas and self.al_cambiar:
+                self.al_cambiar(cambiadas)
+            for cedula in lote:
+                if cedula in existentes or cedula in vistos:
+                    resumen["updated"] += 1
+                else:
+                    resumen["inserted"] += 1
+                vistos.add(cedula)
+            lote.clear()
+
+        registros = iter(registros)
+        numero = 0
+        while True:
+            numero += 1
+            try:
+                registro = next(registros)
+            except StopIteration:
+                break
+            except (ValueError, csv.Error) as e:
+                # Archivo mal formado a mitad: lo leído hasta aquí se guarda (los lotes
+                # anteriores ya están confirmados) y el resumen indica dónde se detuvo
+                if lote:
+                    escribir()
+                resumen["interrupted"] = {"row": numero, "error": str(e)}
+                return resumen
+
+            try:
+                fila = self.normalizar(registro)
+            except (TypeError, ValueError) as e:
+                resumen["rejected"] += 1
+                if len(resumen["errors"]) < MAXIMO_ERRORES_REPORTADOS:
+                    resumen["errors"].append({"row": numero, "error": str(e)})
+                continue
+
+            if fila[self.clave] in lote:
+                # Cédula repetida dentro del mismo lote: gana el último registro
+                resumen["updated"] += 1
+            lote[fila[self.clave]] = fila
+            if len(lote) >= self.tamano_lote:
+                escribir()
+
+        if lote:
+            escribir()
+        return resumen
@@ -1,25 +1,53 @@
-from flask import Flask, request, jsonify
+from flask import (Blueprint, Flask, Response, current_app, g, has_request_context, request, jsonify, send_file,
+                   stream_with_context)
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from dotenv import load_dotenv
 import os
-from urllib.parse import urlparse
-from datetime import datetime
+from datetime import datetime, timezone
+from decimal import Decimal
 import logging
-
-load_dotenv()
-
-app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": "*"}})
-
-db_url = urlparse(os.getenv('URL_ENV_RAILWAY'))
-db_host = db_url.hostname
-db_port = db_url.port or os.getenv('PORT_ENV_RAILWAY')
-
-app.config['SQLALCHEMY_DATABASE_URI'] = f"mysql+mysqldb://{os.getenv('USER_ENV_RAILWAY')}:{os.getenv('PASSWORD_ENV_RAILWAY')}@{db_host}:{db_port}/{os.getenv('DATABASE_ENV_RAILWAY')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-db = SQLAlchemy(app)
+import io
+import secrets
+import click
+from collections import namedtuple
+from functools import wraps
+from itertools import chain
+from sqlalchemy import event, inspect as inspeccionar
+
+import migrations
+from config import Config, opciones_motor
+from cache import TTLCache, VersionObservada
+from hierarchy import JerarquiaOrganizacional
+from importer import ImportadorUsuarios, iterar_csv, iterar_json
+from metrics import metricas
+from http_cache import condicional
+from serialization import linea_json, proveedor_json
+from compression import Compresion
+from schemas import Esquema
+import summary
+import analytics
+from exports import GestorExportaciones, LIBRERIAS_FORMATO, TIPOS_MIME, formatos_disponibles
+from snapshots import ES_HASHEADO, GeneradorSnapshots
+from passwords import HashingSaturado, es_hash, hasher, separar_seguridad
+from tokens import PREFIJO_ACCESO, PREFIJO_USUARIO, TokenInvalido, ahora_ms, emisor_tokens
+from ratelimit import AlmacenMemoria, Limitador, fallo_si_estado, limitar
+from replicas import CLAVE_REPLICA, SesionEnrutada, en_primaria, enrutador_replicas
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+db = SQLAlchemy(session_options={"class_": SesionEnrutada})
+
+# Todas las rutas y comandos se registran en la aplicación creada por create_app()
+bp = Blueprint('api', __name__, cli_group=None)
+
+FORMATO_MARCA_TEMPORAL = "%Y-%m-%d %H:%M:%S"
+
+
+def formatear_marca_temporal(valor):
+    return valor.strftime(FORMATO_MARCA_TEMPORAL) if valor else None
+
+
+def porcentaje_a_float(valor):
+    return float(valor) if valor is not None else None
 
 class Usuario(db.Model):
     __tablename__ = 'usuarios'
@@ -39,10 +67,15 @@ class Usuario(db.Model):
     LIDER = db.Column(db.String(255))
     rol = db.Column(db.String(255))
 
+    # Deben coincidir con los índices creados en migrations/
+    __table_args__ = (
+        db.Index('ix_usuarios_lider', 'LIDER'),
+    )
+
 class Evaluacion(db.Model):
     __tablename__ = 'Colaboradores'
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    marca_temporal = db.Column(db.String(512))
+    marca_temporal = db.Column(db.DateTime)
     anio = db.Column(db.Integer)
     nombres_apellidos = db.Column(db.String(512))
     cedula = db.Column(db.Integer)
@@ -63,7 +96,7 @@ class Evaluacion(db.Model):
     productividad = db.Column(db.Integer)
     cumple_sistema_gestion = db.Column(db.Integer)
     total_puntos = db.Column(db.Integer)
-    porcentaje_calificacion = db.Column(db.String(512))
+    porcentaje_calificacion = db.Column(db.Numeric(5, 2))
     porcentaje_promedio = db.Column(db.String(512))
     acuerdos_mejora_desempeno_colaborador = db.Column(db.String(512))
     formacion = db.Column(db.String(512))
@@ -73,16 +106,438 @@ class Evaluacion(db.Model):
     cargo_jefe_inmediato = db.Column(db.String(512))
     tarea = db.Column(db.String(512))
 
-@app.route('/user-info', methods=['GET'])
+    # Deben coincidir con los índices creados en migrations/
+    __table_args__ = (
+        db.Index('ix_colaboradores_cedula_marca', 'cedula', 'marca_temporal'),
+        db.Index('ix_colaboradores_area_marca', 'area_jefe_pertenencia', 'marca_temporal',
+                 mysql_length={'area_jefe_pertenencia': 191}),
+        db.Index('ix_colaboradores_anio_area', 'anio', 'area_jefe_pertenencia',
+                 mysql_length={'area_jefe_pertenencia': 191}),
+    )
+
+    # La API sigue exponiendo la fecha y el porcentaje con el formato de texto original
+    @property
+    def fecha_evaluacion(self):
+        return formatear_marca_temporal(self.marca_temporal)
+
+    @property
+    def porcentaje(self):
+        return porcentaje_a_float(self.porcentaje_calificacion)
+
+class ResumenEmpleadoAnio(db.Model):
+    # Mantenida por summary.recalcular() al insertar evaluaciones
+    __tablename__ = 'resumen_empleado_anio'
+    cedula = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    anio = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    evaluaciones = db.Column(db.Integer, nullable=False)
+    ultima_evaluacion_id = db.Column(db.Integer)
+    marca_temporal = db.Column(db.DateTime)
+    compromiso_pasion_entrega = db.Column(db.Integer)
+    honestidad = db.Column(db.Integer)
+    respeto = db.Column(db.Integer)
+    sencillez = db.Column(db.Integer)
+    servicio = db.Column(db.Integer)
+    trabajo_equipo = db.Column(db.Integer)
+    conocimiento_trabajo = db.Column(db.Integer)
+    productividad = db.Column(db.Integer)
+    cumple_sistema_gestion = db.Column(db.Integer)
+    total_puntos = db.Column(db.Integer)
+    porcentaje_calificacion = db.Column(db.Numeric(5, 2))
+    promedio_porcentaje = db.Column(db.Numeric(5, 2))
+    tarea = db.Column(db.String(512))
+
+class TokenRevocado(db.Model):
+    # Ver tokens.py y migrations/0005_tokens_revocados.py
+    __tablename__ = 'tokens_revocados'
+    jti = db.Column(db.String(64), primary_key=True)
+    cedula = db.Column(db.Integer, nullable=False)
+    revocado_ms = db.Column(db.BigInteger, nullable=False)
+    expira = db.Column(db.DateTime, nullable=False, index=True)
+
+class CambioUsuario(db.Model):
+    # Ver migrations/0006_cambios_usuarios.py; el id es el cursor de /changes
+    __tablename__ = 'cambios_usuarios'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    cedula = db.Column(db.Integer, nullable=False)
+    eliminado = db.Column(db.Boolean, nullable=False, default=False)
+    momento = db.Column(db.DateTime, nullable=False)
+
+class VersionTabla(db.Model):
+    __tablename__ = 'versiones_tablas'
+    tabla = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    actualizado = db.Column(db.DateTime)
+
+
+# Cada commit que escribe en una tabla incrementa su versión en la misma transacción.
+# Las lecturas masivas derivan su ETag de estas versiones (ver http_cache.py).
+TABLAS_MODIFICADAS = 'tablas_modificadas'
+TABLAS_SIN_VERSION = {'versiones_tablas', 'cambios_usuarios'}
+
+
+def registrar_cambio(*tablas):
+    db.session.info.setdefault(TABLAS_MODIFICADAS, set()).update(tablas)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _tablas_del_flush(session, contexto):
+    tablas = {objeto.__table__.name for objeto in chain(session.new, session.dirty, session.deleted)}
+    session.info.setdefault(TABLAS_MODIFICADAS, set()).update(tablas - TABLAS_SIN_VERSION)
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _tablas_del_dml(estado):
+    # INSERT/UPDATE/DELETE masivos ejecutados con db.session.execute() no pasan por el flush
+    if estado.is_insert or estado.is_update or estado.is_delete:
+        tabla = estado.statement.table.name
+        if tabla not in TABLAS_SIN_VERSION:
+            estado.session.info.setdefault(TABLAS_MODIFICADAS, set()).add(tabla)
+
+
+# Usuarios agregados, modificados o eliminados en la transacción, para cambios_usuarios.
+# La clave y la pregunta de seguridad no se sincronizan, así que cambiarlas (incluido
+# el rehash de _guardar_hash, que es un UPDATE masivo) no se registra.
+USUARIOS_MODIFICADOS = 'usuarios_modificados'
+COLUMNAS_NO_SINCRONIZADAS = {'CLAVE', 'SEGURIDAD'}
+
+
+@event.listens_for(db.session, 'after_flush')
+def _usuarios_del_flush(session, contexto):
+    cambios = session.info.setdefault(USUARIOS_MODIFICADOS, {})
+    for usuario in session.new:
+        if isinstance(usuario, Usuario):
+            cambios[usuario.CEDULA] = False
+    for usuario in session.dirty:
+        if not isinstance(usuario, Usuario):
+            continue
+        estado = inspeccionar(usuario)
+        atributos = [atributo for atributo in estado.mapper.column_attrs if atributo.key not in COLUMNAS_NO_SINCRONIZADAS]
+        if not any(estado.attrs[atributo.key].history.has_changes() for atributo in atributos):
+            continue
+        # Si cambió la cédula, para los clientes la anterior deja de existir
+        for anterior in estado.attrs.CEDULA.history.deleted:
+            cambios[anterior] = True
+        cambios[usuario.CEDULA] = False
+    for usuario in session.deleted:
+        if isinstance(usuario, Usuario):
+            cambios[usuario.CEDULA] = True
+
+
+@event.listens_for(db.session, 'before_commit')
+def _incrementar_versiones(session):
+    session.flush()
+    tablas = session.info.pop(TABLAS_MODIFICADAS, None)
+    if not tablas:
+        return
+    if has_request_context():
+        # Sus próximas lecturas van a la primaria (ver replicas.py)
+        enrutador_replicas.registrar_escritura(request.remote_addr)
+    ahora = datetime.now(timezone.utc).replace(tzinfo=None)
+    # En orden fijo para que dos escrituras concurrentes no se bloqueen mutuamente
+    for tabla in sorted(tablas):
+        actualizadas = session.execute(
+            db.update(VersionTabla).where(VersionTabla.tabla == tabla)
+            .values(version=VersionTabla.version + 1, actualizado=ahora)
+        ).rowcount
+        if not actualizadas:
+            session.execute(db.insert(VersionTabla).values(tabla=tabla, version=1, actualizado=ahora))
+
+    # Después de bloquear la versión de usuarios: los ids del registro se asignan y se
+    # confirman en el mismo orden (ver reservar_secuencia)
+    cambios = session.info.pop(USUARIOS_MODIFICADOS, None)
+    if cambios:
+        session.execute(db.insert(CambioUsuario), [
+            {"cedula": cedula, "eliminado": eliminado, "momento": ahora} for cedula, eliminado in cambios.items()
+        ])
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_cambios(session):
+    session.info.pop(TABLAS_MODIFICADAS, None)
+    session.info.pop(USUARIOS_MODIFICADOS, None)
+
+
+def reservar_secuencia(tabla):
+    # Bloquea la fila de versión de la tabla hasta el commit. Así los ids autoincrementales
+    # que se asignan después se confirman en orden creciente y /changes puede usar el
+    # mayor id visible como cursor sin saltarse una transacción más lenta. En SQLite la
+    # escritura ya es serial y FOR UPDATE se ignora.
+    db.session.execute(db.select(VersionTabla.version).where(VersionTabla.tabla == tabla).with_for_update())
+
+
+# Las consultas y respuestas que comparten las rutas Flask y los handlers async de
+# asgi.py se construyen en funciones para que ambos caminos devuelvan lo mismo.
+def consulta_versiones(*tablas):
+    return (db.select(VersionTabla.tabla, VersionTabla.version, VersionTabla.actualizado)
+            .where(VersionTabla.tabla.in_(tablas)))
+
+
+def resumir_versiones(filas, tablas):
+    versiones = {fila.tabla: fila.version for fila in filas}
+    modificado = max((fila.actualizado for fila in filas if fila.actualizado), default=None)
+    return '.'.join(str(versiones.get(tabla, 0)) for tabla in tablas), modificado
+
+
+def version_datos(*tablas):
+    return resumir_versiones(db.session.execute(consulta_versiones(*tablas)).all(), tablas)
+
+
+def solo_lectura(vista):
+    # Las consultas de la ruta (incluida la versión de @condicional, que debe ir debajo)
+    # se leen de una réplica si hay alguna al día. No hace falta quitar la marca al
+    # terminar: Flask-SQLAlchemy descarta la sesión al cerrar el contexto de la petición,
+    # y así también las respuestas en streaming siguen leyendo de la réplica.
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        replica = enrutador_replicas.elegir(request.remote_addr)
+        if replica is not None:
+            db.session.info[CLAVE_REPLICA] = replica
+        return vista(*args, **kwargs)
+    return envoltura
+
+
+# Las nueve competencias evaluadas, con el nombre que usa la API
+COMPETENCIAS = {
+    "compromiso": Evaluacion.compromiso_pasion_entrega,
+    "honestidad": Evaluacion.honestidad,
+    "respeto": Evaluacion.respeto,
+    "sencillez": Evaluacion.sencillez,
+    "servicio": Evaluacion.servicio,
+    "trabajo_equipo": Evaluacion.trabajo_equipo,
+    "conocimiento_trabajo": Evaluacion.conocimiento_trabajo,
+    "productividad": Evaluacion.productividad,
+    "cumple_sistema_gestion": Evaluacion.cumple_sistema_gestion,
+}
+
+
+# Caché de usuarios por cédula. La tabla casi no cambia y se consulta en cada login,
+# así que las lecturas pasan por aquí y las rutas que escriben invalidan la entrada.
+# Cada worker tiene su copia: antes de usarla se compara la versión de la tabla usuarios
+# (como mucho cada USER_CACHE_VERSION_CHECK segundos) y, si otro proceso escribió, se
+# vacía junto con el índice de jerarquía. Las verificaciones de credenciales no usan la
+# caché (obtener_usuario(..., fresco=True)).
+COLUMNAS_USUARIO = {atributo.key: atributo.columns[0] for atributo in Usuario.__mapper__.column_attrs}
+UsuarioCacheado = namedtuple('UsuarioCacheado', COLUMNAS_USUARIO)
+
+usuarios_cache = TTLCache(
+    maxsize=int(os.getenv('USER_CACHE_SIZE', 4096)),
+    ttl=float(os.getenv('USER_CACHE_TTL', 300)),
+)
+version_usuarios = VersionObservada(float(os.getenv('USER_CACHE_VERSION_CHECK', 1)))
+
+
+def sincronizar_cache_usuarios():
+    if not version_usuarios.debe_revisar():
+        return
+    with en_primaria(db.session):
+        version, _ = version_datos(Usuario.__tablename__)
+    observar_version_usuarios(version)
+
+
+def observar_version_usuarios(version):
+    # También lo usa asgi.py, que lee la versión con su motor async
+    if version_usuarios.actualizar(version):
+        usuarios_cache.clear()
+        jerarquia.invalidar()
+
+
+def consulta_usuario(cedula):
+    return db.select(*COLUMNAS_USUARIO.values()).where(Usuario.CEDULA == cedula)
+
+
+def _cargar_usuario(cedula):
+    with en_primaria(db.session):
+        fila = db.session.execute(consulta_usuario(cedula)).first()
+    return UsuarioCacheado(*fila) if fila else None
+
+
+def obtener_usuario(cedula, fresco=False):
+    try:
+        cedula = int(str(cedula).strip())
+    except (TypeError, ValueError):
+        return None
+    if fresco:
+        usuario = _cargar_usuario(cedula)
+        usuarios_cache.set(cedula, usuario)
+        return usuario
+    sincronizar_cache_usuarios()
+    return usuarios_cache.get_or_load(cedula, _cargar_usuario)
+
+
+def invalidar_usuario(*cedulas):
+    claves = []
+    for cedula in cedulas:
+        try:
+            claves.append(int(cedula))
+        except (TypeError, ValueError):
+            continue
+    usuarios_cache.invalidate(*claves)
+
+
+def _guardar_hash(cedula, **valores):
+    # Migración perezosa: si falla, el acceso sigue siendo válido y se reintenta en el próximo
+    try:
+        db.session.execute(db.update(Usuario).where(Usuario.CEDULA == cedula).values(**valores))
+        db.session.commit()
+        invalidar_usuario(cedula)
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error al actualizar el hash del usuario {cedula}: {str(e)}")
+
+
+def verificar_clave(usuario, clave):
+    coincide, rehashear = hasher.verificar(usuario.CLAVE if usuario else None, clave)
+    if rehashear:
+        _guardar_hash(usuario.CEDULA, CLAVE=hasher.hashear(clave))
+    return coincide
+
+
+def seguridad_con_hash(valor):
+    # Siempre se hashea lo recibido: un hash enviado por el cliente no se guarda tal cual
+    if not valor:
+        return valor
+    pregunta, respuesta = separar_seguridad(valor)
+    return f"{pregunta}:{hasher.hashear(respuesta.lower())}"
+
+
+def verificar_respuesta_seguridad(usuario, respuesta):
+    # La comparación no distingue mayúsculas: se guarda y se compara en minúsculas
+    pregunta, almacenada = separar_seguridad(usuario.SEGURIDAD)
+    coincide, rehashear = hasher.verificar(almacenada if es_hash(almacenada) else almacenada.lower(), respuesta.lower())
+    if rehashear:
+        _guardar_hash(usuario.CEDULA, SEGURIDAD=f"{pregunta}:{hasher.hashear(respuesta.lower())}")
+    return coincide
+
+
+def sincronizar_revocaciones():
+    if not emisor_tokens.debe_sincronizar():
+        return
+    version, _ = version_datos(TokenRevocado.__tablename__)
+    if version != emisor_tokens.version_revocaciones:
+        filas = db.session.execute(
+            db.select(TokenRevocado.jti, TokenRevocado.cedula, TokenRevocado.revocado_ms)
+            .where(TokenRevocado.expira > datetime.now(timezone.utc).replace(tzinfo=None))
+        ).all()
+        emisor_tokens.cargar_revocaciones(version, filas)
+
+
+def identidad_de_encabezado(encabezado):
+    # None si no hay token Bearer; TokenInvalido si el token no sirve
+    esquema, _, token = (encabezado or '').partition(' ')
+    if esquema.lower() != 'bearer' or not token.strip():
+        return None
+    sincronizar_revocaciones()
+    return emisor_tokens.verificar(token.strip())
+
+
+def revocar_token(jti, cedula, expira_ms):
+    # Se agrega a la sesión; se guarda con el commit de la ruta
+    revocado = ahora_ms()
+    ahora = datetime.now(timezone.utc).replace(tzinfo=None)
+    db.session.execute(db.delete(TokenRevocado).where((TokenRevocado.jti == jti) | (TokenRevocado.expira <= ahora)))
+    db.session.add(TokenRevocado(jti=jti, cedula=cedula, revocado_ms=revocado,
+                                 expira=datetime.fromtimestamp(expira_ms / 1000, timezone.utc).replace(tzinfo=None)))
+    emisor_tokens.revocar(jti, cedula, revocado)
+
+
+def revocar_tokens_usuario(*cedulas, solo_acceso=False):
+    # Invalida los tokens emitidos hasta ahora para esas cédulas; con solo_acceso los de
+    # refresco siguen sirviendo para obtener un token de acceso con los datos actuales
+    prefijo, ttl = (PREFIJO_ACCESO, emisor_tokens.ttl_acceso) if solo_acceso else (PREFIJO_USUARIO, emisor_tokens.ttl_refresco)
+    for cedula in {int(c) for c in cedulas if c is not None}:
+        revocar_token(f"{prefijo}{cedula}", cedula, ahora_ms() + ttl * 1000)
+
+
+# Cambiar la cédula o la clave cierra todas las sesiones; el rol o el nombre solo
+# invalidan los tokens de acceso, que llevan esos datos
+CAMPOS_DE_SESION = {'CEDULA', 'CLAVE'}
+CAMPOS_DEL_TOKEN = {'NOMBRE', 'rol'}
+
+
+def token_invalido(e):
+    return jsonify({"success": False, "error": str(e)}), 401
+
+
+def requiere_admin():
+    # None si el token Bearer es de un rol administrador; si no, la respuesta de error
+    try:
+        identidad = identidad_de_encabezado(request.headers.get('Authorization'))
+    except TokenInvalido as e:
+        return token_invalido(e)
+    if not identidad:
+        return jsonify({"success": False, "error": "Se requiere un token de acceso"}), 401
+    if identidad['rol'] not in current_app.config['ADMIN_ROLES']:
+        return jsonify({"success": False, "error": "No tienes permiso para esta operación"}), 403
+    return None
+
+
+def hashing_saturado():
+    respuesta = jsonify({"success": False, "error": "Servicio ocupado, intenta de nuevo en unos segundos"})
+    respuesta.status_code = 503
+    respuesta.headers['Retry-After'] = '1'
+    return respuesta
+
+
+# Índice de la jerarquía líder -> subordinados construido desde usuarios.LIDER
+CAMPOS_JERARQUIA = ('CEDULA', 'NOMBRE', 'CARGO', 'CENTRO_DE_COSTO', 'ESTADO',
+                    'LIDER_EVALUADOR', 'CARGO_DE_LIDER_EVALUADOR', 'LIDER')
+MiembroOrganizacion = namedtuple('MiembroOrganizacion', CAMPOS_JERARQUIA)
+
+jerarquia = JerarquiaOrganizacional(ttl=float(os.getenv('HIERARCHY_TTL', 300)))
+
+
+def _filas_jerarquia(*condiciones):
+    query = db.select(*[COLUMNAS_USUARIO[campo] for campo in CAMPOS_JERARQUIA]).where(*condiciones)
+    with en_primaria(db.session):
+        return [MiembroOrganizacion(*fila) for fila in db.session.execute(query.order_by(Usuario.CEDULA))]
+
+
+def obtener_jerarquia():
+    sincronizar_cache_usuarios()
+    return jerarquia.vigente(_filas_jerarquia)
+
+
+def refrescar_jerarquia(*cedulas):
+    for cedula in cedulas:
+        try:
+            cedula = int(cedula)
+        except (TypeError, ValueError):
+            continue
+        filas = _filas_jerarquia(Usuario.CEDULA == cedula)
+        if filas:
+            jerarquia.actualizar(filas[0])
+        else:
+            jerarquia.eliminar(cedula)
+
+
+metricas.registrar_indicador('user_cache', "Estado de la caché de usuarios", usuarios_cache.stats)
+metricas.registrar_indicador('org_hierarchy', "Tamaño del índice de jerarquía", jerarquia.stats)
+
+
+ESQUEMA_MIEMBRO = Esquema(
+    ("cedula", Usuario.CEDULA),
+    ("nombre", Usuario.NOMBRE),
+    ("cargo", Usuario.CARGO),
+    ("centro_de_costo", Usuario.CENTRO_DE_COSTO),
+    ("estado", Usuario.ESTADO),
+    ("lider_evaluador", Usuario.LIDER_EVALUADOR),
+    ("cargo_de_lider_evaluador", Usuario.CARGO_DE_LIDER_EVALUADOR),
+)
+
+
+@bp.route('/user-info', methods=['GET'])
 def get_user_info():
     try:
-        # En un escenario real, obtendrías esta información del token de autenticación
-        # Por ahora, simularemos obtener la información del usuario desde la base de datos
+        # Con un token la identidad sale de él sin consultar la base de datos
+        identidad = identidad_de_encabezado(request.headers.get('Authorization'))
+        if identidad:
+            return jsonify({"success": True, "name": identidad['nombre'], "role": identidad['rol']})
+
         cedula = request.args.get('cedula')
         if not cedula:
             return jsonify({"success": False, "error": "Cédula es requerida"}), 400
 
-        usuario = Usuario.query.filter_by(CEDULA=cedula).first()
+        usuario = obtener_usuario(cedula)
         
         if usuario:
             return jsonify({
@@ -93,11 +548,14 @@ def get_user_info():
         else:
             return jsonify({"success": False, "error": "Usuario no encontrado"}), 404
 
+    except TokenInvalido as e:
+        return token_invalido(e)
     except Exception as e:
         logging.error(f"Error al obtener información del usuario: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/login', methods=['POST'])
+@bp.route('/login', methods=['POST'])
+@limitar('cedula')
 def login():
     try:
         data = request.get_json()
@@ -107,43 +565,38 @@ def login():
         if not cedula or not clave:
             return jsonify({"success": False, "error": "Cédula y clave son requeridas"}), 400
 
-        usuario = Usuario.query.filter_by(CEDULA=cedula, CLAVE=clave).first()
+        usuario = obtener_usuario(cedula, fresco=True)
         
-        if usuario:
+        if verificar_clave(usuario, clave):
             return jsonify({
                 "success": True,
                 "userId": usuario.CEDULA,
                 "name": usuario.NOMBRE,
-                "role": usuario.rol
+                "role": usuario.rol,
+                **emisor_tokens.emitir(usuario.CEDULA, usuario.rol, usuario.NOMBRE)
             })
         else:
             return jsonify({"success": False, "error": "Credenciales inválidas"}), 401
 
+    except HashingSaturado:
+        return hashing_saturado()
     except Exception as e:
         logging.error(f"Error en el login: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/evaluaciones', methods=['GET'])
+@bp.route('/evaluaciones', methods=['GET'])
+@solo_lectura
 def get_evaluaciones():
     try:
         cedula = request.args.get('cedula')
         if not cedula:
             return jsonify({"success": False, "error": "Cédula es requerida"}), 400
 
-        evaluaciones = Evaluacion.query.filter_by(cedula=cedula).all()
-        
+        query = ESQUEMA_EVALUACION_RESUMEN.select().where(Evaluacion.cedula == cedula)
+
         return jsonify({
             "success": True,
-            "evaluaciones": [
-                {
-                    "id": eval.id,
-                    "anio": eval.anio,
-                    "fecha_evaluacion": eval.marca_temporal,
-                    "cargo": eval.cargo,
-                    "total_puntos": eval.total_puntos,
-                    "porcentaje_calificacion": float(eval.porcentaje_calificacion),
-                } for eval in evaluaciones
-            ]
+            "evaluaciones": [ESQUEMA_EVALUACION_RESUMEN.serializar(fila) for fila in db.session.execute(query)]
         })
 
     except Exception as e:
@@ -151,46 +604,213 @@ def get_evaluaciones():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
-@app.route('/get_all_evaluations', methods=['GET'])
+# Campos expuestos por los endpoints masivos. El parámetro `fields=` selecciona un
+# subconjunto y solo esas columnas se piden a la base de datos.
+ESQUEMA_EVALUACION = Esquema(
+    ("id", Evaluacion.id),
+    ("nombres_apellidos", Evaluacion.nombres_apellidos),
+    ("cedula", Evaluacion.cedula),
+    ("fecha_evaluacion", Evaluacion.marca_temporal, formatear_marca_temporal),
+    ("area_jefe_pertenencia", Evaluacion.area_jefe_pertenencia),
+    ("anio", Evaluacion.anio),
+    ("cargo", Evaluacion.cargo),
+    ("compromiso", Evaluacion.compromiso_pasion_entrega),
+    ("honestidad", Evaluacion.honestidad),
+    ("respeto", Evaluacion.respeto),
+    ("sencillez", Evaluacion.sencillez),
+    ("servicio", Evaluacion.servicio),
+    ("trabajo_equipo", Evaluacion.trabajo_equipo),
+    ("conocimiento_trabajo", Evaluacion.conocimiento_trabajo),
+    ("productividad", Evaluacion.productividad),
+    ("cumple_sistema_gestion", Evaluacion.cumple_sistema_gestion),
+    ("total_puntos", Evaluacion.total_puntos),
+    ("porcentaje_calificacion", Evaluacion.porcentaje_calificacion, porcentaje_a_float),
+    ("acuerdos_mejora_desempeno_colaborador", Evaluacion.acuerdos_mejora_desempeno_colaborador),
+    ("acuerdos_mejora_desempeno_jefe", Evaluacion.acuerdos_mejora_desempeno_jefe),
+    ("necesidades_desarrollo", Evaluacion.necesidades_desarrollo),
+    ("aspectos_positivos", Evaluacion.aspectos_positivos),
+    ("tarea", Evaluacion.tarea),
+)
+
+# Listados de usuarios y /changes: nunca incluye la clave ni la pregunta de seguridad
+ESQUEMA_USUARIO = Esquema(
+    ("CEDULA", Usuario.CEDULA),
+    ("NOMBRE", Usuario.NOMBRE),
+    ("CARGO", Usuario.CARGO),
+    ("CENTRO_DE_COSTO", Usuario.CENTRO_DE_COSTO),
+    ("LIDER_EVALUADOR", Usuario.LIDER_EVALUADOR),
+    ("CARGO_DE_LIDER_EVALUADOR", Usuario.CARGO_DE_LIDER_EVALUADOR),
+    ("ESTADO", Usuario.ESTADO),
+    ("LIDER", Usuario.LIDER),
+)
+
+# Instantáneas para el frontend (snapshots.py): mismos campos y nombres que los
+# data.json y usuarios_data.json de public/, sin la clave ni la pregunta de seguridad
+def cedula_lider(valor):
+    return int(valor) if valor and str(valor).strip().isdigit() else valor
+
+
+ESQUEMA_SNAPSHOT_EVALUACIONES = Esquema(*[
+    (columna.name, columna, {
+        'marca_temporal': formatear_marca_temporal,
+        'porcentaje_calificacion': porcentaje_a_float,
+    }.get(columna.name))
+    for columna in Evaluacion.__table__.columns
+])
+
+ESQUEMA_SNAPSHOT_USUARIOS = Esquema(
+    ("CEDULA", Usuario.CEDULA),
+    ("NOMBRE", Usuario.NOMBRE),
+    ("CARGO", Usuario.CARGO),
+    ("CENTRO DE COSTO", Usuario.CENTRO_DE_COSTO),
+    ("LIDER EVALUADOR", Usuario.LIDER_EVALUADOR),
+    ("Cedula", Usuario.LIDER, cedula_lider),
+    ("CARGO DE LIDER EVALUADOR", Usuario.CARGO_DE_LIDER_EVALUADOR),
+    ("ESTADO", Usuario.ESTADO),
+    ("Año ingreso", Usuario.ANO_INGRESO),
+    ("mes ingreso", Usuario.MES_INGRESO),
+    ("Años", Usuario.ANOS),
+    ("Antiguedad", Usuario.ANTIGUEDAD),
+)
+
+# La respuesta completa de get_all_evaluations nunca incluyó el id
+ESQUEMA_EVALUACION_DEFECTO = ESQUEMA_EVALUACION.sin("id")
+
+# Esquemas de las demás rutas de lectura
+ESQUEMA_EVALUACION_RESUMEN = Esquema(
+    ("id", Evaluacion.id),
+    ("anio", Evaluacion.anio),
+    ("fecha_evaluacion", Evaluacion.marca_temporal, formatear_marca_temporal),
+    ("cargo", Evaluacion.cargo),
+    ("total_puntos", Evaluacion.total_puntos),
+    ("porcentaje_calificacion", Evaluacion.porcentaje_calificacion, porcentaje_a_float),
+)
+
+ESQUEMA_HISTORIAL_EVALUACIONES = Esquema(
+    ("fecha_evaluacion", Evaluacion.marca_temporal, formatear_marca_temporal),
+    ("anio", Evaluacion.anio),
+    ("cargo", Evaluacion.cargo),
+    ("compromiso", Evaluacion.compromiso_pasion_entrega),
+    ("honestidad", Evaluacion.honestidad),
+    ("respeto", Evaluacion.respeto),
+    ("sencillez", Evaluacion.sencillez),
+    ("servicio", Evaluacion.servicio),
+    ("trabajo_equipo", Evaluacion.trabajo_equipo),
+    ("conocimiento_trabajo", Evaluacion.conocimiento_trabajo),
+    ("productividad", Evaluacion.productividad),
+    ("cumple_sistema_gestion", Evaluacion.cumple_sistema_gestion),
+    ("total_puntos", Evaluacion.total_puntos),
+    ("porcentaje_calificacion", Evaluacion.porcentaje_calificacion),
+    ("acuerdos_mejora_desempeno_colaborador", Evaluacion.acuerdos_mejora_desempeno_colaborador),
+    ("acuerdos_mejora_desempeno_jefe", Evaluacion.acuerdos_mejora_desempeno_jefe),
+    ("necesidades_desarrollo", Evaluacion.necesidades_desarrollo),
+    ("aspectos_positivos", Evaluacion.aspectos_positivos),
+    ("tarea", Evaluacion.tarea),
+)
+
+ESQUEMA_HISTORIAL_AREA = Esquema(
+    ("id", Evaluacion.id),
+    ("nombre", Evaluacion.nombres_apellidos),
+    ("cedula", Evaluacion.cedula),
+    ("cargo", Evaluacion.cargo),
+    ("fecha", Evaluacion.marca_temporal, formatear_marca_temporal),
+    ("puntaje_total", Evaluacion.total_puntos),
+    ("porcentaje_calificacion", Evaluacion.porcentaje_calificacion),
+)
+
+ESQUEMA_ESTADISTICAS_EMPLEADO = Esquema(
+    ("total_puntos", ResumenEmpleadoAnio.total_puntos),
+    ("porcentaje_calificacion", ResumenEmpleadoAnio.porcentaje_calificacion),
+    ("compromiso", ResumenEmpleadoAnio.compromiso_pasion_entrega),
+    ("honestidad", ResumenEmpleadoAnio.honestidad),
+    ("respeto", ResumenEmpleadoAnio.respeto),
+    ("sencillez", ResumenEmpleadoAnio.sencillez),
+    ("servicio", ResumenEmpleadoAnio.servicio),
+    ("trabajo_en_equipo", ResumenEmpleadoAnio.trabajo_equipo),
+    ("conocimiento", ResumenEmpleadoAnio.conocimiento_trabajo),
+    ("productividad", ResumenEmpleadoAnio.productividad),
+    ("gestion", ResumenEmpleadoAnio.cumple_sistema_gestion),
+    ("tarea", ResumenEmpleadoAnio.tarea),
+    ("evaluaciones", ResumenEmpleadoAnio.evaluaciones),
+    ("promedio_porcentaje", ResumenEmpleadoAnio.promedio_porcentaje),
+)
+
+# Perfil del usuario que devuelven validate_cedula, validate_user y get_user_details
+ESQUEMA_PERFIL_USUARIO = Esquema(
+    ("nombre", Usuario.NOMBRE),
+    ("cargo", Usuario.CARGO),
+    ("centro_de_costo", Usuario.CENTRO_DE_COSTO),
+    ("lider_evaluador", Usuario.LIDER_EVALUADOR),
+    ("cargo_de_lider_evaluador", Usuario.CARGO_DE_LIDER_EVALUADOR),
+    ("estado", Usuario.ESTADO),
+    ("ano_ingreso", Usuario.ANO_INGRESO),
+    ("mes_ingreso", Usuario.MES_INGRESO),
+    ("anos", Usuario.ANOS),
+    ("antiguedad", Usuario.ANTIGUEDAD),
+)
+
+TAMANO_LOTE_STREAM = 1000
+
+
+def _bulk_read(esquema, defecto, clave, nombre_lista):
+    fields = request.args.get('fields')
+    if fields:
+        nombres = [campo.strip() for campo in fields.split(',') if campo.strip()]
+        desconocidos = [campo for campo in nombres if campo not in esquema]
+        if desconocidos:
+            return jsonify({"success": False, "error": f"Campos desconocidos: {', '.join(desconocidos)}"}), 400
+        seleccion = esquema.seleccionar(nombres)
+    else:
+        seleccion = defecto
+
+    cursor = request.args.get('cursor', type=int)
+    limite = request.args.get('limit', type=int)
+    formato = request.args.get('format', 'json')
+
+    # La columna clave siempre se consulta para poder calcular el siguiente cursor
+    columna_clave = esquema[clave]
+    query = seleccion.select(columna_clave).order_by(columna_clave)
+    if cursor is not None:
+        query = query.where(columna_clave > cursor)
+    if limite:
+        limite = max(1, min(limite, 5000))
+        query = query.limit(limite)
+
+    serializar = seleccion.serializar
+
+    if formato == 'ndjson':
+        def generar():
+            resultado = db.session.execute(query.execution_options(yield_per=TAMANO_LOTE_STREAM))
+            for fila in resultado:
+                yield linea_json(serializar(fila))
+
+        return Response(stream_with_context(generar()), mimetype='application/x-ndjson')
+
+    filas = db.session.execute(query).all()
+    respuesta = {"success": True, nombre_lista: [serializar(fila) for fila in filas]}
+    if limite:
+        respuesta["next_cursor"] = filas[-1][-1] if len(filas) == limite else None
+    return jsonify(respuesta)
+
+
+@bp.route('/get_all_evaluations', methods=['GET'])
+@solo_lectura
+@condicional(lambda: version_datos(Evaluacion.__tablename__))
 def get_all_evaluations():
     try:
-        evaluations = Evaluacion.query.all()
-        return jsonify({
-            "success": True,
-            "evaluations": [
-                {
-                    "nombres_apellidos": eval.nombres_apellidos,
-                    "cedula": eval.cedula,
-                    "fecha_evaluacion": eval.marca_temporal,
-                    "area_jefe_pertenencia": eval.area_jefe_pertenencia,
-                    "anio": eval.anio,
-                    "cargo": eval.cargo,
-                    "compromiso": eval.compromiso_pasion_entrega,
-                    "honestidad": eval.honestidad,
-                    "respeto": eval.respeto,
-                    "sencillez": eval.sencillez,
-                    "servicio": eval.servicio,
-                    "trabajo_equipo": eval.trabajo_equipo,
-                    "conocimiento_trabajo": eval.conocimiento_trabajo,
-                    "productividad": eval.productividad,
-                    "cumple_sistema_gestion": eval.cumple_sistema_gestion,
-                    "total_puntos": eval.total_puntos,
-                    "porcentaje_calificacion": float(eval.porcentaje_calificacion),
-                    "acuerdos_mejora_desempeno_colaborador": eval.acuerdos_mejora_desempeno_colaborador,
-                    "acuerdos_mejora_desempeno_jefe": eval.acuerdos_mejora_desempeno_jefe,
-                    "necesidades_desarrollo": eval.necesidades_desarrollo,
-                    "aspectos_positivos": eval.aspectos_positivos,
-                    "tarea": eval.tarea,
-                } for eval in evaluations
-            ]
-        })
+        return _bulk_read(ESQUEMA_EVALUACION, ESQUEMA_EVALUACION_DEFECTO, "id", "evaluations")
     except Exception as e:
         print(f"Error fetching evaluations: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/get_user_role', methods=['POST'])
+@bp.route('/get_user_role', methods=['POST'])
+@limitar('cedula', fallo_si_estado(404))
 def get_user_role():
     try:
+        identidad = identidad_de_encabezado(request.headers.get('Authorization'))
+        if identidad:
+            return jsonify({"success": True, "rol": identidad['rol']})
+
         data = request.get_json()
         cedula = data.get("cedula")
         clave = data.get("clave")  # Validar credenciales
@@ -198,47 +818,38 @@ def get_user_role():
         if not cedula or not clave:
             return jsonify({"success": False, "error": "Cédula y clave son requeridas"}), 400
 
-        usuario = Usuario.query.filter_by(CEDULA=cedula, CLAVE=clave).first()
+        usuario = obtener_usuario(cedula, fresco=True)
         
-        if usuario:
+        if verificar_clave(usuario, clave):
             return jsonify({"success": True, "rol": usuario.rol})  
         else:
             return jsonify({"success": False, "error": "Usuario no encontrado"}), 404
 
+    except TokenInvalido as e:
+        return token_invalido(e)
+    except HashingSaturado:
+        return hashing_saturado()
     except Exception as e:
         print(f"Error al obtener rol del usuario: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
 
 
-@app.route('/get_all_users', methods=['GET'])
+@bp.route('/get_all_users', methods=['GET'])
+@solo_lectura
+@condicional(lambda: version_datos(Usuario.__tablename__))
 def get_all_users():
     try:
-        users = Usuario.query.all()
-        return jsonify({
-            "success": True,
-            "users": [
-                {
-                    "CEDULA": user.CEDULA,
-                    "NOMBRE": user.NOMBRE,
-                    "CARGO": user.CARGO,
-                    "CENTRO_DE_COSTO": user.CENTRO_DE_COSTO,
-                    "LIDER_EVALUADOR": user.LIDER_EVALUADOR,
-                    "CARGO_DE_LIDER_EVALUADOR": user.CARGO_DE_LIDER_EVALUADOR,
-                    "ESTADO": user.ESTADO,
-                    "CLAVE": user.CLAVE,
-                    "SEGURIDAD": user.SEGURIDAD,
-                    "LIDER": user.LIDER
-                } for user in users
-            ]
-        })
+        return _bulk_read(ESQUEMA_USUARIO, ESQUEMA_USUARIO, "CEDULA", "users")
     except Exception as e:
         print(f"Error fetching users: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/add_user', methods=['POST'])
+@bp.route('/add_user', methods=['POST'])
 def add_user():
     try:
         data = request.json
+        if not data.get('CLAVE'):
+            return jsonify({"success": False, "error": "La clave no puede estar vacía"}), 400
         new_user = Usuario(
             CEDULA=data['CEDULA'],
             NOMBRE=data['NOMBRE'],
@@ -247,20 +858,25 @@ def add_user():
             LIDER_EVALUADOR=data['LIDER_EVALUADOR'],
             CARGO_DE_LIDER_EVALUADOR=data['CARGO_DE_LIDER_EVALUADOR'],
             ESTADO=data['ESTADO'],
-            CLAVE=data['CLAVE'],
-            SEGURIDAD=data['SEGURIDAD'],
+            CLAVE=hasher.hashear(data['CLAVE']),
+            SEGURIDAD=seguridad_con_hash(data['SEGURIDAD']),
             LIDER=data['LIDER'],
             rol=data['rol']
         )
         db.session.add(new_user)
         db.session.commit()
+        invalidar_usuario(data['CEDULA'])
+        refrescar_jerarquia(data['CEDULA'])
         return jsonify({"success": True, "message": "Usuario agregado exitosamente"})
+    except HashingSaturado:
+        db.session.rollback()
+        return hashing_saturado()
     except Exception as e:
         db.session.rollback()
         print(f"Error adding user: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/update_user/<int:cedula>', methods=['PUT'])
+@bp.route('/update_user/<int:cedula>', methods=['PUT'])
 def update_user(cedula):
     try:
         user = Usuario.query.get(cedula)
@@ -268,17 +884,32 @@ def update_user(cedula):
             return jsonify({"success": False, "error": "Usuario no encontrado"}), 404
         
         data = request.json
+        if 'CLAVE' in data and not data['CLAVE']:
+            return jsonify({"success": False, "error": "La clave no puede estar vacía"}), 400
         for key, value in data.items():
+            if key == 'CLAVE':
+                value = hasher.hashear(value)
+            elif key == 'SEGURIDAD':
+                value = seguridad_con_hash(value)
             setattr(user, key, value)
+        if CAMPOS_DE_SESION.intersection(data):
+            revocar_tokens_usuario(cedula)
+        elif CAMPOS_DEL_TOKEN.intersection(data):
+            revocar_tokens_usuario(cedula, solo_acceso=True)
         
         db.session.commit()
+        invalidar_usuario(cedula, data.get('CEDULA'))
+        refrescar_jerarquia(cedula, data.get('CEDULA'))
         return jsonify({"success": True, "message": "Usuario actualizado exitosamente"})
+    except HashingSaturado:
+        db.session.rollback()
+        return hashing_saturado()
     except Exception as e:
         db.session.rollback()
         print(f"Error updating user: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/delete_user/<int:cedula>', methods=['DELETE'])
+@bp.route('/delete_user/<int:cedula>', methods=['DELETE'])
 def delete_user(cedula):
     try:
         user = Usuario.query.get(cedula)
@@ -286,14 +917,103 @@ def delete_user(cedula):
             return jsonify({"success": False, "error": "Usuario no encontrado"}), 404
         
         db.session.delete(user)
+        revocar_tokens_usuario(cedula)
         db.session.commit()
+        invalidar_usuario(cedula)
+        jerarquia.eliminar(cedula)
         return jsonify({"success": True, "message": "Usuario eliminado exitosamente"})
     except Exception as e:
         db.session.rollback()
         print(f"Error deleting user: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/validate_cedula', methods=['POST'])
+def _registrar_importacion(conn, cedulas):
+    # Como en _incrementar_versiones: primero la versión de usuarios, que bloquea, y
+    # luego el registro de cambios, en la misma transacción que el lote
+    ahora = datetime.now(timezone.utc).replace(tzinfo=None)
+    versiones = VersionTabla.__table__
+    conn.execute(versiones.update().where(versiones.c.tabla == Usuario.__tablename__)
+                 .values(version=versiones.c.version + 1, actualizado=ahora))
+    conn.execute(CambioUsuario.__table__.insert(),
+                 [{"cedula": cedula, "eliminado": False, "momento": ahora} for cedula in cedulas])
+
+
+def _preparar_usuario_importado(fila):
+    # Solo se llama para usuarios nuevos: en los existentes la clave y la pregunta no cambian
+    if fila.get('CLAVE') is not None:
+        fila['CLAVE'] = hasher.hashear(fila['CLAVE'])
+    if fila.get('SEGURIDAD'):
+        fila['SEGURIDAD'] = seguridad_con_hash(fila['SEGURIDAD'])
+    return fila
+
+
+def importar_usuarios(archivo, formato, tamano_lote=500):
+    # `archivo` es un flujo de texto; se procesa por lotes sin cargarlo completo
+    con_datos_del_token = set()
+    importador = ImportadorUsuarios(
+        Usuario.__table__,
+        alias={campo: columna.name for campo, columna in COLUMNAS_USUARIO.items()},
+        tamano_lote=tamano_lote,
+        al_escribir=_registrar_importacion,
+        preparar=_preparar_usuario_importado,
+        # Como en update_user: si cambia el nombre, los tokens de acceso quedan desactualizados
+        vigiladas=[getattr(Usuario, campo).name for campo in CAMPOS_DEL_TOKEN],
+        al_cambiar=con_datos_del_token.update,
+    )
+    registros = iterar_csv(archivo) if formato == 'csv' else iterar_json(archivo)
+    try:
+        return importador.importar(db.engine, registros)
+    finally:
+        usuarios_cache.clear()
+        jerarquia.invalidar()
+        revocar_tokens_usuario(*con_datos_del_token, solo_acceso=True)
+        # El importador escribe con su propia conexión; la versión se incrementa aparte
+        registrar_cambio(Usuario.__tablename__)
+        db.session.commit()
+
+
+def _formato_importacion(nombre, tipo_contenido):
+    formato = request.args.get('format')
+    if formato in ('csv', 'json'):
+        return formato
+    if (nombre or '').lower().endswith('.csv') or 'csv' in (tipo_contenido or ''):
+        return 'csv'
+    return 'json'
+
+
+@bp.route('/import_users', methods=['POST'])
+def import_users():
+    # Crea usuarios con cualquier rol y reescribe los existentes: solo administradores
+    error = requiere_admin()
+    if error:
+        return error
+    try:
+        if 'archivo' in request.files:
+            archivo = request.files['archivo']
+            flujo, formato = archivo.stream, _formato_importacion(archivo.filename, archivo.mimetype)
+        else:
+            flujo, formato = request.stream, _formato_importacion(None, request.mimetype)
+
+        tamano_lote = max(1, min(request.args.get('lote', default=500, type=int), 5000))
+        resumen = importar_usuarios(io.TextIOWrapper(flujo, encoding='utf-8-sig'), formato, tamano_lote)
+        if 'interrupted' in resumen:
+            # Importación parcial: los registros anteriores sí quedaron guardados
+            interrupcion = resumen['interrupted']
+            return jsonify({
+                "success": False,
+                "error": f"Archivo inválido en el registro {interrupcion['row']}: {interrupcion['error']}",
+                **resumen
+            }), 400
+        return jsonify({"success": True, **resumen})
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except HashingSaturado:
+        return hashing_saturado()
+    except Exception as e:
+        print(f"Error importing users: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/validate_cedula', methods=['POST'])
 def validate_cedula():
     try:
         data = request.get_json()
@@ -307,22 +1027,10 @@ def validate_cedula():
         except ValueError:
             return jsonify({"error": "La cédula debe ser un número válido"}), 400
 
-        user = Usuario.query.filter_by(CEDULA=cedula).first()
+        user = obtener_usuario(cedula)
 
         if user:
-            return jsonify({
-                "valid": True,
-                "nombre": user.NOMBRE,
-                "cargo": user.CARGO,
-                "centro_de_costo": user.CENTRO_DE_COSTO,
-                "lider_evaluador": user.LIDER_EVALUADOR,
-                "cargo_de_lider_evaluador": user.CARGO_DE_LIDER_EVALUADOR,
-                "estado": user.ESTADO,
-                "ano_ingreso": user.ANO_INGRESO,
-                "mes_ingreso": user.MES_INGRESO,
-                "anos": user.ANOS,
-                "antiguedad": user.ANTIGUEDAD
-            })
+            return jsonify({"valid": True, **ESQUEMA_PERFIL_USUARIO.desde_objeto(user)})
         else:
             return jsonify({
                 "valid": False,
@@ -333,7 +1041,8 @@ def validate_cedula():
         print(f"Error en el servidor: {str(e)}")
         return jsonify({"error": "Error interno del servidor"}), 500
     
-@app.route('/validate_user', methods=['POST'])
+@bp.route('/validate_user', methods=['POST'])
+@limitar('username')
 def validate_user():
     try:
         data = request.get_json()
@@ -343,38 +1052,80 @@ def validate_user():
         username = str(data['username']).strip()
         password = str(data['password']) 
 
-        user = Usuario.query.filter_by(CEDULA=username).first()
+        user = obtener_usuario(username, fresco=True)
 
-        if user:
-            if str(user.CLAVE) == password:
-                return jsonify({
-                    "valid": True,
-                    "nombre": user.NOMBRE,
-                    "cargo": user.CARGO,
-                    "centro_de_costo": user.CENTRO_DE_COSTO,
-                    "lider_evaluador": user.LIDER_EVALUADOR,
-                    "cargo_de_lider_evaluador": user.CARGO_DE_LIDER_EVALUADOR,
-                    "estado": user.ESTADO,
-                    "ano_ingreso": user.ANO_INGRESO,
-                    "mes_ingreso": user.MES_INGRESO,
-                    "anos": user.ANOS,
-                    "antiguedad": user.ANTIGUEDAD,
-                    "requiresSecurityUpdate": user.SEGURIDAD is None or user.SEGURIDAD == "",
-                    "username": user.CEDULA,
-                    "password": user.CLAVE,
-                    "rol": user.rol
-                })
+        if verificar_clave(user, password):
+            return jsonify({
+                "valid": True,
+                **ESQUEMA_PERFIL_USUARIO.desde_objeto(user),
+                "requiresSecurityUpdate": user.SEGURIDAD is None or user.SEGURIDAD == "",
+                "username": user.CEDULA,
+                "rol": user.rol,
+                **emisor_tokens.emitir(user.CEDULA, user.rol, user.NOMBRE)
+            })
 
         return jsonify({
             "valid": False,
             "error": "Usuario o contraseña incorrectos"
         }), 401
 
+    except HashingSaturado:
+        return hashing_saturado()
     except Exception as e:
         print(f"Error en el servidor: {str(e)}")
         return jsonify({"error": "Error interno del servidor"}), 500
 
-@app.route('/change_password', methods=['POST'])
+@bp.route('/refresh_token', methods=['POST'])
+def refresh_token():
+    try:
+        data = request.get_json(silent=True) or {}
+        if not data.get('refreshToken'):
+            return jsonify({"success": False, "error": "Se requiere el token de refresco"}), 400
+
+        sincronizar_revocaciones()
+        datos = emisor_tokens.verificar(data['refreshToken'], refresco=True)
+        # El rol o el nombre pueden haber cambiado desde el login
+        usuario = obtener_usuario(datos['sub'], fresco=True)
+        if not usuario:
+            return jsonify({"success": False, "error": "Usuario no encontrado"}), 401
+
+        # Cada token de refresco se usa una sola vez
+        revocar_token(datos['jti'], datos['sub'], emisor_tokens.expira_ms(datos, refresco=True))
+        db.session.commit()
+        return jsonify({"success": True, **emisor_tokens.emitir(usuario.CEDULA, usuario.rol, usuario.NOMBRE)})
+
+    except TokenInvalido as e:
+        return token_invalido(e)
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error al renovar el token: {str(e)}")
+        return jsonify({"success": False, "error": "Error interno del servidor"}), 500
+
+@bp.route('/logout', methods=['POST'])
+def logout():
+    try:
+        data = request.get_json(silent=True) or {}
+        pendientes = [
+            (lambda: identidad_de_encabezado(request.headers.get('Authorization')), False),
+            (lambda: data.get('refreshToken') and emisor_tokens.verificar(data['refreshToken'], refresco=True), True),
+        ]
+        for verificar, refresco in pendientes:
+            try:
+                datos = verificar()
+            except TokenInvalido:
+                # Un token expirado o ya revocado no necesita revocarse
+                continue
+            if datos:
+                revocar_token(datos['jti'], datos['sub'], emisor_tokens.expira_ms(datos, refresco))
+        db.session.commit()
+        return jsonify({"success": True})
+
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error al cerrar la sesión: {str(e)}")
+        return jsonify({"success": False, "error": "Error interno del servidor"}), 500
+
+@bp.route('/change_password', methods=['POST'])
 def change_password():
     try:
         data = request.get_json()
@@ -399,23 +1150,27 @@ def change_password():
             logging.warning(f"Usuario no encontrado para CEDULA: {CEDULA}")
             return jsonify({"success": False, "error": "Usuario no encontrado"}), 404
 
-        if user.CLAVE != old_password:
+        if not hasher.verificar(user.CLAVE, old_password)[0]:
             return jsonify({"success": False, "error": "La contraseña antigua es incorrecta"}), 400
 
         if old_password == new_password:
             return jsonify({"success": False, "error": "La nueva contraseña no puede ser igual a la antigua"}), 400
 
-        user.CLAVE = new_password 
+        user.CLAVE = hasher.hashear(new_password)
+        revocar_tokens_usuario(user.CEDULA)
         db.session.commit()
+        invalidar_usuario(CEDULA)
 
         logging.info(f"Contraseña actualizada para el usuario con CEDULA: {CEDULA}")
         return jsonify({"success": True, "message": "Contraseña actualizada correctamente"}), 200
 
+    except HashingSaturado:
+        return hashing_saturado()
     except Exception as e:
         logging.error(f"Error en el servidor: {str(e)}")
         return jsonify({"success": False, "error": "Error interno del servidor"}), 500
 
-@app.route('/update_security_question', methods=['POST'])
+@bp.route('/update_security_question', methods=['POST'])
 def update_security_question():
     try:
         data = request.get_json()
@@ -429,61 +1184,84 @@ def update_security_question():
         user = Usuario.query.filter_by(CEDULA=username).first()
 
         if user:
-            user.SEGURIDAD = f"{security_question}:{security_answer}"
+            user.SEGURIDAD = f"{security_question}:{hasher.hashear(security_answer.lower())}"
             db.session.commit()
+            invalidar_usuario(username)
             return jsonify({"success": True, "message": "Pregunta de seguridad actualizada con éxito"})
         else:
             return jsonify({"success": False, "error": "Usuario no encontrado"}), 404
 
+    except HashingSaturado:
+        return hashing_saturado()
     except Exception as e:
         print(f"Error en el servidor: {str(e)}")
         return jsonify({"error": "Error interno del servidor"}), 500
 
-@app.route('/submit_evaluation', methods=['POST'])
+PUNTAJE_MAXIMO = 36
+
+LIMITE_LOTE_EVALUACIONES = 1000
+
+
+def actualizar_resumen(filas):
+    # Recalcula el resumen de los pares (cédula, año) de las evaluaciones insertadas,
+    # en la transacción de la sesión actual
+    db.session.flush()
+    summary.recalcular(db.session, Evaluacion.__table__, ResumenEmpleadoAnio.__table__, summary.pares_de(filas))
+
+
+def construir_evaluacion(data, ahora=None, marca_del_cliente=False):
+    # Valores de columna de una evaluación a partir del payload del formulario. Solo el
+    # lote acepta marca_temporal/anio del cliente (cargas diferidas); si no, hora del servidor
+    ahora = ahora or datetime.now().replace(microsecond=0)
+    datos, valores, acuerdos = data['datos'], data['valores'], data['acuerdos']
+
+    marca_temporal, anio = ahora, None
+    if marca_del_cliente:
+        if data.get('marca_temporal'):
+            marca_temporal = datetime.strptime(data['marca_temporal'], FORMATO_MARCA_TEMPORAL)
+        anio = data.get('anio')
+
+    evaluacion = {
+        "marca_temporal": marca_temporal,
+        "anio": int(anio or marca_temporal.year),
+        "nombres_apellidos": datos['nombres'],
+        "cedula": datos['cedula'],
+        "cargo": datos['cargo'],
+        "nombre_jefe_inmediato": datos['jefe'],
+        "area_jefe_pertenencia": datos['area'],
+        "estado": datos.get('estado', 'Activo'),
+        "compromiso_pasion_entrega": int(valores['compromiso']),
+        "honestidad": int(valores['honestidad']),
+        "respeto": int(valores['respeto']),
+        "sencillez": int(valores['sencillez']),
+        "servicio": int(valores.get('servicio', 0)),
+        "trabajo_equipo": int(valores.get('trabajo_equipo', 0)),
+        "conocimiento_trabajo": int(valores.get('conocimiento_trabajo', 0)),
+        "productividad": int(valores.get('productividad', 0)),
+        "cumple_sistema_gestion": int(valores.get('cumple_sistema_gestion', 0)),
+        "acuerdos_mejora_desempeno_colaborador": acuerdos['colaborador_acuerdos'],
+        "acuerdos_mejora_desempeno_jefe": acuerdos['jefe_acuerdos'],
+        "necesidades_desarrollo": acuerdos['desarrollo_necesidades'],
+        "aspectos_positivos": acuerdos['aspectos_positivos'],
+        "cargo_jefe_inmediato": datos['cargoJefe'],
+    }
+
+    total_puntos = sum(evaluacion[columna.key] for columna in COMPETENCIAS.values())
+    evaluacion["total_puntos"] = total_puntos
+    evaluacion["porcentaje_calificacion"] = Decimal(f"{(total_puntos / PUNTAJE_MAXIMO) * 100:.2f}")
+    return evaluacion
+
+
+@bp.route('/submit_evaluation', methods=['POST'])
 def submit_evaluation():
     try:
         data = request.get_json()
         
-        new_evaluation = Evaluacion(
-            marca_temporal=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            anio=datetime.now().year,
-            nombres_apellidos=data['datos']['nombres'],
-            cedula=data['datos']['cedula'],
-            cargo=data['datos']['cargo'],
-            nombre_jefe_inmediato=data['datos']['jefe'],
-            area_jefe_pertenencia=data['datos']['area'],
-            estado=data['datos'].get('estado', 'Activo'),
-            compromiso_pasion_entrega=data['valores']['compromiso'],
-            honestidad=data['valores']['honestidad'],
-            respeto=data['valores']['respeto'],
-            sencillez=data['valores']['sencillez'],
-            servicio=data['valores'].get('servicio', 0),
-            trabajo_equipo=data['valores'].get('trabajo_equipo', 0),
-            conocimiento_trabajo=data['valores'].get('conocimiento_trabajo', 0),
-            productividad=data['valores'].get('productividad', 0),
-            cumple_sistema_gestion=data['valores'].get('cumple_sistema_gestion', 0),
-            acuerdos_mejora_desempeno_colaborador=data['acuerdos']['colaborador_acuerdos'],
-            acuerdos_mejora_desempeno_jefe=data['acuerdos']['jefe_acuerdos'],
-            necesidades_desarrollo=data['acuerdos']['desarrollo_necesidades'],
-            aspectos_positivos=data['acuerdos']['aspectos_positivos'],
-            cargo_jefe_inmediato=data['datos']['cargoJefe']
-        )
-        
-        total_puntos = (
-            new_evaluation.compromiso_pasion_entrega +
-            new_evaluation.honestidad +
-            new_evaluation.respeto +
-            new_evaluation.sencillez +
-            new_evaluation.servicio +
-            new_evaluation.trabajo_equipo +
-            new_evaluation.conocimiento_trabajo +
-            new_evaluation.productividad +
-            new_evaluation.cumple_sistema_gestion
-        )
-        new_evaluation.total_puntos = total_puntos
-        new_evaluation.porcentaje_calificacion = f"{(total_puntos / 36) * 100:.2f}"
-        
-        db.session.add(new_evaluation)
+        evaluacion = construir_evaluacion(data)
+
+        reservar_secuencia(Evaluacion.__tablename__)
+        db.session.add(Evaluacion(**evaluacion))
+        actualizar_resumen([evaluacion])
         db.session.commit()
         
         return jsonify({
@@ -496,7 +1274,57 @@ def submit_evaluation():
         return jsonify({"error": "Error al guardar la evaluación"}), 500
 
 
-@app.route('/get_evaluation_history', methods=['POST'])
+@bp.route('/submit_evaluations/batch', methods=['POST'])
+def submit_evaluations_batch():
+    try:
+        data = request.get_json()
+        items = data.get('evaluaciones') if isinstance(data, dict) else data
+        if not isinstance(items, list) or not items:
+            return jsonify({"success": False, "error": "Se requiere una lista de evaluaciones"}), 400
+        if len(items) > LIMITE_LOTE_EVALUACIONES:
+            return jsonify({
+                "success": False,
+                "error": f"Máximo {LIMITE_LOTE_EVALUACIONES} evaluaciones por lote"
+            }), 400
+
+        ahora = datetime.now().replace(microsecond=0)
+        filas, resultados = [], []
+        for indice, item in enumerate(items):
+            try:
+                filas.append(construir_evaluacion(item, ahora, marca_del_cliente=True))
+                resultados.append({"index": indice, "success": True})
+            except KeyError as e:
+                resultados.append({"index": indice, "success": False, "error": f"Falta el campo {e}"})
+            except (TypeError, ValueError, AttributeError) as e:
+                resultados.append({"index": indice, "success": False, "error": f"Datos inválidos: {str(e)}"})
+
+        # Un solo INSERT de varias filas dentro de una única transacción
+        if filas:
+            reservar_secuencia(Evaluacion.__tablename__)
+            db.session.execute(db.insert(Evaluacion), filas)
+            actualizar_resumen(filas)
+            db.session.commit()
+
+        return jsonify({
+            "success": len(filas) == len(items),
+            "inserted": len(filas),
+            "rejected": len(items) - len(filas),
+            "results": resultados
+        })
+    except Exception as e:
+        print(f"Error en el servidor: {str(e)}")
+        db.session.rollback()
+        return jsonify({"success": False, "error": "Error al guardar las evaluaciones"}), 500
+
+
+def consulta_historial_evaluaciones(cedula):
+    return (ESQUEMA_HISTORIAL_EVALUACIONES.select()
+            .where(Evaluacion.cedula == cedula)
+            .order_by(Evaluacion.marca_temporal.desc()))
+
+
+@bp.route('/get_evaluation_history', methods=['POST'])
+@solo_lectura
 def get_evaluation_history():
     try:
         data = request.get_json()
@@ -505,32 +1333,9 @@ def get_evaluation_history():
 
         cedula = data['cedula']
         
-        evaluations = Evaluacion.query.filter_by(cedula=cedula).order_by(Evaluacion.marca_temporal.desc()).all()
-        
-        history = []
-        for eval in evaluations:
-            history.append({
-                "fecha_evaluacion": eval.marca_temporal,
-                "anio": eval.anio,
-                "cargo": eval.cargo,
-                "compromiso": eval.compromiso_pasion_entrega,
-                "honestidad": eval.honestidad,
-                "respeto": eval.respeto,
-                "sencillez": eval.sencillez,
-                "servicio": eval.servicio,
-                "trabajo_equipo": eval.trabajo_equipo,
-                "conocimiento_trabajo": eval.conocimiento_trabajo,
-                "productividad": eval.productividad,
-                "cumple_sistema_gestion": eval.cumple_sistema_gestion,
-                "total_puntos": eval.total_puntos,
-                "porcentaje_calificacion": eval.porcentaje_calificacion,
-                "acuerdos_mejora_desempeno_colaborador": eval.acuerdos_mejora_desempeno_colaborador,
-                "acuerdos_mejora_desempeno_jefe": eval.acuerdos_mejora_desempeno_jefe,
-                "necesidades_desarrollo": eval.necesidades_desarrollo,
-                "aspectos_positivos": eval.aspectos_positivos,
-                "tarea": eval.tarea,
-            })
-        
+        query = consulta_historial_evaluaciones(cedula)
+        history = [ESQUEMA_HISTORIAL_EVALUACIONES.serializar(fila) for fila in db.session.execute(query)]
+
         return jsonify({
             "success": True,
             "history": history
@@ -539,7 +1344,7 @@ def get_evaluation_history():
         print(f"Error en el servidor: {str(e)}")
         return jsonify({"error": "Error al obtener el historial de evaluaciones"}), 500
     
-@app.route('/get_security_question', methods=['POST'])
+@bp.route('/get_security_question', methods=['POST'])
 def get_security_question():
     try:
         data = request.get_json()
@@ -547,12 +1352,12 @@ def get_security_question():
             return jsonify({"error": "Se requiere el nombre de usuario"}), 400
 
         username = data['username']
-        user = Usuario.query.filter_by(CEDULA=username).first()
+        user = obtener_usuario(username, fresco=True)
 
         if not user or not user.SEGURIDAD:
             return jsonify({"error": "Usuario no encontrado o sin pregunta de seguridad configurada"}), 404
 
-        security_data = user.SEGURIDAD.split(':')
+        security_data = user.SEGURIDAD.split(':', 1)
         if len(security_data) != 2:
             return jsonify({"error": "Formato de pregunta de seguridad inválido"}), 500
 
@@ -574,7 +1379,13 @@ def get_security_question():
         print(f"Error en el servidor: {str(e)}")
         return jsonify({"error": "Error interno del servidor"}), 500
 
-@app.route('/verify_security_answer', methods=['POST'])
+def _respuesta_incorrecta(respuesta):
+    # Una respuesta incorrecta se contesta con 200 y success False
+    return respuesta.status_code == 404 or (respuesta.status_code == 200 and respuesta.get_json(silent=True).get("success") is False)
+
+
+@bp.route('/verify_security_answer', methods=['POST'])
+@limitar('username', _respuesta_incorrecta)
 def verify_security_answer():
     try:
         data = request.get_json()
@@ -584,23 +1395,23 @@ def verify_security_answer():
         username = data['username']
         security_answer = data['securityAnswer']
 
-        user = Usuario.query.filter_by(CEDULA=username).first()
+        user = obtener_usuario(username, fresco=True)
 
         if not user or not user.SEGURIDAD:
             return jsonify({"error": "Usuario no encontrado"}), 404
 
-        stored_answer = user.SEGURIDAD.split(':')[1]
-
-        if security_answer.lower() == stored_answer.lower():
+        if verificar_respuesta_seguridad(user, security_answer):
             return jsonify({"success": True})
         else:
             return jsonify({"success": False, "error": "Respuesta incorrecta"})
 
+    except HashingSaturado:
+        return hashing_saturado()
     except Exception as e:
         print(f"Error en el servidor: {str(e)}")
         return jsonify({"error": "Error interno del servidor"}), 500
 
-@app.route('/reset_password', methods=['POST'])
+@bp.route('/reset_password', methods=['POST'])
 def reset_password():
     try:
         data = request.get_json()
@@ -618,28 +1429,36 @@ def reset_password():
         if len(new_password) < 8 or not any(c.isalpha() for c in new_password) or not any(c.isdigit() for c in new_password):
             return jsonify({"error": "La contraseña debe tener al menos 8 caracteres y contener letras y números"}), 400
 
-        user.CLAVE = new_password
+        user.CLAVE = hasher.hashear(new_password)
+        revocar_tokens_usuario(user.CEDULA)
         db.session.commit()
+        invalidar_usuario(username)
 
         return jsonify({
             "success": True,
             "message": "Contraseña actualizada correctamente"
         })
 
+    except HashingSaturado:
+        return hashing_saturado()
     except Exception as e:
         print(f"Error en el servidor: {str(e)}")
         return jsonify({"error": "Error interno del servidor"}), 500
     
 
-@app.route('/get_employees_under_leader', methods=['GET'])
+@bp.route('/get_employees_under_leader', methods=['GET'])
 def get_employees_under_leader():
     try:
         leader_cedula = request.args.get('cedula', type=str)  # Cambiado a str ya que LIDER es varchar
         if not leader_cedula:
             return jsonify({"error": "Se requiere la cédula del líder"}), 400
 
-        # Buscar empleados que tienen al líder especificado
-        employees = Usuario.query.filter_by(LIDER=leader_cedula).all()
+        # Buscar empleados que tienen al líder especificado (o toda su línea con transitivo=1)
+        indice = obtener_jerarquia()
+        if request.args.get('transitivo', default=0, type=int):
+            employees = indice.subordinados(leader_cedula)
+        else:
+            employees = indice.subordinados_directos(leader_cedula)
         
         if not employees:
             return jsonify({
@@ -648,25 +1467,13 @@ def get_employees_under_leader():
                 "message": "No se encontraron empleados para este líder"
             }), 200
 
-        leader = Usuario.query.filter_by(CEDULA=int(leader_cedula)).first()
+        leader = obtener_usuario(leader_cedula)
         if not leader:
             return jsonify({"error": "Líder no encontrado"}), 404
 
-        employee_list = []
-        for employee in employees:
-            employee_list.append({
-                "cedula": employee.CEDULA,
-                "nombre": employee.NOMBRE,
-                "cargo": employee.CARGO,
-                "centro_de_costo": employee.CENTRO_DE_COSTO,
-                "estado": employee.ESTADO,
-                "lider_evaluador": employee.LIDER_EVALUADOR,
-                "cargo_de_lider_evaluador": employee.CARGO_DE_LIDER_EVALUADOR
-            })
-
         return jsonify({
             "success": True,
-            "employees": employee_list,
+            "employees": [ESQUEMA_MIEMBRO.desde_objeto(employee) for employee in employees],
             "leader_info": {
                 "nombre": leader.NOMBRE,
                 "cargo": leader.CARGO,
@@ -682,122 +1489,804 @@ def get_employees_under_leader():
             "details": str(e)
         }), 500
 
-@app.route('/historial', methods=['GET'])
+@bp.route('/get_area_members', methods=['GET'])
+def get_area_members():
+    try:
+        area = request.args.get('area')
+        if not area:
+            return jsonify({"error": "Se requiere el área"}), 400
+
+        return jsonify({
+            "success": True,
+            "area": area,
+            "employees": [ESQUEMA_MIEMBRO.desde_objeto(miembro) for miembro in obtener_jerarquia().miembros_area(area)]
+        }), 200
+
+    except Exception as e:
+        print(f"Error en el servidor: {str(e)}")
+        return jsonify({"success": False, "error": "Error interno del servidor"}), 500
+
+LIMITE_BUSQUEDA = 50
+
+
+@bp.route('/users/search', methods=['GET'])
+def search_users():
+    try:
+        consulta = request.args.get('q', '').strip()
+        if not consulta:
+            return jsonify({"error": "Se requiere el texto a buscar"}), 400
+        limite = min(max(request.args.get('limit', default=10, type=int), 1), LIMITE_BUSQUEDA)
+
+        return jsonify({
+            "success": True,
+            "query": consulta,
+            "results": [ESQUEMA_MIEMBRO.desde_objeto(miembro) for miembro in obtener_jerarquia().buscar(consulta, limite)]
+        }), 200
+
+    except Exception as e:
+        print(f"Error en el servidor: {str(e)}")
+        return jsonify({"success": False, "error": "Error interno del servidor"}), 500
+
+def puede_ver_historial(usuario):
+    return usuario.CARGO.startswith('DIRECTOR') or usuario.CARGO.startswith('COORDINADOR')
+
+
+def consulta_historial_area(usuario):
+    area = usuario.CENTRO_DE_COSTO
+    query = ESQUEMA_HISTORIAL_AREA.select().where(Evaluacion.area_jefe_pertenencia == area)
+
+    if usuario.CARGO.startswith('DIRECTOR'):
+        query = query.where(~Evaluacion.cargo.startswith('COORDINADOR'))
+    elif usuario.CARGO.startswith('COORDINADOR'):
+        query = query.where(~Evaluacion.cargo.startswith('DIRECTOR'))
+
+    return query.order_by(Evaluacion.marca_temporal.desc())
+
+
+def respuesta_historial(usuario, filas):
+    return {
+        "historial": [ESQUEMA_HISTORIAL_AREA.serializar(fila) for fila in filas],
+        "nombre_lider": usuario.NOMBRE,
+        "cargo_lider": usuario.CARGO
+    }
+
+
+@bp.route('/historial', methods=['GET'])
+@solo_lectura
+@condicional(lambda: version_datos(Evaluacion.__tablename__, Usuario.__tablename__))
 def get_historial():
     cedula = request.args.get('cedula', type=int)
     if not cedula:
         return jsonify({"error": "Se requiere la cédula del usuario"}), 400
 
-    usuario = Usuario.query.get(cedula)
+    usuario = obtener_usuario(cedula)
     if not usuario:
         return jsonify({"error": "Usuario no encontrado"}), 404
 
-    if not (usuario.CARGO.startswith('DIRECTOR') or usuario.CARGO.startswith('COORDINADOR')):
+    if not puede_ver_historial(usuario):
         return jsonify({"error": "No tienes permiso para ver el historial"}), 403
 
-    area = usuario.CENTRO_DE_COSTO
-    query = Evaluacion.query.filter(Evaluacion.area_jefe_pertenencia == area)
+    filas = db.session.execute(consulta_historial_area(usuario))
+    return jsonify(respuesta_historial(usuario, filas)), 200
 
-    if usuario.CARGO.startswith('DIRECTOR'):
-        query = query.filter(~Evaluacion.cargo.startswith('COORDINADOR'))
-    elif usuario.CARGO.startswith('COORDINADOR'):
-        query = query.filter(~Evaluacion.cargo.startswith('DIRECTOR'))
-
-    evaluaciones = query.order_by(Evaluacion.marca_temporal.desc()).all()
-
-    historial = []
-    for evaluacion in evaluaciones:
-        historial.append({
-            "id": evaluacion.id,
-            "nombre": evaluacion.nombres_apellidos,
-            "cedula": evaluacion.cedula,
-            "cargo": evaluacion.cargo,
-            "fecha": evaluacion.marca_temporal,
-            "puntaje_total": evaluacion.total_puntos,
-            "porcentaje_calificacion": evaluacion.porcentaje_calificacion
-        })
 
-    return jsonify({
-        "historial": historial,
-        "nombre_lider": usuario.NOMBRE,
-        "cargo_lider": usuario.CARGO
-    }), 200
+# Sincronización incremental para clientes con copia local (dashboards, exportaciones).
+# El cursor es "<id de evaluación>.<id de cambios_usuarios>": las evaluaciones solo se
+# insertan, así que basta el mayor id ya entregado; de los usuarios se devuelve el estado
+# actual de las cédulas registradas después del cursor, y las que ya no existen como
+# eliminadas. Ambos ids se confirman en orden (ver reservar_secuencia).
+#
+# Para empezar: pedir /changes sin `since` (solo devuelve el cursor actual), descargar
+# todo con /get_all_evaluations y /get_all_users y desde ahí pedir /changes?since=.
+LIMITE_CAMBIOS = 1000
+
+
+def cursor_actual():
+    evaluaciones = db.session.execute(db.select(db.func.max(Evaluacion.id))).scalar() or 0
+    usuarios = db.session.execute(db.select(db.func.max(CambioUsuario.id))).scalar() or 0
+    return evaluaciones, usuarios
+
 
-@app.route('/get_user_details', methods=['GET'])
+def leer_cursor(valor):
+    partes = valor.split('.')
+    if len(partes) != 2 or not all(parte.isdigit() for parte in partes):
+        raise ValueError("Cursor inválido")
+    return int(partes[0]), int(partes[1])
+
+
+@bp.route('/changes', methods=['GET'])
+@solo_lectura
+@condicional(lambda: version_datos(Evaluacion.__tablename__, Usuario.__tablename__))
+def get_changes():
+    try:
+        maximo_evaluacion, maximo_usuario = cursor_actual()
+        since = request.args.get('since')
+        if not since:
+            return jsonify({"success": True, "cursor": f"{maximo_evaluacion}.{maximo_usuario}", "more": False})
+        try:
+            desde_evaluacion, desde_usuario = leer_cursor(since)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        if (desde_evaluacion > maximo_evaluacion or desde_usuario > maximo_usuario) and CLAVE_REPLICA in db.session.info:
+            # El cursor puede venir de la primaria y la réplica aún no llegar a él
+            db.session.info.pop(CLAVE_REPLICA)
+            maximo_evaluacion, maximo_usuario = cursor_actual()
+        if desde_evaluacion > maximo_evaluacion or desde_usuario > maximo_usuario:
+            # Cursor de otra base de datos o de una restaurada: hay que descargar todo de nuevo
+            return jsonify({"success": False, "error": "El cursor ya no es válido, sincronice de nuevo"}), 410
+        limite = max(1, min(request.args.get('limit', default=LIMITE_CAMBIOS, type=int), 5000))
+
+        evaluaciones = db.session.execute(
+            ESQUEMA_EVALUACION.select()
+            .where(Evaluacion.id > desde_evaluacion)
+            .order_by(Evaluacion.id)
+            .limit(limite)
+        ).all()
+        cambios = db.session.execute(
+            db.select(CambioUsuario.id, CambioUsuario.cedula)
+            .where(CambioUsuario.id > desde_usuario)
+            .order_by(CambioUsuario.id)
+            .limit(limite)
+        ).all()
+        cedulas = list(dict.fromkeys(cambio.cedula for cambio in cambios))
+        usuarios = db.session.execute(
+            ESQUEMA_USUARIO.select().where(Usuario.CEDULA.in_(cedulas)).order_by(Usuario.CEDULA)
+        ).all() if cedulas else []
+        vigentes = {usuario.CEDULA for usuario in usuarios}
+
+        hasta_evaluacion = evaluaciones[-1].id if evaluaciones else desde_evaluacion
+        hasta_usuario = cambios[-1].id if cambios else desde_usuario
+        return jsonify({
+            "success": True,
+            "cursor": f"{hasta_evaluacion}.{hasta_usuario}",
+            "more": len(evaluaciones) == limite or len(cambios) == limite,
+            "evaluations": {
+                "fields": ESQUEMA_EVALUACION.nombres,
+                "rows": [ESQUEMA_EVALUACION.valores(fila) for fila in evaluaciones],
+            },
+            "users": {
+                "fields": ESQUEMA_USUARIO.nombres,
+                "rows": [ESQUEMA_USUARIO.valores(fila) for fila in usuarios],
+                "deleted": [cedula for cedula in cedulas if cedula not in vigentes],
+            },
+        })
+    except Exception as e:
+        logging.error(f"Error al obtener cambios: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@bp.route('/get_user_details', methods=['GET'])
 def get_user_details():
     cedula = request.args.get('cedula', type=int)
     if not cedula:
         return jsonify({"error": "Se requiere la cédula del usuario"}), 400
 
-    usuario = Usuario.query.get(cedula)
+    usuario = obtener_usuario(cedula)
     if not usuario:
         return jsonify({"error": "Usuario no encontrado"}), 404
 
     return jsonify({
         "cedula": usuario.CEDULA,
-        "nombre": usuario.NOMBRE,
-        "cargo": usuario.CARGO,
-        "centro_de_costo": usuario.CENTRO_DE_COSTO,
+        **ESQUEMA_PERFIL_USUARIO.desde_objeto(usuario),
         "fecha_ingreso": f"{usuario.ANO_INGRESO}-{usuario.MES_INGRESO}-01",
-        "antiguedad": usuario.ANTIGUEDAD,
-        "centro_de_costo": usuario.CENTRO_DE_COSTO,
-        "lider_evaluador": usuario.LIDER_EVALUADOR,
-        "cargo_de_lider_evaluador": usuario.CARGO_DE_LIDER_EVALUADOR,
-        "estado": usuario.ESTADO,
-        "ano_ingreso": usuario.ANO_INGRESO,
-        "mes_ingreso": usuario.MES_INGRESO,
-        "anos": usuario.ANOS,
-        "antiguedad": usuario.ANTIGUEDAD
     }), 200
     
     
-@app.route('/get_employee_stats', methods=['GET'])
+def consulta_estadisticas_empleado(cedula):
+    # Una fila por año desde el resumen. El año va al final de la fila: el serializador
+    # solo toma las columnas del esquema.
+    return (ESQUEMA_ESTADISTICAS_EMPLEADO.select(ResumenEmpleadoAnio.anio)
+            .where(ResumenEmpleadoAnio.cedula == cedula)
+            .order_by(ResumenEmpleadoAnio.anio))
+
+
+def respuesta_estadisticas_empleado(filas):
+    return {
+        "anios": [fila.anio for fila in filas],
+        "resultados": {fila.anio: ESQUEMA_ESTADISTICAS_EMPLEADO.serializar(fila) for fila in filas}
+    }
+
+
+@bp.route('/get_employee_stats', methods=['GET'])
+@solo_lectura
 def get_employee_stats():
     cedula = request.args.get('cedula')
     if not cedula:
         return jsonify({"error": "Se requiere la cédula del empleado"}), 400
 
-    evaluaciones =Evaluacion.query.filter_by(cedula=cedula).all()
+    filas = db.session.execute(consulta_estadisticas_empleado(cedula)).all()
 
-    if not evaluaciones:
+    if not filas:
         return jsonify({"error": "No se encontraron evaluaciones para este empleado"}), 404
 
-    anios = sorted(set(eval.anio for eval in evaluaciones))
-    resultados = {}
-
-    for evaluacion in evaluaciones:
-        resultados[evaluacion.anio] = {
-            "total_puntos": evaluacion.total_puntos,
-            "porcentaje_calificacion": evaluacion.porcentaje_calificacion,
-            "compromiso": evaluacion.compromiso_pasion_entrega,
-            "honestidad": evaluacion.honestidad,
-            "respeto": evaluacion.respeto,
-            "sencillez": evaluacion.sencillez,
-            "servicio": evaluacion.servicio,
-            "trabajo_en_equipo": evaluacion.trabajo_equipo,
-            "conocimiento": evaluacion.conocimiento_trabajo,
-            "productividad": evaluacion.productividad,
-            "gestion": evaluacion.cumple_sistema_gestion,
-            "tarea": evaluacion.tarea
-        }
+    return jsonify(respuesta_estadisticas_empleado(filas))
+
+
+# Agregaciones para el dashboard de administración: se calculan en la base de datos
+# para no enviar todas las evaluaciones al navegador.
+RANGOS_CALIFICACION = [
+    ("0-25", "Insuficiente", 25),
+    ("26-50", "Regular", 50),
+    ("51-75", "Bueno", 75),
+    ("76-100", "Excelente", None),
+]
+
+PORCENTAJE = Evaluacion.porcentaje_calificacion
+
+
+def _stats_filters(query):
+    anio = request.args.get('anio', type=int)
+    area = request.args.get('area')
+    if anio:
+        query = query.where(Evaluacion.anio == anio)
+    if area:
+        query = query.where(Evaluacion.area_jefe_pertenencia == area)
+    return query
+
+
+def _round(value):
+    return round(float(value), 2) if value is not None else None
+
+
+@bp.route('/stats/summary', methods=['GET'])
+@solo_lectura
+def get_stats_summary():
+    try:
+        query = _stats_filters(db.select(
+            db.func.count(Evaluacion.id),
+            db.func.avg(PORCENTAJE),
+            db.func.sum(db.case((PORCENTAJE >= 90, 1), else_=0)),
+            db.func.sum(db.case(((PORCENTAJE >= 60) & (PORCENTAJE < 90), 1), else_=0)),
+            db.func.sum(db.case((PORCENTAJE < 60, 1), else_=0)),
+        ))
+        total, promedio, altos, medios, bajos = db.session.execute(query).one()
+
+        return jsonify({
+            "success": True,
+            "totalEvaluations": total,
+            "averageScore": _round(promedio) or 0,
+            "highPerformers": int(altos or 0),
+            "midPerformers": int(medios or 0),
+            "lowPerformers": int(bajos or 0),
+        })
+    except Exception as e:
+        logging.error(f"Error al calcular el resumen: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
 
+@bp.route('/stats/areas', methods=['GET'])
+@solo_lectura
+def get_stats_areas():
+    try:
+        query = _stats_filters(
+            db.select(Evaluacion.area_jefe_pertenencia, db.func.avg(PORCENTAJE), db.func.count(Evaluacion.id))
+            .group_by(Evaluacion.area_jefe_pertenencia)
+            .order_by(db.func.avg(PORCENTAJE).desc())
+        )
+
+        return jsonify({
+            "success": True,
+            "areas": [
+                {"area_jefe_pertenencia": area, "average": _round(promedio), "count": total}
+                for area, promedio, total in db.session.execute(query)
+            ]
+        })
+    except Exception as e:
+        logging.error(f"Error al calcular promedios por área: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route('/stats/years', methods=['GET'])
+@solo_lectura
+def get_stats_years():
+    try:
+        query = _stats_filters(
+            db.select(Evaluacion.anio, db.func.avg(PORCENTAJE), db.func.count(Evaluacion.id))
+            .group_by(Evaluacion.anio)
+            .order_by(Evaluacion.anio)
+        )
+
+        return jsonify({
+            "success": True,
+            "years": [
+                {"year": anio, "average": _round(promedio), "count": total}
+                for anio, promedio, total in db.session.execute(query)
+            ]
+        })
+    except Exception as e:
+        logging.error(f"Error al calcular promedios por año: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route('/stats/competencies', methods=['GET'])
+@solo_lectura
+def get_stats_competencies():
+    try:
+        query = _stats_filters(db.select(*[db.func.avg(columna) for columna in COMPETENCIAS.values()]))
+        promedios = db.session.execute(query).one()
+
+        return jsonify({
+            "success": True,
+            "competencies": [
+                {"name": nombre, "average": _round(promedio)}
+                for nombre, promedio in zip(COMPETENCIAS, promedios)
+            ]
+        })
+    except Exception as e:
+        logging.error(f"Error al calcular promedios por competencia: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route('/stats/distribution', methods=['GET'])
+@solo_lectura
+def get_stats_distribution():
+    try:
+        rango = db.case(
+            *[(PORCENTAJE <= limite, nombre) for nombre, _, limite in RANGOS_CALIFICACION if limite is not None],
+            else_=RANGOS_CALIFICACION[-1][0],
+        ).label('rango')
+        query = _stats_filters(db.select(rango, db.func.count(Evaluacion.id)).group_by(rango))
+        conteos = dict(db.session.execute(query).all())
+
+        return jsonify({
+            "success": True,
+            "totalEvaluations": sum(conteos.values()),
+            "distribution": [
+                {"name": nombre, "label": etiqueta, "value": conteos.get(nombre, 0)}
+                for nombre, etiqueta, _ in RANGOS_CALIFICACION
+            ]
+        })
+    except Exception as e:
+        logging.error(f"Error al calcular la distribución de calificaciones: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route('/stats/top_performers', methods=['GET'])
+@solo_lectura
+def get_stats_top_performers():
+    try:
+        limite = max(1, min(request.args.get('limit', default=5, type=int), 100))
+        por_area = request.args.get('por_area', default=0, type=int)
+
+        columnas = [
+            Evaluacion.nombres_apellidos,
+            Evaluacion.cedula,
+            Evaluacion.cargo,
+            Evaluacion.area_jefe_pertenencia,
+            Evaluacion.anio,
+            PORCENTAJE,
+        ]
+        if por_area:
+            # Top N dentro de cada área usando una función de ventana
+            posicion = db.func.row_number().over(
+                partition_by=Evaluacion.area_jefe_pertenencia,
+                order_by=(PORCENTAJE.desc(), Evaluacion.id),
+            ).label('posicion')
+            ranking = _stats_filters(db.select(*columnas, posicion)).subquery()
+            query = (
+                db.select(ranking)
+                .where(ranking.c.posicion <= limite)
+                .order_by(ranking.c.area_jefe_pertenencia, ranking.c.posicion)
+            )
+        else:
+            query = _stats_filters(db.select(*columnas)).order_by(PORCENTAJE.desc(), Evaluacion.id).limit(limite)
+
+        return jsonify({
+            "success": True,
+            "topPerformers": [
+                {
+                    "nombres_apellidos": fila.nombres_apellidos,
+                    "cedula": fila.cedula,
+                    "cargo": fila.cargo,
+                    "area_jefe_pertenencia": fila.area_jefe_pertenencia,
+                    "anio": fila.anio,
+                    "porcentaje_calificacion": _round(fila.porcentaje_calificacion),
+                } for fila in db.session.execute(query)
+            ]
+        })
+    except Exception as e:
+        logging.error(f"Error al obtener los mejores desempeños: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+# Analítica vectorizada (ver analytics.py): los arreglos y resultados se recalculan
+# solo cuando cambia la versión de la tabla de evaluaciones.
+analitica = analytics.Analitica(
+    maxsize=int(os.getenv('ANALYTICS_CACHE_SIZE', 128)),
+    ttl=float(os.getenv('ANALYTICS_CACHE_TTL', 3600)),
+    versiones=int(os.getenv('ANALYTICS_DATA_VERSIONS', 2)),
+)
+metricas.registrar_indicador('analytics_cache', "Estado de la caché de analítica", analitica.stats)
+
+
+def version_evaluaciones():
+    # Una sola consulta por petición: la usan el ETag y la clave de la caché
+    if 'version_evaluaciones' not in g:
+        g.version_evaluaciones = version_datos(Evaluacion.__tablename__)
+    return g.version_evaluaciones
+
+
+def _datos_analitica():
+    query = db.select(
+        Evaluacion.cedula, Evaluacion.nombres_apellidos, Evaluacion.anio, Evaluacion.area_jefe_pertenencia,
+        PORCENTAJE, *COMPETENCIAS.values(),
+    ).order_by(Evaluacion.cedula, Evaluacion.anio, Evaluacion.marca_temporal, Evaluacion.id)
+    return analytics.DatosEvaluaciones(db.session.execute(query), COMPETENCIAS)
+
+
+def _analitica(nombre, funcion, **parametros):
+    if not analytics.disponible():
+        return jsonify({"success": False, "error": "La analítica requiere numpy"}), 503
+    version, _ = version_evaluaciones()
+    resultado = analitica.calcular(
+        version, (nombre, *sorted(parametros.items())),
+        lambda datos: funcion(datos, **parametros), _datos_analitica,
+    )
+    return jsonify({"success": True, **resultado})
+
+
+@bp.route('/analytics/percentiles', methods=['GET'])
+@solo_lectura
+@condicional(version_evaluaciones)
+def get_analytics_percentiles():
+    try:
+        return _analitica(
+            'percentiles', lambda datos, **filtros: {"employees": analytics.percentiles(datos, **filtros)},
+            anio=request.args.get('anio', type=int), area=request.args.get('area'),
+            cedula=request.args.get('cedula', type=int),
+        )
+    except Exception as e:
+        logging.error(f"Error al calcular percentiles: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route('/analytics/correlations', methods=['GET'])
+@solo_lectura
+@condicional(version_evaluaciones)
+def get_analytics_correlations():
+    try:
+        metodo = request.args.get('method', 'pearson')
+        if metodo not in ('pearson', 'spearman'):
+            return jsonify({"success": False, "error": "method debe ser 'pearson' o 'spearman'"}), 400
+        return _analitica(
+            'correlaciones', analytics.correlaciones,
+            metodo=metodo, anio=request.args.get('anio', type=int), area=request.args.get('area'),
+        )
+    except Exception as e:
+        logging.error(f"Error al calcular correlaciones: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route('/analytics/distribution', methods=['GET'])
+@solo_lectura
+@condicional(version_evaluaciones)
+def get_analytics_distribution():
+    try:
+        return _analitica(
+            'distribucion', analytics.distribucion,
+            anio=request.args.get('anio', type=int), area=request.args.get('area'),
+        )
+    except Exception as e:
+        logging.error(f"Error al calcular la distribución por competencia: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+# Exportaciones completas de evaluaciones en segundo plano: POST /exports crea el
+# trabajo, GET /exports/<id> informa el progreso y /download sirve el archivo
+# (con soporte de Range para reanudar descargas).
+def _exportaciones():
+    return current_app.extensions['exportaciones']
+
+
+@bp.route('/exports', methods=['POST'])
+def create_export():
+    try:
+        data = request.get_json(silent=True) or {}
+        formato = data.get('formato', 'csv')
+        if formato not in formatos_disponibles():
+            if formato in LIBRERIAS_FORMATO:
+                return jsonify({
+                    "success": False,
+                    "error": f"El formato {formato} requiere {LIBRERIAS_FORMATO[formato]}, que no está instalado en el servidor"
+                }), 400
+            return jsonify({
+                "success": False,
+                "error": f"Formato no disponible. Opciones: {', '.join(formatos_disponibles())}"
+            }), 400
+
+        fields = data.get('fields')
+        esquema = ESQUEMA_EVALUACION
+        if fields:
+            nombres = fields.split(',') if isinstance(fields, str) else fields
+            nombres = [str(campo).strip() for campo in nombres if str(campo).strip()]
+            desconocidos = [campo for campo in nombres if campo not in ESQUEMA_EVALUACION]
+            if desconocidos:
+                return jsonify({"success": False, "error": f"Campos desconocidos: {', '.join(desconocidos)}"}), 400
+            esquema = ESQUEMA_EVALUACION.seleccionar(nombres)
+
+        condiciones = []
+        if data.get('anio'):
+            condiciones.append(Evaluacion.anio == int(data['anio']))
+        if data.get('area'):
+            condiciones.append(Evaluacion.area_jefe_pertenencia == data['area'])
+
+        app = current_app._get_current_object()
+        tamano_lote = app.config['EXPORT_CHUNK_SIZE']
+        query = esquema.select().where(*condiciones).order_by(Evaluacion.id)
+
+        def contar():
+            with app.app_context():
+                return db.session.execute(db.select(db.func.count(Evaluacion.id)).where(*condiciones)).scalar()
+
+        def lotes():
+            with app.app_context():
+                resultado = db.session.execute(query.execution_options(yield_per=tamano_lote))
+                for particion in resultado.partitions():
+                    yield particion
+
+        trabajo = _exportaciones().crear(formato, esquema, lotes, contar, {
+            "fields": list(esquema.nombres), "anio": data.get('anio'), "area": data.get('area')
+        })
+        return jsonify({"success": True, "job": trabajo}), 202, {"Location": f"/exports/{trabajo['id']}"}
+    except ValueError as e:
+        return jsonify({"success": False, "error": f"Parámetros inválidos: {str(e)}"}), 400
+    except Exception as e:
+        logging.error(f"Error al crear la exportación: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route('/exports', methods=['GET'])
+def list_exports():
+    gestor = _exportaciones()
     return jsonify({
-        "anios": anios,
-        "resultados": resultados
+        "success": True,
+        "formats": formatos_disponibles(),
+        "jobs": [gestor.publico(trabajo) for trabajo in gestor.listar()]
     })
-    
-@app.route('/')
+
+
+@bp.route('/exports/<trabajo_id>', methods=['GET'])
+def get_export(trabajo_id):
+    gestor = _exportaciones()
+    trabajo = gestor.obtener(trabajo_id)
+    if not trabajo:
+        return jsonify({"success": False, "error": "Exportación no encontrada"}), 404
+    return jsonify({"success": True, "job": gestor.publico(trabajo)})
+
+
+@bp.route('/exports/<trabajo_id>/download', methods=['GET'])
+def download_export(trabajo_id):
+    gestor = _exportaciones()
+    trabajo = gestor.obtener(trabajo_id)
+    if not trabajo:
+        return jsonify({"success": False, "error": "Exportación no encontrada"}), 404
+    if trabajo['estado'] != 'terminado':
+        return jsonify({"success": False, "error": "La exportación no ha terminado", "job": gestor.publico(trabajo)}), 409
+
+    # conditional=True responde Range/If-Range con 206 y valida ETag/Last-Modified
+    return send_file(
+        gestor.archivo(trabajo),
+        mimetype=TIPOS_MIME[trabajo['formato']],
+        as_attachment=True,
+        download_name=f"evaluaciones_{trabajo['id'][:8]}.{trabajo['formato']}",
+        conditional=True,
+        max_age=0,
+    )
+
+
+@bp.route('/exports/<trabajo_id>', methods=['DELETE'])
+def delete_export(trabajo_id):
+    gestor = _exportaciones()
+    trabajo = gestor.obtener(trabajo_id)
+    if not trabajo:
+        return jsonify({"success": False, "error": "Exportación no encontrada"}), 404
+    if trabajo['estado'] in ('pendiente', 'en_curso'):
+        return jsonify({"success": False, "error": "La exportación sigue en curso"}), 409
+    gestor.eliminar(trabajo_id)
+    return jsonify({"success": True})
+
+
+# Instantáneas estáticas para el frontend (ver snapshots.py). Se generan con el
+# comando generate-snapshots y se sirven aquí con su variante precomprimida.
+def _snapshots():
+    return current_app.extensions['snapshots']
+
+
+def conjuntos_snapshot():
+    evaluaciones = db.session.execute(ESQUEMA_SNAPSHOT_EVALUACIONES.select().order_by(Evaluacion.id))
+    evaluaciones = [ESQUEMA_SNAPSHOT_EVALUACIONES.serializar(fila) for fila in evaluaciones]
+    usuarios = db.session.execute(ESQUEMA_SNAPSHOT_USUARIOS.select().order_by(Usuario.CEDULA))
+    usuarios = [ESQUEMA_SNAPSHOT_USUARIOS.serializar(fila) for fila in usuarios]
+    return {
+        'data': (evaluaciones, {'anio': 'anio', 'area': 'area_jefe_pertenencia'}),
+        'usuarios_data': (usuarios, {'area': 'CENTRO DE COSTO'}),
+    }
+
+
+@bp.route('/snapshots/<nombre>', methods=['GET'])
+def get_snapshot(nombre):
+    aceptadas = {codificacion for codificacion in ('br', 'gzip') if request.accept_encodings[codificacion]}
+    ruta, codificacion = _snapshots().resolver(nombre, aceptadas)
+    if ruta is None:
+        return jsonify({"success": False, "error": "Instantánea no encontrada"}), 404
+
+    respuesta = send_file(ruta, mimetype='application/json', conditional=True)
+    if codificacion:
+        respuesta.headers['Content-Encoding'] = codificacion
+    respuesta.vary.add('Accept-Encoding')
+    # Los archivos con hash no cambian nunca; manifest.json se revalida siempre
+    respuesta.headers['Cache-Control'] = ('public, max-age=31536000, immutable' if ES_HASHEADO.search(nombre)
+                                          else 'no-cache')
+    return respuesta
+
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(metricas.exportar(), mimetype='text/plain; version=0.0.4')
+
+
+@bp.route('/metrics/profile', methods=['GET', 'DELETE'])
+def metrics_profile():
+    if request.method == 'DELETE':
+        error = requiere_admin()
+        if error:
+            return error
+        metricas.reiniciar_perfil()
+        return jsonify({"success": True})
+    limite = min(request.args.get('limit', 40, type=int), 500)
+    orden = request.args.get('sort', 'cumulative')
+    if orden not in ('cumulative', 'tottime', 'calls'):
+        return jsonify({"success": False, "error": "sort debe ser cumulative, tottime o calls"}), 400
+    return Response(metricas.perfil(limite, orden), mimetype='text/plain')
+
+
+@bp.route('/')
 def hello():
     return "Backend de Evaluación de Desempeño funcionando correctamente"
 
+@bp.cli.command('db-upgrade')
+@click.argument('version', type=int, required=False)
+def db_upgrade(version):
+    """Aplica las migraciones pendientes (hasta VERSION si se indica)."""
+    for nombre in migrations.upgrade(db.engine, version):
+        print(f"Migración aplicada: {nombre}")
+    print(f"Versión actual del esquema: {migrations.version_actual(db.engine)}")
+
+
+@bp.cli.command('db-downgrade')
+@click.argument('version', type=int)
+def db_downgrade(version):
+    """Revierte las migraciones posteriores a VERSION."""
+    for nombre in migrations.downgrade(db.engine, version):
+        print(f"Migración revertida: {nombre}")
+    print(f"Versión actual del esquema: {migrations.version_actual(db.engine)}")
+
+
+@bp.cli.command('rebuild-employee-summary')
+def rebuild_employee_summary():
+    """Reconstruye la tabla resumen_empleado_anio desde todas las evaluaciones."""
+    filas = summary.recalcular(db.session, Evaluacion.__table__, ResumenEmpleadoAnio.__table__)
+    db.session.commit()
+    print(f"Resumen reconstruido: {filas} filas (empleado, año)")
+
+
+@bp.cli.command('check-replicas')
+def check_replicas():
+    """Muestra si cada réplica de lectura responde y cuánto va atrasada."""
+    if not enrutador_replicas.replicas:
+        print("No hay réplicas configuradas (DATABASE_REPLICA_URLS)")
+        return
+    enrutador_replicas.revisar()
+    for replica in enrutador_replicas.replicas:
+        estado = enrutador_replicas.estados[replica]
+        if not estado["sana"]:
+            print(f"{replica}: fuera de servicio ({estado['error']})")
+        else:
+            pendientes = ', '.join(sorted(estado["pendientes"])) or 'ninguna'
+            print(f"{replica}: retraso {estado['retraso']:.1f} s, tablas pendientes: {pendientes}")
+
+
+@bp.cli.command('generate-snapshots')
+@click.option('--destino', type=click.Path(file_okay=False), help="Directorio de salida; por defecto SNAPSHOT_DIR.")
+@click.option('--copias-estables', is_flag=True, help="Escribe también data.json y usuarios_data.json sin hash.")
+@click.option('--forzar', is_flag=True, help="Regenera aunque los datos no hayan cambiado.")
+def generate_snapshots(destino, copias_estables, forzar):
+    """Genera las instantáneas JSON de evaluaciones y usuarios y su manifest.json."""
+    generador = _snapshots()
+    if destino:
+        generador = GeneradorSnapshots(destino, generador.retencion, generador.calidad_br)
+    # Las versiones se leen antes que los datos: si algo se escribe entre medio, la
+    # siguiente ejecución vuelve a generar
+    versiones = {tabla: version_datos(tabla)[0] for tabla in (Evaluacion.__tablename__, Usuario.__tablename__)}
+    anterior = generador.manifiesto()
+    if not forzar and anterior and anterior.get('versiones') == versiones:
+        print("Sin cambios desde la última generación")
+        return
+
+    manifiesto = generador.publicar(conjuntos_snapshot(), versiones, copias_estables)
+    for nombre, conjunto in manifiesto['conjuntos'].items():
+        particiones = sum(len(grupos) for grupos in conjunto['particiones'].values())
+        print(f"{nombre}: {conjunto['archivo']} ({conjunto['filas']} filas, {particiones} particiones)")
+    print(f"Manifiesto en {os.path.join(generador.directorio, 'manifest.json')}")
+
+
+@bp.cli.command('import-users')
+@click.argument('ruta', type=click.Path(exists=True, dir_okay=False))
+@click.option('--formato', type=click.Choice(['csv', 'json']), help="Por defecto se deduce de la extensión.")
+@click.option('--lote', default=500, show_default=True, help="Filas por upsert.")
+def import_users_command(ruta, formato, lote):
+    """Importa o actualiza usuarios desde un archivo CSV o JSON."""
+    formato = formato or ('csv' if ruta.lower().endswith('.csv') else 'json')
+    with open(ruta, encoding='utf-8-sig', newline='') as archivo:
+        resumen = importar_usuarios(archivo, formato, lote)
+    print(f"Insertados: {resumen['inserted']}  Actualizados: {resumen['updated']}  Rechazados: {resumen['rejected']}")
+    for error in resumen['errors']:
+        print(f"  Fila {error['row']}: {error['error']}")
+    if 'interrupted' in resumen:
+        interrupcion = resumen['interrupted']
+        raise click.ClickException(
+            f"Archivo inválido en el registro {interrupcion['row']}: {interrupcion['error']}. "
+            "Los registros anteriores quedaron importados."
+        )
+
+
+def create_app(config=None):
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if config:
+        app.config.update(config)
+        if 'SQLALCHEMY_DATABASE_URI' in config and 'SQLALCHEMY_ENGINE_OPTIONS' not in config:
+            app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opciones_motor(config['SQLALCHEMY_DATABASE_URI'])
+
+    if not app.config['SECRET_KEY']:
+        logging.warning("SECRET_KEY no está configurada: se usa una clave aleatoria para este proceso")
+        app.config['SECRET_KEY'] = secrets.token_hex(32)
+
+    app.json_provider_class = proveedor_json(app.config['JSON_PROVIDER'])
+    app.json = app.json_provider_class(app)
+
+    if app.config['PROXY_FIX_X_FOR']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+
+    CORS(app, resources={r"/*": {"origins": "*"}})
+    db.init_app(app)
+    metricas.init_app(app)
+    hasher.init_app(app)
+    emisor_tokens.init_app(app)
+    enrutador_replicas.init_app(app, db, VersionTabla.__table__)
+    if enrutador_replicas.replicas:
+        metricas.registrar_indicador('replicas', "Estado de las réplicas de lectura", enrutador_replicas.stats)
+    limitador = Limitador(app)
+    if isinstance(limitador.almacen, AlmacenMemoria):
+        metricas.registrar_indicador('rate_limiter', "Claves en el limitador de intentos", limitador.almacen.stats)
+    app.extensions['exportaciones'] = GestorExportaciones(
+        app.config['EXPORT_DIR'],
+        max_workers=app.config['EXPORT_WORKERS'],
+        retencion=app.config['EXPORT_RETENTION_HOURS'] * 3600,
+    )
+    app.extensions['snapshots'] = GeneradorSnapshots(
+        app.config['SNAPSHOT_DIR'],
+        retencion=app.config['SNAPSHOT_RETENTION_HOURS'] * 3600,
+        calidad_br=app.config['SNAPSHOT_BR_QUALITY'],
+    )
+    # Se registra después de las métricas para que estas midan los bytes comprimidos
+    compresion = Compresion(app)
+    metricas.registrar_indicador('compression_cache', "Cuerpos comprimidos reutilizados", compresion.comprimidos.stats)
+    app.register_blueprint(bp)
+    return app
+
+
 if __name__ == '__main__':
+    # Servidor de desarrollo; en producción se usa wsgi.py (ver gunicorn.conf.py)
+    app = create_app()
     with app.app_context():
         try:
             db.create_all()
             print("Tablas creadas exitosamente")
+            migrations.upgrade(db.engine)
+            print(f"Esquema en la versión {migrations.version_actual(db.engine)}")
         except Exception as e:
             print(f"Error al crear las tablas: {str(e)}")
     
     port = int(os.getenv('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=True)
+    app.run(host='0.0.0.0', port=port, debug=os.getenv('FLASK_DEBUG') == '1')
 
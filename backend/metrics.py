@@ -0,0 +1,224 @@
+# Métricas por petición en formato de texto de Prometheus.
+#
+# Registra por ruta: latencia, número y tiempo de consultas SQL (con eventos del motor
+# de SQLAlchemy), tiempo fuera de la base de datos y tamaño de la respuesta. Las
+# consultas más lentas que SLOW_QUERY_MS se registran en el log. Con
+# PROFILE_SAMPLE_RATE > 0 se perfila con cProfile esa fracción de las peticiones.
+#
+# Los valores son por proceso: con varios workers de gunicorn cada uno expone los suyos.
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from collections import defaultdict
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100)
+BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histograma:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.conteos = [0] * len(buckets)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        for posicion, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.conteos[posicion] += 1
+                break
+        self.suma += valor
+        self.total += 1
+
+    def lineas(self, nombre, etiquetas):
+        acumulado = 0
+        for limite, conteo in zip(self.buckets, self.conteos):
+            acumulado += conteo
+            yield f'{nombre}_bucket{{{etiquetas},le="{limite}"}} {acumulado}'
+        yield f'{nombre}_bucket{{{etiquetas},le="+Inf"}} {self.total}'
+        yield f'{nombre}_sum{{{etiquetas}}} {self.suma:.6f}'
+        yield f'{nombre}_count{{{etiquetas}}} {self.total}'
+
+
+def _etiquetas(**valores):
+    return ','.join(f'{clave}="{str(valor).replace(chr(34), chr(39))}"' for clave, valor in valores.items())
+
+
+class Metricas:
+    HISTOGRAMAS = {
+        'http_request_duration_seconds': ("Latencia de la petición", BUCKETS_SEGUNDOS),
+        'http_request_db_seconds': ("Tiempo en consultas SQL por petición", BUCKETS_SEGUNDOS),
+        'http_request_app_seconds': ("Tiempo fuera de la base de datos (lógica y serialización)", BUCKETS_SEGUNDOS),
+        'http_request_db_queries': ("Consultas SQL por petición", BUCKETS_CONSULTAS),
+        'http_response_size_bytes': ("Tamaño del cuerpo de la respuesta", BUCKETS_BYTES),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histogramas = {nombre: {} for nombre in self.HISTOGRAMAS}
+        self._peticiones = defaultdict(int)
+        self._consultas_lentas = defaultdict(int)
+        self._contadores = {}
+        self._indicadores = {}
+        self._perfil = None
+        self.consulta_lenta_ms = float(os.getenv('SLOW_QUERY_MS', 500))
+        self.tasa_perfilado = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+
+    def init_app(self, app):
+        app.before_request(self._antes)
+        app.after_request(self._despues)
+        # Si la ruta lanza una excepción after_request no corre: el perfil se cierra aquí
+        app.teardown_request(self._cerrar_perfil)
+        self._escuchar_motor()
+
+    def _escuchar_motor(self):
+        # Se escucha en la clase Engine para cubrir todos los motores (incluidas réplicas)
+        if event.contains(Engine, 'before_cursor_execute', _antes_de_consulta):
+            return
+        event.listen(Engine, 'before_cursor_execute', _antes_de_consulta)
+        event.listen(Engine, 'after_cursor_execute', _despues_de_consulta)
+        event.listen(Engine, 'handle_error', _error_de_consulta)
+
+    def _antes(self):
+        g.metricas_inicio = time.perf_counter()
+        g.metricas_consultas = 0
+        g.metricas_tiempo_db = 0.0
+        if self.tasa_perfilado and random.random() < self.tasa_perfilado:
+            g.metricas_perfil = cProfile.Profile()
+            g.metricas_perfil.enable()
+
+    def _despues(self, response):
+        inicio = g.pop('metricas_inicio', None)
+        if inicio is None:
+            return response
+        duracion = time.perf_counter() - inicio
+        self._cerrar_perfil()
+
+        ruta = request.url_rule.rule if request.url_rule else 'sin_ruta'
+        clave = (ruta, request.method)
+        tiempo_db = g.get('metricas_tiempo_db', 0.0)
+        observaciones = {
+            'http_request_duration_seconds': duracion,
+            'http_request_db_seconds': tiempo_db,
+            'http_request_app_seconds': max(duracion - tiempo_db, 0.0),
+            'http_request_db_queries': g.get('metricas_consultas', 0),
+        }
+        # En streaming el cuerpo se genera después: ni tamaño ni consultas del generador
+        if not response.is_streamed:
+            observaciones['http_response_size_bytes'] = response.calculate_content_length() or 0
+
+        with self._lock:
+            self._peticiones[(ruta, request.method, response.status_code)] += 1
+            for nombre, valor in observaciones.items():
+                histogramas = self._histogramas[nombre]
+                if clave not in histogramas:
+                    histogramas[clave] = Histograma(self.HISTOGRAMAS[nombre][1])
+                histogramas[clave].observar(valor)
+        return response
+
+    def _cerrar_perfil(self, error=None):
+        perfil = g.pop('metricas_perfil', None)
+        if perfil is None:
+            return
+        perfil.disable()
+        with self._lock:
+            if self._perfil is None:
+                self._perfil = pstats.Stats(perfil)
+            else:
+                self._perfil.add(perfil)
+
+    def registrar_consulta(self, duracion, sentencia):
+        if has_request_context():
+            g.metricas_consultas = g.get('metricas_consultas', 0) + 1
+            g.metricas_tiempo_db = g.get('metricas_tiempo_db', 0.0) + duracion
+        if duracion * 1000 >= self.consulta_lenta_ms:
+            ruta = request.url_rule.rule if has_request_context() and request.url_rule else 'sin_ruta'
+            with self._lock:
+                self._consultas_lentas[ruta] += 1
+            logging.warning(f"Consulta lenta ({duracion * 1000:.0f} ms) en {ruta}: {' '.join(sentencia.split())[:500]}")
+
+    def incrementar(self, nombre, ayuda, cantidad=1, **etiquetas):
+        # Contadores de otros módulos (por ejemplo, rechazos del limitador)
+        with self._lock:
+            _, valores = self._contadores.setdefault(nombre, (ayuda, defaultdict(int)))
+            valores[tuple(sorted(etiquetas.items()))] += cantidad
+
+    def registrar_indicador(self, nombre, ayuda, funcion):
+        # `funcion` devuelve un número o un dict {etiqueta: número} al momento de exportar
+        self._indicadores[nombre] = (ayuda, funcion)
+
+    def exportar(self):
+        lineas = []
+        with self._lock:
+            lineas += ['# HELP http_requests_total Peticiones atendidas', '# TYPE http_requests_total counter']
+            for (ruta, metodo, estado), total in sorted(self._peticiones.items()):
+                lineas.append(f'http_requests_total{{{_etiquetas(route=ruta, method=metodo, status=estado)}}} {total}')
+
+            for nombre, (ayuda, _) in self.HISTOGRAMAS.items():
+                lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} histogram']
+                for (ruta, metodo), histograma in sorted(self._histogramas[nombre].items()):
+                    lineas += histograma.lineas(nombre, _etiquetas(route=ruta, method=metodo))
+
+            lineas += [f'# HELP db_slow_queries_total Consultas de más de {self.consulta_lenta_ms:g} ms',
+                       '# TYPE db_slow_queries_total counter']
+            for ruta, total in sorted(self._consultas_lentas.items()):
+                lineas.append(f'db_slow_queries_total{{{_etiquetas(route=ruta)}}} {total}')
+
+            for nombre, (ayuda, valores) in sorted(self._contadores.items()):
+                lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} counter']
+                for etiquetas, total in sorted(valores.items()):
+                    lineas.append(f'{nombre}{{{_etiquetas(**dict(etiquetas))}}} {total}')
+
+        for nombre, (ayuda, funcion) in sorted(self._indicadores.items()):
+            lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} gauge']
+            valor = funcion()
+            if isinstance(valor, dict):
+                for etiqueta, numero in valor.items():
+                    lineas.append(f'{nombre}{{{_etiquetas(kind=etiqueta)}}} {numero}')
+            else:
+                lineas.append(f'{nombre} {valor}')
+        return '\n'.join(lineas) + '\n'
+
+    def perfil(self, limite=40, orden='cumulative'):
+        with self._lock:
+            if self._perfil is None:
+                return "Sin muestras: configure PROFILE_SAMPLE_RATE (por ejemplo 0.01)\n"
+            salida = io.StringIO()
+            self._perfil.stream = salida
+            self._perfil.sort_stats(orden).print_stats(limite)
+            return salida.getvalue()
+
+    def reiniciar_perfil(self):
+        with self._lock:
+            self._perfil = None
+
+
+metricas = Metricas()
+
+
+def _antes_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metricas_inicio', []).append(time.perf_counter())
+
+
+def _despues_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    inicios = conn.info.get('metricas_inicio')
+    if inicios:
+        metricas.registrar_consulta(time.perf_counter() - inicios.pop(), statement)
+
+
+def _error_de_consulta(contexto):
+    # La consulta falló: after_cursor_execute no corre y el inicio quedaría en la pila
+    conexion = contexto.connection
+    inicios = conexion.info.get('metricas_inicio') if conexion is not None else None
+    if inicios:
+        inicios.pop()
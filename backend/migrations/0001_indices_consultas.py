@@ -0,0 +1,26 @@
+# Índices secundarios para las consultas más frecuentes:
+#   - /evaluaciones, /get_evaluation_history y /get_employee_stats filtran por cédula
+#     y ordenan por marca_temporal.
+#   - /historial filtra por área y ordena por marca_temporal.
+#   - /stats/* agrupa por año y área.
+#   - /get_employees_under_leader filtra usuarios por LIDER.
+# En MySQL las columnas VARCHAR(512) se indexan por prefijo para respetar el límite
+# de 3072 bytes por índice con utf8mb4.
+from migrations import crear_indice, eliminar_indice
+
+
+def upgrade(conn):
+    crear_indice(conn, 'Colaboradores', 'ix_colaboradores_cedula_marca', ['cedula', 'marca_temporal'],
+                 mysql_length={'marca_temporal': 19})
+    crear_indice(conn, 'Colaboradores', 'ix_colaboradores_area_marca', ['area_jefe_pertenencia', 'marca_temporal'],
+                 mysql_length={'area_jefe_pertenencia': 191, 'marca_temporal': 19})
+    crear_indice(conn, 'Colaboradores', 'ix_colaboradores_anio_area', ['anio', 'area_jefe_pertenencia'],
+                 mysql_length={'area_jefe_pertenencia': 191})
+    crear_indice(conn, 'usuarios', 'ix_usuarios_lider', ['LIDER'])
+
+
+def downgrade(conn):
+    eliminar_indice(conn, 'usuarios', 'ix_usuarios_lider')
+    eliminar_indice(conn, 'Colaboradores', 'ix_colaboradores_anio_area')
+    eliminar_indice(conn, 'Colaboradores', 'ix_colaboradores_area_marca')
+    eliminar_indice(conn, 'Colaboradores', 'ix_colaboradores_cedula_marca')
@@ -0,0 +1,175 @@
+# Convierte Colaboradores.marca_temporal de VARCHAR a DATETIME y
+# Colaboradores.porcentaje_calificacion de VARCHAR a DECIMAL(5,2).
+#
+# Se crean columnas nuevas, se rellenan por lotes interpretando los textos en Python
+# (así un valor mal formado queda en NULL en vez de abortar la migración en modo
+# estricto de MySQL), y luego reemplazan a las originales. Si algún valor no se pudo
+# convertir, la columna original no se borra sino que queda como <columna>_original,
+# y downgrade restaura desde ella los textos exactos. Los índices que usaban un
+# prefijo de marca_temporal se recrean sobre la columna completa.
+import logging
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+import sqlalchemy as sa
+
+from migrations import crear_indice, eliminar_indice
+
+TABLA = 'Colaboradores'
+TAMANO_LOTE = 1000
+# Columna con los textos originales cuando alguno no se pudo convertir
+SUFIJO_RESPALDO = '_original'
+
+FORMATOS_MARCA = ("%Y-%m-%d %H:%M:%S", "%d/%m/%Y %H:%M:%S", "%Y-%m-%d", "%d/%m/%Y")
+
+
+def _a_fecha(valor):
+    if valor is None or isinstance(valor, datetime):
+        return valor
+    texto = str(valor).strip()
+    for formato in FORMATOS_MARCA:
+        try:
+            return datetime.strptime(texto, formato)
+        except ValueError:
+            continue
+    return None
+
+
+def _a_decimal(valor):
+    if valor is None:
+        return None
+    try:
+        return Decimal(str(valor).strip().rstrip('%').replace(',', '.')).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return None
+
+
+def _tipo_actual(conn, columna):
+    for info in sa.inspect(conn).get_columns(TABLA):
+        if info['name'] == columna:
+            return info['type']
+
+
+def _columnas(conn):
+    return {info['name'] for info in sa.inspect(conn).get_columns(TABLA)}
+
+
+def _q(conn, nombre):
+    return conn.dialect.identifier_preparer.quote(nombre)
+
+
+def _reemplazar_columnas(conn, tipos, convertir, restaurar_respaldo=False):
+    # En MySQL el DDL no es transaccional: si una ejecución anterior falló a mitad, las
+    # columnas _nuevo se descartan y se vuelven a llenar, y si la original ya se había
+    # quitado solo falta el renombre
+    tabla = _q(conn, TABLA)
+    existentes = _columnas(conn)
+    pendientes = {}
+    for columna, tipo in tipos.items():
+        nueva = columna + '_nuevo'
+        if columna not in existentes and nueva in existentes:
+            continue
+        if nueva in existentes:
+            conn.execute(sa.text(f"ALTER TABLE {tabla} DROP COLUMN {_q(conn, nueva)}"))
+        conn.execute(sa.text(f"ALTER TABLE {tabla} ADD COLUMN {_q(conn, nueva)} {tipo.compile(dialect=conn.dialect)}"))
+        pendientes[columna] = tipo
+
+    invalidos = {columna: [] for columna in pendientes}
+    if pendientes:
+        t = sa.table(
+            TABLA,
+            sa.column('id'),
+            *[sa.column(c, _tipo_actual(conn, c)) for c in pendientes],
+            *[sa.column(c + '_nuevo', tipo) for c, tipo in pendientes.items()],
+        )
+        ultimo_id = 0
+        while True:
+            filas = conn.execute(
+                sa.select(t.c.id, *[t.c[c] for c in pendientes]).where(t.c.id > ultimo_id).order_by(t.c.id).limit(TAMANO_LOTE)
+            ).all()
+            if not filas:
+                break
+            cambios = []
+            for fila in filas:
+                cambio = {'_id': fila[0]}
+                for posicion, columna in enumerate(pendientes, start=1):
+                    nuevo = convertir[columna](fila[posicion])
+                    if nuevo is None and fila[posicion] is not None:
+                        invalidos[columna].append(fila[0])
+                    cambio[columna + '_nuevo'] = nuevo
+                cambios.append(cambio)
+            conn.execute(
+                t.update().where(t.c.id == sa.bindparam('_id')),
+                cambios,
+            )
+            ultimo_id = filas[-1][0]
+
+    existentes = _columnas(conn)
+    for columna in tipos:
+        respaldo = columna + SUFIJO_RESPALDO
+        if restaurar_respaldo and columna in existentes and respaldo in existentes:
+            # Vuelve al texto exacto que había antes de upgrade
+            conn.execute(sa.text(
+                f"UPDATE {tabla} SET {_q(conn, columna + '_nuevo')} = {_q(conn, respaldo)} "
+                f"WHERE {_q(conn, respaldo)} IS NOT NULL"
+            ))
+        if columna in existentes:
+            if invalidos.get(columna):
+                # Ningún valor se pierde: la columna original se conserva como respaldo
+                ids = ', '.join(str(i) for i in invalidos[columna][:10])
+                logging.warning(
+                    f"{len(invalidos[columna])} valores de {columna} no se pudieron convertir y quedaron en NULL "
+                    f"(ids {ids}...); los originales se conservan en {respaldo}"
+                )
+                conn.execute(sa.text(f"ALTER TABLE {tabla} RENAME COLUMN {_q(conn, columna)} TO {_q(conn, respaldo)}"))
+            else:
+                conn.execute(sa.text(f"ALTER TABLE {tabla} DROP COLUMN {_q(conn, columna)}"))
+        conn.execute(sa.text(
+            f"ALTER TABLE {tabla} RENAME COLUMN {_q(conn, columna + '_nuevo')} TO {_q(conn, columna)}"
+        ))
+        if restaurar_respaldo and respaldo in existentes:
+            conn.execute(sa.text(f"ALTER TABLE {tabla} DROP COLUMN {_q(conn, respaldo)}"))
+
+
+def upgrade(conn):
+    # Esquema creado directamente desde los modelos actuales (o migración ya completa)
+    if isinstance(_tipo_actual(conn, 'marca_temporal'), sa.DateTime) and \
+            isinstance(_tipo_actual(conn, 'porcentaje_calificacion'), sa.Numeric):
+        return
+
+    eliminar_indice(conn, TABLA, 'ix_colaboradores_cedula_marca')
+    eliminar_indice(conn, TABLA, 'ix_colaboradores_area_marca')
+
+    _reemplazar_columnas(
+        conn,
+        {'marca_temporal': sa.DateTime(), 'porcentaje_calificacion': sa.Numeric(5, 2)},
+        {'marca_temporal': _a_fecha, 'porcentaje_calificacion': _a_decimal},
+    )
+
+    crear_indice(conn, TABLA, 'ix_colaboradores_cedula_marca', ['cedula', 'marca_temporal'])
+    crear_indice(conn, TABLA, 'ix_colaboradores_area_marca', ['area_jefe_pertenencia', 'marca_temporal'],
+                 mysql_length={'area_jefe_pertenencia': 191})
+
+
+def downgrade(conn):
+    if isinstance(_tipo_actual(conn, 'marca_temporal'), sa.String) and \
+            isinstance(_tipo_actual(conn, 'porcentaje_calificacion'), sa.String):
+        return
+
+    eliminar_indice(conn, TABLA, 'ix_colaboradores_cedula_marca')
+    eliminar_indice(conn, TABLA, 'ix_colaboradores_area_marca')
+
+    _reemplazar_columnas(
+        conn,
+        {'marca_temporal': sa.String(512), 'porcentaje_calificacion': sa.String(512)},
+        {
+            'marca_temporal': lambda valor: valor.strftime(FORMATOS_MARCA[0]) if isinstance(valor, datetime) else valor,
+            'porcentaje_calificacion': lambda valor: f"{_a_decimal(valor):.2f}" if valor is not None else None,
+        },
+        restaurar_respaldo=True,
+    )
+
+    crear_indice(conn, TABLA, 'ix_colaboradores_cedula_marca', ['cedula', 'marca_temporal'],
+                 mysql_length={'marca_temporal': 19})
+    crear_indice(conn, TABLA, 'ix_colaboradores_area_marca', ['area_jefe_pertenencia', 'marca_temporal'],
+                 mysql_length={'area_jefe_pertenencia': 191, 'marca_temporal': 19})
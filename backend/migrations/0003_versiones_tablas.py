@@ -0,0 +1,26 @@
+# Tabla con un contador de versión por tabla de datos. Cada commit que escribe en
+# `usuarios` o `Colaboradores` lo incrementa y las lecturas masivas derivan de él
+# su ETag para responder 304 sin repetir la consulta.
+import sqlalchemy as sa
+
+TABLAS = ('Colaboradores', 'usuarios')
+
+versiones = sa.Table(
+    'versiones_tablas',
+    sa.MetaData(),
+    sa.Column('tabla', sa.String(64), primary_key=True),
+    sa.Column('version', sa.BigInteger, nullable=False, default=0),
+    sa.Column('actualizado', sa.DateTime),
+)
+
+
+def upgrade(conn):
+    versiones.create(conn, checkfirst=True)
+    existentes = {fila.tabla for fila in conn.execute(sa.select(versiones.c.tabla))}
+    filas = [{"tabla": tabla, "version": 1, "actualizado": None} for tabla in TABLAS if tabla not in existentes]
+    if filas:
+        conn.execute(versiones.insert(), filas)
+
+
+def downgrade(conn):
+    versiones.drop(conn, checkfirst=True)
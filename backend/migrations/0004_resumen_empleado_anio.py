@@ -0,0 +1,60 @@
+# Tabla de resumen por empleado y año para /get_employee_stats, llenada a partir de
+# las evaluaciones existentes. La aplicación la mantiene al insertar evaluaciones.
+import sqlalchemy as sa
+
+from summary import recalcular
+
+metadata = sa.MetaData()
+
+evaluaciones = sa.Table(
+    'Colaboradores',
+    metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('marca_temporal', sa.DateTime),
+    sa.Column('anio', sa.Integer),
+    sa.Column('cedula', sa.Integer),
+    sa.Column('compromiso_pasion_entrega', sa.Integer),
+    sa.Column('honestidad', sa.Integer),
+    sa.Column('respeto', sa.Integer),
+    sa.Column('sencillez', sa.Integer),
+    sa.Column('servicio', sa.Integer),
+    sa.Column('trabajo_equipo', sa.Integer),
+    sa.Column('conocimiento_trabajo', sa.Integer),
+    sa.Column('productividad', sa.Integer),
+    sa.Column('cumple_sistema_gestion', sa.Integer),
+    sa.Column('total_puntos', sa.Integer),
+    sa.Column('porcentaje_calificacion', sa.Numeric(5, 2)),
+    sa.Column('tarea', sa.String(512)),
+)
+
+resumen = sa.Table(
+    'resumen_empleado_anio',
+    metadata,
+    sa.Column('cedula', sa.Integer, primary_key=True, autoincrement=False),
+    sa.Column('anio', sa.Integer, primary_key=True, autoincrement=False),
+    sa.Column('evaluaciones', sa.Integer, nullable=False),
+    sa.Column('ultima_evaluacion_id', sa.Integer),
+    sa.Column('marca_temporal', sa.DateTime),
+    sa.Column('compromiso_pasion_entrega', sa.Integer),
+    sa.Column('honestidad', sa.Integer),
+    sa.Column('respeto', sa.Integer),
+    sa.Column('sencillez', sa.Integer),
+    sa.Column('servicio', sa.Integer),
+    sa.Column('trabajo_equipo', sa.Integer),
+    sa.Column('conocimiento_trabajo', sa.Integer),
+    sa.Column('productividad', sa.Integer),
+    sa.Column('cumple_sistema_gestion', sa.Integer),
+    sa.Column('total_puntos', sa.Integer),
+    sa.Column('porcentaje_calificacion', sa.Numeric(5, 2)),
+    sa.Column('promedio_porcentaje', sa.Numeric(5, 2)),
+    sa.Column('tarea', sa.String(512)),
+)
+
+
+def upgrade(conn):
+    resumen.create(conn, checkfirst=True)
+    recalcular(conn, evaluaciones, resumen)
+
+
+def downgrade(conn):
+    resumen.drop(conn, checkfirst=True)
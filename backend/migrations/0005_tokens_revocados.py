@@ -0,0 +1,33 @@
+# Revocaciones de tokens de sesión (ver tokens.py). Cada fila revoca un token por su
+# jti, o todos los tokens de una cédula emitidos hasta revocado_ms cuando el jti es
+# "cedula:<cédula>". Las filas se borran cuando el token revocado ya habría expirado.
+import sqlalchemy as sa
+
+tokens_revocados = sa.Table(
+    'tokens_revocados',
+    sa.MetaData(),
+    sa.Column('jti', sa.String(64), primary_key=True),
+    sa.Column('cedula', sa.Integer, nullable=False),
+    sa.Column('revocado_ms', sa.BigInteger, nullable=False),
+    sa.Column('expira', sa.DateTime, nullable=False, index=True),
+)
+
+versiones = sa.Table(
+    'versiones_tablas',
+    sa.MetaData(),
+    sa.Column('tabla', sa.String(64), primary_key=True),
+    sa.Column('version', sa.BigInteger, nullable=False, default=0),
+    sa.Column('actualizado', sa.DateTime),
+)
+
+
+def upgrade(conn):
+    tokens_revocados.create(conn, checkfirst=True)
+    existe = conn.execute(sa.select(versiones.c.tabla).where(versiones.c.tabla == 'tokens_revocados')).first()
+    if not existe:
+        conn.execute(versiones.insert().values(tabla='tokens_revocados', version=1, actualizado=None))
+
+
+def downgrade(conn):
+    tokens_revocados.drop(conn, checkfirst=True)
+    conn.execute(versiones.delete().where(versiones.c.tabla == 'tokens_revocados'))
@@ -0,0 +1,22 @@
+# Registro de cambios de la tabla usuarios para la sincronización incremental
+# (/changes). Cada alta, modificación o eliminación agrega una fila; su id es el
+# cursor que usan los clientes. Las evaluaciones no lo necesitan: solo se insertan y
+# su propio id sirve de cursor.
+import sqlalchemy as sa
+
+cambios_usuarios = sa.Table(
+    'cambios_usuarios',
+    sa.MetaData(),
+    sa.Column('id', sa.Integer, primary_key=True, autoincrement=True),
+    sa.Column('cedula', sa.Integer, nullable=False),
+    sa.Column('eliminado', sa.Boolean, nullable=False, default=False),
+    sa.Column('momento', sa.DateTime, nullable=False),
+)
+
+
+def upgrade(conn):
+    cambios_usuarios.create(conn, checkfirst=True)
+
+
+def downgrade(conn):
+    cambios_usuarios.drop(conn, checkfirst=True)
@@ -0,0 +1,88 @@
+# Migraciones versionadas del esquema.
+#
+# Cada migración es un módulo de este paquete cuyo nombre empieza con su número de
+# versión (por ejemplo `0001_indices_consultas.py`) y define `upgrade(conn)` y
+# `downgrade(conn)`. La versión aplicada se guarda en la tabla `schema_migrations`.
+import importlib
+import logging
+import pkgutil
+
+import sqlalchemy as sa
+
+TABLA_VERSIONES = sa.Table(
+    'schema_migrations',
+    sa.MetaData(),
+    sa.Column('version', sa.Integer, primary_key=True),
+    sa.Column('nombre', sa.String(255), nullable=False),
+    sa.Column('aplicada_en', sa.DateTime, server_default=sa.func.now()),
+)
+
+
+def disponibles():
+    migraciones = []
+    for modulo in pkgutil.iter_modules(__path__):
+        prefijo = modulo.name.split('_', 1)[0]
+        if prefijo.isdigit():
+            migraciones.append((int(prefijo), modulo.name))
+    return sorted(migraciones)
+
+
+def _cargar(nombre):
+    return importlib.import_module(f"{__name__}.{nombre}")
+
+
+def aplicadas(conn):
+    TABLA_VERSIONES.create(conn, checkfirst=True)
+    return {fila.version for fila in conn.execute(sa.select(TABLA_VERSIONES.c.version))}
+
+
+def version_actual(engine):
+    with engine.begin() as conn:
+        return max(aplicadas(conn), default=0)
+
+
+def upgrade(engine, destino=None):
+    ejecutadas = []
+    for version, nombre in disponibles():
+        if destino is not None and version > destino:
+            break
+        # Cada migración corre en su propia transacción para poder reanudar si falla
+        with engine.begin() as conn:
+            if version in aplicadas(conn):
+                continue
+            logging.info(f"Aplicando migración {nombre}")
+            _cargar(nombre).upgrade(conn)
+            conn.execute(TABLA_VERSIONES.insert().values(version=version, nombre=nombre))
+        ejecutadas.append(nombre)
+    return ejecutadas
+
+
+def downgrade(engine, destino=0):
+    revertidas = []
+    for version, nombre in reversed(disponibles()):
+        if version <= destino:
+            break
+        with engine.begin() as conn:
+            if version not in aplicadas(conn):
+                continue
+            logging.info(f"Revirtiendo migración {nombre}")
+            _cargar(nombre).downgrade(conn)
+            conn.execute(TABLA_VERSIONES.delete().where(TABLA_VERSIONES.c.version == version))
+        revertidas.append(nombre)
+    return revertidas
+
+
+def crear_indice(conn, tabla, nombre, columnas, mysql_length=None):
+    # Las migraciones no dependen de los modelos actuales: se describe solo lo necesario.
+    # Si el índice ya existe (por ejemplo, creado por db.create_all) no se vuelve a crear.
+    if nombre in {indice['name'] for indice in sa.inspect(conn).get_indexes(tabla)}:
+        return
+    t = sa.Table(tabla, sa.MetaData(), *[sa.Column(columna) for columna in columnas])
+    sa.Index(nombre, *[t.c[columna] for columna in columnas], mysql_length=mysql_length or {}).create(conn)
+
+
+def eliminar_indice(conn, tabla, nombre):
+    if nombre not in {indice['name'] for indice in sa.inspect(conn).get_indexes(tabla)}:
+        return
+    t = sa.Table(tabla, sa.MetaData())
+    sa.Index(nombre, _table=t).drop(conn)
@@ -0,0 +1,95 @@
+# Hash de contraseñas y respuestas de seguridad con el scrypt de werkzeug.
+#
+# El cálculo corre en un pool de hilos acotado (hashlib.scrypt libera el GIL): a lo sumo
+# PASSWORD_HASH_WORKERS hashes simultáneos por proceso, y con PASSWORD_HASH_MAX_PENDING
+# peticiones esperando turno las siguientes se rechazan con HashingSaturado en lugar de
+# acumular hilos bloqueados. Los valores heredados en texto plano se siguen aceptando
+# (comparados en tiempo constante) y se migran al hash actual en el siguiente acceso
+# correcto; lo mismo ocurre con los hashes de un costo distinto al configurado.
+# benchmarks/password_cost.py ayuda a elegir PASSWORD_HASH_METHOD.
+import hmac
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+METODOS_HASH = ('scrypt:', 'pbkdf2:')
+
+
+class HashingSaturado(Exception):
+    pass
+
+
+def es_hash(valor):
+    return isinstance(valor, str) and valor.startswith(METODOS_HASH) and valor.count('$') == 2
+
+
+class Hasher:
+    def __init__(self, metodo='scrypt:32768:8:1', max_workers=2, max_pendientes=16, timeout=30):
+        self.configurar(metodo, max_workers, max_pendientes, timeout)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def configurar(self, metodo, max_workers, max_pendientes, timeout):
+        self.metodo = metodo
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._cupos = threading.BoundedSemaphore(max_pendientes)
+        # Hash de referencia del costo actual: da el prefijo normalizado ('scrypt' ->
+        # 'scrypt:32768:8:1') y se verifica cuando el usuario no existe, para que la
+        # respuesta tarde lo mismo
+        self._referencia = None
+
+    def init_app(self, app):
+        self.configurar(app.config['PASSWORD_HASH_METHOD'], app.config['PASSWORD_HASH_WORKERS'],
+                        app.config['PASSWORD_HASH_MAX_PENDING'], app.config['PASSWORD_HASH_TIMEOUT'])
+
+    def _ejecutor(self):
+        # Se crea al primer uso: los hilos no sobreviven a un fork del proceso maestro
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='hash')
+            return self._pool
+
+    def _ejecutar(self, funcion, *args):
+        if not self._cupos.acquire(blocking=False):
+            raise HashingSaturado()
+        try:
+            futuro = self._ejecutor().submit(funcion, *args)
+        except BaseException:
+            self._cupos.release()
+            raise
+        # El cupo se libera cuando termina el cálculo, aunque la petición deje de esperar
+        futuro.add_done_callback(lambda _: self._cupos.release())
+        return futuro.result(timeout=self.timeout)
+
+    def _hash_referencia(self):
+        if self._referencia is None:
+            self._referencia = self.hashear(secrets.token_hex(16))
+        return self._referencia
+
+    def hashear(self, valor):
+        return self._ejecutar(generate_password_hash, str(valor), self.metodo)
+
+    def verificar(self, almacenado, valor):
+        """Devuelve (coincide, debe_rehashear) para el valor guardado y el recibido."""
+        valor = str(valor)
+        if almacenado is None:
+            self._ejecutar(check_password_hash, self._hash_referencia(), valor)
+            return False, False
+        if not es_hash(almacenado):
+            coincide = hmac.compare_digest(str(almacenado).encode(), valor.encode())
+            return coincide, coincide
+        coincide = self._ejecutar(check_password_hash, almacenado, valor)
+        prefijo = self._hash_referencia().split('$', 1)[0]
+        return coincide, coincide and almacenado.split('$', 1)[0] != prefijo
+
+
+def separar_seguridad(valor):
+    # SEGURIDAD es "pregunta:respuesta"; la respuesta (hash) también puede contener ':'
+    pregunta, _, respuesta = (valor or '').partition(':')
+    return pregunta, respuesta
+
+
+hasher = Hasher()
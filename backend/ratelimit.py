@@ -0,0 +1,238 @@
+# Limitación de intentos en las rutas de autenticación (login, validación de usuario,
+# rol y pregunta de seguridad).
+#
+# Cada petición consume un token de una cubeta por IP y ruta y de otra por cédula; las
+# cubetas se rellenan de forma continua (capacidad/periodo). La de IP es por ruta para
+# que el login no compita con las validaciones que el frontend hace desde la misma IP. Los intentos fallidos de una misma
+# IP contra una misma cédula bloquean esa pareja con una espera que se duplica a partir
+# del fallo RATE_LIMIT_FAILURES_FREE. El bloqueo es por pareja y no solo por cédula para
+# que un tercero no pueda dejar sin acceso a un usuario desde otra IP, ni una oficina
+# detrás de la misma IP pague por los errores de un compañero; el reparto de intentos
+# entre muchas IPs lo acota la cubeta por cédula.
+#
+# El almacén por defecto vive en la memoria del proceso: con varios workers de gunicorn
+# cada uno lleva su propia cuenta. Con RATE_LIMIT_REDIS_URL (requiere el paquete redis)
+# el estado se comparte entre workers y máquinas.
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+from metrics import metricas
+
+
+def parsear_limite(texto):
+    # "10/60" -> 10 intentos cada 60 segundos
+    capacidad, _, periodo = str(texto).partition('/')
+    return int(capacidad), float(periodo or 60)
+
+
+def espera_por_fallos(fallos, gratis, base, maximo):
+    if fallos <= gratis:
+        return 0
+    return min(maximo, base * 2 ** (fallos - gratis - 1))
+
+
+class AlmacenMemoria:
+    def __init__(self, maxsize=100000, clock=time.monotonic):
+        self.maxsize = maxsize
+        self._clock = clock
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _guardar(self, clave, valor):
+        self._datos[clave] = valor
+        self._datos.move_to_end(clave)
+        while len(self._datos) > self.maxsize:
+            self._datos.popitem(last=False)
+
+    def consumir(self, clave, capacidad, periodo):
+        """Toma un token de la cubeta; devuelve 0 o los segundos hasta que haya uno."""
+        with self._lock:
+            ahora = self._clock()
+            tokens, ultimo = self._datos.get(('cubeta', clave), (capacidad, ahora))
+            tokens = min(capacidad, tokens + (ahora - ultimo) * capacidad / periodo)
+            espera = 0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                espera = (1 - tokens) * periodo / capacidad
+            self._guardar(('cubeta', clave), (tokens, ahora))
+            return espera
+
+    def bloqueo(self, clave):
+        with self._lock:
+            _, hasta, _ = self._datos.get(('fallos', clave), (0, 0, 0))
+            return max(0, hasta - self._clock())
+
+    def registrar_fallo(self, clave, ventana, calcular_espera):
+        with self._lock:
+            ahora = self._clock()
+            fallos, _, ultimo = self._datos.get(('fallos', clave), (0, 0, ahora))
+            # Los fallos se olvidan tras `ventana` segundos sin nuevos intentos fallidos
+            fallos = fallos + 1 if ahora - ultimo < ventana else 1
+            espera = calcular_espera(fallos)
+            self._guardar(('fallos', clave), (fallos, ahora + espera, ahora))
+            return espera
+
+    def reiniciar(self, clave):
+        with self._lock:
+            self._datos.pop(('fallos', clave), None)
+
+    def stats(self):
+        with self._lock:
+            return {"keys": len(self._datos)}
+
+
+# Cubeta atómica en Redis: el estado es un hash {tokens, ts} que expira al llenarse
+CUBETA_LUA = """
+local capacidad = tonumber(ARGV[1])
+local periodo = tonumber(ARGV[2])
+local ahora = tonumber(ARGV[3])
+local estado = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(estado[1]) or capacidad
+local ultimo = tonumber(estado[2]) or ahora
+tokens = math.min(capacidad, tokens + math.max(0, ahora - ultimo) * capacidad / periodo)
+local espera = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    espera = (1 - tokens) * periodo / capacidad
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(ahora))
+redis.call('EXPIRE', KEYS[1], math.ceil(periodo))
+return tostring(espera)
+"""
+
+
+class AlmacenRedis:
+    def __init__(self, url, prefijo='ratelimit:'):
+        if redis is None:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL requiere el paquete redis")
+        self._redis = redis.Redis.from_url(url)
+        self._cubeta = self._redis.register_script(CUBETA_LUA)
+        self._prefijo = prefijo
+
+    def consumir(self, clave, capacidad, periodo):
+        return float(self._cubeta(keys=[f"{self._prefijo}cubeta:{clave}"], args=[capacidad, periodo, time.time()]))
+
+    def bloqueo(self, clave):
+        restante = self._redis.pttl(f"{self._prefijo}bloqueo:{clave}")
+        return max(0, restante) / 1000
+
+    def registrar_fallo(self, clave, ventana, calcular_espera):
+        clave_fallos = f"{self._prefijo}fallos:{clave}"
+        with self._redis.pipeline() as pipe:
+            pipe.incr(clave_fallos)
+            pipe.expire(clave_fallos, math.ceil(ventana))
+            fallos, _ = pipe.execute()
+        espera = calcular_espera(fallos)
+        if espera:
+            self._redis.set(f"{self._prefijo}bloqueo:{clave}", 1, px=math.ceil(espera * 1000))
+        return espera
+
+    def reiniciar(self, clave):
+        self._redis.delete(f"{self._prefijo}fallos:{clave}", f"{self._prefijo}bloqueo:{clave}")
+
+
+class Limitador:
+    def __init__(self, app=None):
+        self.almacen = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.activo = config['RATE_LIMIT_ENABLED']
+        self.por_ip = parsear_limite(config['RATE_LIMIT_IP'])
+        self.por_cedula = parsear_limite(config['RATE_LIMIT_CEDULA'])
+        self.fallos_gratis = config['RATE_LIMIT_FAILURES_FREE']
+        self.espera_base = config['RATE_LIMIT_BACKOFF_BASE']
+        self.espera_maxima = config['RATE_LIMIT_BACKOFF_MAX']
+        self.ventana = config['RATE_LIMIT_FAILURE_WINDOW']
+        if config['RATE_LIMIT_REDIS_URL']:
+            self.almacen = AlmacenRedis(config['RATE_LIMIT_REDIS_URL'])
+        else:
+            self.almacen = AlmacenMemoria(maxsize=config['RATE_LIMIT_MAX_KEYS'])
+        app.extensions['limitador'] = self
+
+    def _espera(self, fallos):
+        return espera_por_fallos(fallos, self.fallos_gratis, self.espera_base, self.espera_maxima)
+
+    def verificar(self, ip, cedula, ruta=''):
+        """Devuelve (segundos de espera, motivo) o (0, None) si la petición puede seguir."""
+        # El bloqueo se consulta antes de las cubetas para no gastar tokens en intentos rechazados
+        espera = self.almacen.bloqueo(f"{ip}|{cedula}") if cedula else 0
+        if espera:
+            return espera, 'backoff'
+        espera = self.almacen.consumir(f"ip:{ruta}:{ip}", *self.por_ip)
+        if espera:
+            return espera, 'ip'
+        if cedula:
+            espera = self.almacen.consumir(f"cedula:{cedula}", *self.por_cedula)
+            if espera:
+                return espera, 'cedula'
+        return 0, None
+
+    def fallo(self, ip, cedula):
+        return self.almacen.registrar_fallo(f"{ip}|{cedula}", self.ventana, self._espera)
+
+    def exito(self, ip, cedula):
+        self.almacen.reiniciar(f"{ip}|{cedula}")
+
+
+def fallo_si_estado(*estados):
+    return lambda respuesta: respuesta.status_code in estados
+
+
+def limitar(campo_cedula, es_fallo=fallo_si_estado(401)):
+    """Aplica el limitador de la app a la vista; `campo_cedula` es la clave del JSON con la cédula."""
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            limitador = current_app.extensions.get('limitador')
+            if limitador is None or not limitador.activo:
+                return vista(*args, **kwargs)
+
+            ip = request.remote_addr or ''
+            datos = request.get_json(silent=True)
+            cedula = str(datos.get(campo_cedula) or '').strip() if isinstance(datos, dict) else ''
+
+            try:
+                espera, motivo = limitador.verificar(ip, cedula, request.url_rule.rule)
+            except Exception as e:
+                # Si el almacén compartido no responde se deja pasar la petición
+                logging.error(f"Error en el limitador de intentos: {str(e)}")
+                return vista(*args, **kwargs)
+
+            if espera:
+                metricas.incrementar('rate_limit_rejections_total', "Peticiones rechazadas por el limitador",
+                                     route=request.url_rule.rule, reason=motivo)
+                respuesta = jsonify({"success": False, "error": "Demasiados intentos, intenta de nuevo más tarde"})
+                respuesta.status_code = 429
+                respuesta.headers['Retry-After'] = str(math.ceil(espera))
+                return respuesta
+
+            respuesta = make_response(vista(*args, **kwargs))
+            if cedula:
+                try:
+                    if es_fallo(respuesta):
+                        metricas.incrementar('auth_failures_total', "Intentos de autenticación fallidos",
+                                             route=request.url_rule.rule)
+                        limitador.fallo(ip, cedula)
+                    elif respuesta.status_code == 200:
+                        limitador.exito(ip, cedula)
+                except Exception as e:
+                    logging.error(f"Error en el limitador de intentos: {str(e)}")
+            return respuesta
+        return envoltura
+    return decorador
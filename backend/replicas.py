@@ -0,0 +1,159 @@
+# Réplicas de lectura (opcional).
+#
+# Con DATABASE_REPLICA_URLS (URIs separadas por comas) cada réplica se registra como un
+# bind de Flask-SQLAlchemy ("replica_0", "replica_1", ...). Las rutas marcadas con
+# @solo_lectura en main.py eligen una réplica al empezar y SesionEnrutada manda a ella
+# los SELECT de la petición; los INSERT/UPDATE/DELETE, el flush y los SELECT ... FOR
+# UPDATE van a la primaria, y desde la primera escritura toda la sesión se queda en ella.
+#
+# Retraso: cada REPLICA_CHECK_INTERVAL segundos se compara versiones_tablas de la
+# primaria con la de cada réplica. Si a una réplica le falta una versión, su retraso se
+# cuenta desde la revisión en que se vio que le faltaba (se subestima como mucho en un
+# intervalo). Solo se usan réplicas que respondieron a la última revisión y cuyo retraso
+# no supera REPLICA_MAX_LAG; si ninguna cumple, se lee de la primaria.
+#
+# Lectura de lo propio: un cliente (por IP) que acaba de escribir lee de la primaria
+# durante REPLICA_READ_AFTER_WRITE segundos. Se lleva por proceso: con varios workers
+# conviene que ese valor no sea menor que REPLICA_MAX_LAG + REPLICA_CHECK_INTERVAL.
+#
+# Para probarlo en local basta una copia del archivo SQLite:
+#   cp evaluaciones.db replica.db
+#   DATABASE_URL=sqlite:///evaluaciones.db DATABASE_REPLICA_URLS=sqlite:///replica.db flask --app wsgi check-replicas
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from flask_sqlalchemy.session import Session
+from sqlalchemy import select
+from sqlalchemy.sql.selectable import SelectBase
+
+from cache import AUSENTE, TTLCache
+
+PREFIJO_BIND = 'replica_'
+# Clave en session.info con la réplica elegida para la petición
+CLAVE_REPLICA = 'replica'
+
+
+def binds_replicas(uris, opciones_motor):
+    return {f"{PREFIJO_BIND}{i}": {"url": uri, **opciones_motor(uri)} for i, uri in enumerate(uris)}
+
+
+def _es_lectura(clausula):
+    return isinstance(clausula, SelectBase) and getattr(clausula, '_for_update_arg', None) is None
+
+
+class SesionEnrutada(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get(CLAVE_REPLICA)
+        if replica is not None and bind is None:
+            if self._flushing or not _es_lectura(clause):
+                self.info[CLAVE_REPLICA] = None
+            else:
+                return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def en_primaria(sesion):
+    # Para las lecturas que llenan cachés del proceso: una copia atrasada quedaría guardada
+    replica = sesion.info.pop(CLAVE_REPLICA, None)
+    try:
+        yield
+    finally:
+        if replica is not None:
+            sesion.info[CLAVE_REPLICA] = replica
+
+
+class EnrutadorReplicas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._turno = itertools.count()
+        self._proxima_revision = 0
+        self.replicas = []
+        self.estados = {}
+
+    def init_app(self, app, db, tabla_versiones):
+        config = app.config
+        self._db = db
+        self._versiones = tabla_versiones
+        self.replicas = sorted(clave for clave in config.get('SQLALCHEMY_BINDS') or {} if clave.startswith(PREFIJO_BIND))
+        self.retraso_maximo = config['REPLICA_MAX_LAG']
+        self.intervalo = config['REPLICA_CHECK_INTERVAL']
+        self.escrituras_recientes = TTLCache(maxsize=config['REPLICA_STICKY_CLIENTS'],
+                                             ttl=config['REPLICA_READ_AFTER_WRITE'])
+        self.estados = {
+            replica: {"sana": False, "retraso": None, "error": None, "pendientes": {}} for replica in self.replicas
+        }
+
+    def _leer_versiones(self, engine):
+        with engine.connect() as conn:
+            return dict(conn.execute(select(self._versiones.c.tabla, self._versiones.c.version)).all())
+
+    def revisar(self):
+        try:
+            primaria = self._leer_versiones(self._db.engine)
+        except Exception as e:
+            logging.error(f"No se pudieron leer las versiones de la primaria: {str(e)}")
+            return
+        ahora = time.monotonic()
+        for replica in self.replicas:
+            estado = self.estados[replica]
+            try:
+                versiones = self._leer_versiones(self._db.engines[replica])
+            except Exception as e:
+                if estado["sana"]:
+                    logging.warning(f"Réplica {replica} fuera de servicio: {str(e)}")
+                estado.update(sana=False, error=str(e))
+                continue
+
+            # Por tabla, la primera revisión en que se vio que le faltaba una versión
+            pendientes = estado["pendientes"]
+            for tabla, version in primaria.items():
+                pendiente = pendientes.pop(tabla, None)
+                if pendiente and versiones.get(tabla, 0) >= pendiente[0]:
+                    pendiente = None
+                if pendiente is None and versiones.get(tabla, 0) < version:
+                    pendiente = (version, ahora)
+                if pendiente:
+                    pendientes[tabla] = pendiente
+            retraso = ahora - min(visto for _, visto in pendientes.values()) if pendientes else 0.0
+            estado.update(sana=True, error=None, retraso=retraso)
+
+    def _revisar_si_toca(self):
+        with self._lock:
+            if time.monotonic() < self._proxima_revision:
+                return
+            self._proxima_revision = time.monotonic() + self.intervalo
+        self.revisar()
+
+    def elegir(self, cliente=None):
+        """Réplica para una petición de solo lectura, o None para leer de la primaria."""
+        if not self.replicas:
+            return None
+        if cliente is not None and self.escrituras_recientes.get(cliente) is not AUSENTE:
+            return None
+        self._revisar_si_toca()
+        disponibles = [
+            replica for replica in self.replicas
+            if self.estados[replica]["sana"] and self.estados[replica]["retraso"] <= self.retraso_maximo
+        ]
+        if not disponibles:
+            return None
+        return disponibles[next(self._turno) % len(disponibles)]
+
+    def registrar_escritura(self, cliente):
+        if self.replicas and cliente is not None:
+            self.escrituras_recientes.set(cliente, True)
+
+    def stats(self):
+        indicadores = {"clientes_en_primaria": self.escrituras_recientes.stats()["size"]}
+        for replica, estado in self.estados.items():
+            indicadores[f"{replica}_sana"] = int(estado["sana"])
+            if estado["retraso"] is not None:
+                indicadores[f"{replica}_retraso_segundos"] = round(estado["retraso"], 3)
+        return indicadores
+
+
+enrutador_replicas = EnrutadorReplicas()
@@ -0,0 +1,60 @@
+# Esquemas declarativos para las respuestas de lectura.
+#
+# Un esquema es una lista ordenada de campos: (nombre en la API, columna[, conversión]).
+# La misma definición da las columnas del SELECT y un serializador de tuplas a dict,
+# así las rutas de solo lectura piden a la base de datos únicamente lo que devuelven y
+# no hidratan objetos del ORM.
+from operator import attrgetter
+
+from sqlalchemy import select
+
+
+class Esquema:
+    def __init__(self, *campos):
+        self.campos = tuple((campo + (None,))[:3] for campo in campos)
+        self.nombres = tuple(nombre for nombre, _, _ in self.campos)
+        self.columnas = tuple(columna for _, columna, _ in self.campos)
+        self._por_nombre = {campo[0]: campo for campo in self.campos}
+        self.serializar = self._compilar()
+        # Solo los valores, en el orden de `nombres`, para las respuestas compactas
+        self.valores = self._compilar(compacto=True)
+        # Para objetos con atributos de nombre igual al del modelo (filas cacheadas)
+        atributos = attrgetter(*(columna.key for columna in self.columnas))
+        self._atributos = atributos if len(self.columnas) > 1 else lambda objeto: (atributos(objeto),)
+
+    def _compilar(self, compacto=False):
+        nombres = self.nombres
+        cantidad = len(nombres)
+        conversiones = tuple(
+            (posicion, conversion) for posicion, (_, _, conversion) in enumerate(self.campos) if conversion
+        )
+        # Las columnas adicionales al final de la fila (claves de orden o de cursor) se ignoran
+        if not conversiones:
+            if compacto:
+                return lambda fila: list(fila[:cantidad])
+            return lambda fila: dict(zip(nombres, fila))
+
+        def serializar(fila):
+            valores = list(fila[:cantidad])
+            for posicion, conversion in conversiones:
+                valores[posicion] = conversion(valores[posicion])
+            return valores if compacto else dict(zip(nombres, valores))
+        return serializar
+
+    def __contains__(self, nombre):
+        return nombre in self._por_nombre
+
+    def __getitem__(self, nombre):
+        return self._por_nombre[nombre][1]
+
+    def seleccionar(self, nombres):
+        return Esquema(*(self._por_nombre[nombre] for nombre in nombres))
+
+    def sin(self, *nombres):
+        return Esquema(*(campo for campo in self.campos if campo[0] not in nombres))
+
+    def select(self, *adicionales):
+        return select(*self.columnas, *adicionales)
+
+    def desde_objeto(self, objeto):
+        return self.serializar(self._atributos(objeto))
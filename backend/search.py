@@ -0,0 +1,90 @@
+# Índice de búsqueda por prefijo sobre cédula, nombre, cargo y centro de costo.
+#
+# Las palabras se pliegan (sin tildes ni mayúsculas: "GONZALEZ" encuentra "González")
+# y se guardan en una lista ordenada, que cumple el papel de un trie de prefijos con
+# mucha menos memoria: las palabras que empiezan por un prefijo forman un rango
+# contiguo que se ubica con bisect. Cada palabra apunta a las cédulas en que aparece.
+import bisect
+import heapq
+import re
+import unicodedata
+from collections import defaultdict
+
+# Peso de cada columna en el puntaje; una palabra al inicio del campo suma 1 y una
+# palabra completa (no solo el prefijo) suma 2
+CAMPOS = (('CEDULA', 4), ('NOMBRE', 3), ('CARGO', 2), ('CENTRO_DE_COSTO', 1))
+PALABRA = re.compile(r'[^\W_]+')
+
+
+def plegar(texto):
+    descompuesto = unicodedata.normalize('NFKD', str(texto))
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).casefold()
+
+
+def palabras(texto):
+    return PALABRA.findall(plegar(texto or ''))
+
+
+class IndiceBusqueda:
+    def __init__(self, filas=()):
+        self._palabras = []
+        self._apariciones = defaultdict(dict)
+        self._por_cedula = {}
+        self._orden = {}
+        for fila in filas:
+            self.agregar(fila)
+
+    def agregar(self, fila):
+        self.quitar(fila.CEDULA)
+        puntajes = {}
+        for campo, peso in CAMPOS:
+            for posicion, palabra in enumerate(palabras(getattr(fila, campo))):
+                puntaje = peso + (posicion == 0)
+                if puntaje > puntajes.get(palabra, 0):
+                    puntajes[palabra] = puntaje
+        for palabra, puntaje in puntajes.items():
+            if palabra not in self._apariciones:
+                bisect.insort(self._palabras, palabra)
+            self._apariciones[palabra][fila.CEDULA] = puntaje
+        self._por_cedula[fila.CEDULA] = list(puntajes)
+        self._orden[fila.CEDULA] = plegar(fila.NOMBRE or '')
+
+    def quitar(self, cedula):
+        for palabra in self._por_cedula.pop(cedula, ()):
+            apariciones = self._apariciones[palabra]
+            apariciones.pop(cedula, None)
+            if not apariciones:
+                del self._apariciones[palabra]
+                del self._palabras[bisect.bisect_left(self._palabras, palabra)]
+        self._orden.pop(cedula, None)
+
+    def _prefijo(self, termino):
+        # Mejor puntaje por cédula entre las palabras que empiezan por `termino`
+        encontrados = {}
+        inicio = bisect.bisect_left(self._palabras, termino)
+        for palabra in self._palabras[inicio:]:
+            if not palabra.startswith(termino):
+                break
+            extra = 2 if palabra == termino else 0
+            for cedula, puntaje in self._apariciones[palabra].items():
+                if puntaje + extra > encontrados.get(cedula, 0):
+                    encontrados[cedula] = puntaje + extra
+        return encontrados
+
+    def buscar(self, consulta, limite=10):
+        """Cédulas que tienen cada término de `consulta` como prefijo de alguna palabra, mejor puntaje primero."""
+        terminos = sorted(set(palabras(consulta)), key=len, reverse=True)
+        if not terminos:
+            return []
+        # Se empieza por el término más largo, que suele ser el más selectivo
+        puntajes = self._prefijo(terminos[0])
+        for termino in terminos[1:]:
+            if not puntajes:
+                break
+            siguientes = self._prefijo(termino)
+            puntajes = {cedula: puntaje + siguientes[cedula] for cedula, puntaje in puntajes.items() if cedula in siguientes}
+        mejores = heapq.nsmallest(limite, puntajes.items(), key=lambda item: (-item[1], self._orden[item[0]], item[0]))
+        return [cedula for cedula, _ in mejores]
+
+    def stats(self):
+        return {"palabras": len(self._palabras)}
@@ -0,0 +1,61 @@
+# Serialización JSON. Si orjson está instalado (pip install orjson) se usa como
+# proveedor JSON de Flask; si no, se mantiene el proveedor estándar. La salida es
+# compatible en ambos casos: Decimal como cadena y fechas en formato HTTP.
+import json
+from datetime import date
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _por_defecto(valor):
+    if isinstance(valor, date):
+        return http_date(valor)
+    if isinstance(valor, Decimal):
+        return str(valor)
+    raise TypeError(f"Objeto de tipo {type(valor).__name__} no serializable a JSON")
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    def _opciones(self, indentar=False):
+        opciones = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            opciones |= orjson.OPT_SORT_KEYS
+        if indentar:
+            opciones |= orjson.OPT_INDENT_2
+        return opciones
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_por_defecto, option=self._opciones(kwargs.get('indent'))).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indentar = self.compact is None and self._app.debug or self.compact is False
+        cuerpo = orjson.dumps(obj, default=_por_defecto, option=self._opciones(indentar)) + b"\n"
+        return self._app.response_class(cuerpo, mimetype=self.mimetype)
+
+
+def proveedor_json(nombre):
+    # JSON_PROVIDER: 'auto' (orjson si está instalado), 'orjson' o 'std'
+    if nombre == 'std' or (nombre == 'auto' and orjson is None):
+        return DefaultJSONProvider
+    if orjson is None:
+        raise RuntimeError("JSON_PROVIDER=orjson requiere instalar orjson")
+    return OrjsonProvider
+
+
+def linea_json(valor):
+    # Una línea de NDJSON (sin escapar caracteres no ASCII)
+    if orjson is not None:
+        opciones = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_APPEND_NEWLINE
+        return orjson.dumps(valor, default=str, option=opciones)
+    return (json.dumps(valor, ensure_ascii=False, default=str) + "\n").encode('utf-8')
@@ -0,0 +1,152 @@
+# Instantáneas estáticas de evaluaciones y usuarios para el frontend (los data.json y
+# usuarios_data.json de public/), generadas desde la base de datos.
+#
+# Cada archivo lleva en el nombre un hash de su contenido, así que puede cachearse
+# como inmutable: entre despliegues o regeneraciones el cliente solo descarga lo que
+# cambió. Junto a cada archivo se escriben las variantes .gz y .br (esta última si
+# brotli está instalado) para servirlas sin comprimir en cada petición. Además del
+# conjunto completo se generan particiones (por año, por área) y un manifest.json,
+# el único archivo sin hash, que dice qué archivo corresponde a cada una.
+#
+#   flask --app wsgi generate-snapshots                # cron cada N minutos
+#   flask --app wsgi generate-snapshots --destino ../public --copias-estables
+import gzip
+import hashlib
+import json
+import os
+import re
+import time
+from collections import defaultdict
+from datetime import datetime
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from search import plegar
+
+MANIFIESTO = 'manifest.json'
+EXTENSIONES = {'gzip': '.gz', 'br': '.br'}
+ES_HASHEADO = re.compile(r'\.[0-9a-f]{16}\.json$')
+
+
+def _slug(valor):
+    return re.sub(r'[^a-z0-9]+', '-', plegar(valor)).strip('-') or 'sin-valor'
+
+
+def _codificar(filas):
+    return json.dumps(filas, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _escribir_atomico(ruta, contenido):
+    temporal = f"{ruta}.tmp"
+    with open(temporal, 'wb') as archivo:
+        archivo.write(contenido)
+    os.replace(temporal, ruta)
+
+
+class GeneradorSnapshots:
+    def __init__(self, directorio, retencion=24 * 3600, calidad_br=11):
+        self.directorio = directorio
+        self.retencion = retencion
+        self.calidad_br = calidad_br
+
+    def _compresores(self):
+        # mtime=0: la misma entrada produce siempre los mismos bytes
+        compresores = {'gzip': lambda contenido: gzip.compress(contenido, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compresores['br'] = lambda contenido: brotli.compress(contenido, quality=self.calidad_br)
+        return compresores
+
+    def _publicar_archivo(self, base, filas):
+        contenido = _codificar(filas)
+        nombre = f"{base}.{hashlib.blake2b(contenido, digest_size=8).hexdigest()}.json"
+        ruta = os.path.join(self.directorio, nombre)
+        entrada = {"archivo": nombre, "filas": len(filas), "bytes": len(contenido), "codificaciones": {}}
+        for codificacion, comprimir in self._compresores().items():
+            variante = ruta + EXTENSIONES[codificacion]
+            self._guardar(variante, lambda: comprimir(contenido))
+            entrada["codificaciones"][codificacion] = os.path.getsize(variante)
+        self._guardar(ruta, lambda: contenido)
+        return entrada
+
+    def _guardar(self, ruta, generar):
+        # El nombre depende del contenido: si ya existe no se reescribe, solo se actualiza
+        # su fecha, que limpiar() toma como la última vez que estuvo en un manifiesto
+        if os.path.exists(ruta):
+            os.utime(ruta)
+        else:
+            _escribir_atomico(ruta, generar())
+
+    def publicar(self, conjuntos, versiones=None, copias_estables=False):
+        """`conjuntos` es {nombre: (filas, {partición: campo})}; devuelve el manifiesto publicado."""
+        os.makedirs(self.directorio, exist_ok=True)
+        manifiesto = {
+            "generado": datetime.now().isoformat(timespec='seconds'),
+            "versiones": versiones or {},
+            "conjuntos": {},
+        }
+        for nombre, (filas, particiones) in conjuntos.items():
+            filas = list(filas)
+            entrada = self._publicar_archivo(nombre, filas)
+            entrada["particiones"] = {}
+            for particion, campo in particiones.items():
+                grupos = defaultdict(list)
+                for fila in filas:
+                    grupos[fila[campo]].append(fila)
+                entrada["particiones"][particion] = {
+                    str(valor): self._publicar_archivo(f"{nombre}.{particion}.{_slug(valor)}", grupo)
+                    for valor, grupo in sorted(grupos.items(), key=lambda item: str(item[0]))
+                    if valor is not None
+                }
+            manifiesto["conjuntos"][nombre] = entrada
+            if copias_estables:
+                # Mismo nombre que los archivos que el frontend pide hoy (/data.json)
+                _escribir_atomico(os.path.join(self.directorio, f"{nombre}.json"), _codificar(filas))
+
+        # El manifiesto se reemplaza al final: hasta entonces los clientes siguen viendo el anterior
+        _escribir_atomico(os.path.join(self.directorio, MANIFIESTO),
+                          json.dumps(manifiesto, ensure_ascii=False, indent=2).encode('utf-8'))
+        self.limpiar(manifiesto)
+        return manifiesto
+
+    def manifiesto(self):
+        try:
+            with open(os.path.join(self.directorio, MANIFIESTO), encoding='utf-8') as archivo:
+                return json.load(archivo)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def limpiar(self, manifiesto):
+        # Los archivos que ya no están en el manifiesto se conservan `retencion` segundos
+        # para los clientes que todavía usan el manifiesto anterior
+        vigentes = {MANIFIESTO}
+        for conjunto in manifiesto["conjuntos"].values():
+            entradas = [conjunto, *(e for grupos in conjunto["particiones"].values() for e in grupos.values())]
+            for entrada in entradas:
+                vigentes.add(entrada["archivo"])
+                vigentes.update(entrada["archivo"] + EXTENSIONES[c] for c in entrada["codificaciones"])
+        limite = time.time() - self.retencion
+        for nombre in os.listdir(self.directorio):
+            if nombre in vigentes or not ES_HASHEADO.search(nombre.removesuffix('.gz').removesuffix('.br')):
+                continue
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                if os.path.getmtime(ruta) < limite:
+                    os.remove(ruta)
+            except OSError:
+                continue
+
+    def resolver(self, nombre, codificaciones_aceptadas):
+        """Ruta del archivo a servir (la variante comprimida si el cliente la acepta) y su codificación."""
+        if '/' in nombre or '\\' in nombre or nombre.startswith('.'):
+            return None, None
+        ruta = os.path.join(self.directorio, nombre)
+        if not os.path.isfile(ruta):
+            return None, None
+        for codificacion in ('br', 'gzip'):
+            variante = ruta + EXTENSIONES[codificacion]
+            if codificacion in codificaciones_aceptadas and os.path.isfile(variante):
+                return variante, codificacion
+        return ruta, None
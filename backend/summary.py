@@ -0,0 +1,55 @@
+# Resumen de evaluaciones por empleado y año (tabla resumen_empleado_anio).
+#
+# Cada fila copia la última evaluación del año (la que muestra /get_employee_stats) y
+# agrega cuántas hubo y el promedio del porcentaje. Quien inserta evaluaciones llama a
+# `recalcular` con los pares (cédula, año) afectados dentro de la misma transacción;
+# sin pares se reconstruye la tabla completa (comando rebuild-employee-summary).
+import sqlalchemy as sa
+
+COLUMNAS_COPIADAS = (
+    'marca_temporal', 'compromiso_pasion_entrega', 'honestidad', 'respeto', 'sencillez',
+    'servicio', 'trabajo_equipo', 'conocimiento_trabajo', 'productividad',
+    'cumple_sistema_gestion', 'total_puntos', 'porcentaje_calificacion', 'tarea',
+)
+
+
+def pares_de(filas):
+    pares = set()
+    for fila in filas:
+        try:
+            pares.add((int(fila['cedula']), int(fila['anio'])))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return pares
+
+
+def recalcular(conexion, evaluaciones, resumen, pares=None):
+    # `conexion` puede ser una Connection o una Session
+    e = evaluaciones.c
+    condiciones = [e.cedula.isnot(None), e.anio.isnot(None)]
+    borrar = resumen.delete()
+    if pares is not None:
+        pares = sorted(pares)
+        if not pares:
+            return 0
+        condiciones.append(sa.tuple_(e.cedula, e.anio).in_(pares))
+        borrar = borrar.where(sa.tuple_(resumen.c.cedula, resumen.c.anio).in_(pares))
+
+    ventana = {"partition_by": (e.cedula, e.anio)}
+    ordenadas = sa.select(
+        e.cedula,
+        e.anio,
+        e.id.label('ultima_evaluacion_id'),
+        *[e[columna] for columna in COLUMNAS_COPIADAS],
+        sa.func.count().over(**ventana).label('evaluaciones'),
+        sa.func.round(sa.func.avg(e.porcentaje_calificacion).over(**ventana), 2).label('promedio_porcentaje'),
+        sa.func.row_number().over(order_by=(e.marca_temporal.desc(), e.id.desc()), **ventana).label('orden'),
+    ).where(*condiciones).subquery()
+
+    columnas = ['cedula', 'anio', 'ultima_evaluacion_id', *COLUMNAS_COPIADAS, 'evaluaciones', 'promedio_porcentaje']
+    conexion.execute(borrar)
+    resultado = conexion.execute(resumen.insert().from_select(
+        columnas,
+        sa.select(*[ordenadas.c[columna] for columna in columnas]).where(ordenadas.c.orden == 1),
+    ))
+    return resultado.rowcount
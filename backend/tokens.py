@@ -0,0 +1,113 @@
+# Tokens de sesión firmados con itsdangerous.
+#
+# El token de acceso lleva la cédula, el rol y el nombre del usuario, así que las rutas
+# que lo reciben (Authorization: Bearer ...) no necesitan consultar la tabla usuarios.
+# Dura ACCESS_TOKEN_TTL segundos y se renueva con el token de refresco, que dura
+# REFRESH_TOKEN_TTL y se reemplaza en cada renovación.
+#
+# Las revocaciones (logout, cambio de clave, usuario eliminado) se guardan en la tabla
+# tokens_revocados. Un cambio de rol o de nombre solo revoca los tokens de acceso: el
+# de refresco sigue sirviendo y la renovación emite un token con los datos nuevos.
+# Cada proceso mantiene una copia en memoria y la recarga cuando cambia la versión de
+# esa tabla, que se consulta como mucho cada TOKEN_REVOCATION_REFRESH segundos. Un token revocado en otro proceso puede seguir
+# aceptándose durante ese intervalo.
+import secrets
+import threading
+import time
+
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+
+# Marca que revoca todos los tokens de una cédula emitidos hasta ese momento
+PREFIJO_USUARIO = 'cedula:'
+# Igual, pero solo los tokens de acceso
+PREFIJO_ACCESO = 'acceso:'
+
+
+class TokenInvalido(Exception):
+    pass
+
+
+def ahora_ms():
+    return int(time.time() * 1000)
+
+
+class EmisorTokens:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revocados = set()
+        self._revocados_desde = {}
+        self._accesos_revocados_desde = {}
+        self.version_revocaciones = None
+        self._proxima_sincronizacion = 0
+
+    def init_app(self, app):
+        config = app.config
+        self.ttl_acceso = config['ACCESS_TOKEN_TTL']
+        self.ttl_refresco = config['REFRESH_TOKEN_TTL']
+        self.intervalo = config['TOKEN_REVOCATION_REFRESH']
+        self._acceso = URLSafeTimedSerializer(config['SECRET_KEY'], salt='token-acceso')
+        self._refresco = URLSafeTimedSerializer(config['SECRET_KEY'], salt='token-refresco')
+
+    def emitir(self, cedula, rol, nombre):
+        emitido = ahora_ms()
+        acceso = {"sub": cedula, "rol": rol, "nombre": nombre, "jti": secrets.token_hex(16), "iat": emitido}
+        refresco = {"sub": cedula, "jti": secrets.token_hex(16), "iat": emitido}
+        return {
+            "token": self._acceso.dumps(acceso),
+            "refreshToken": self._refresco.dumps(refresco),
+            "expiresIn": self.ttl_acceso,
+        }
+
+    def verificar(self, token, refresco=False):
+        serializador, ttl = (self._refresco, self.ttl_refresco) if refresco else (self._acceso, self.ttl_acceso)
+        try:
+            datos = serializador.loads(token, max_age=ttl)
+        except SignatureExpired:
+            raise TokenInvalido("Token expirado")
+        except BadSignature:
+            raise TokenInvalido("Token inválido")
+        with self._lock:
+            desde = self._revocados_desde.get(datos['sub'], -1)
+            if not refresco:
+                desde = max(desde, self._accesos_revocados_desde.get(datos['sub'], -1))
+            if datos['jti'] in self._revocados or datos['iat'] <= desde:
+                raise TokenInvalido("Token revocado")
+        return datos
+
+    def expira_ms(self, datos, refresco=False):
+        return datos['iat'] + (self.ttl_refresco if refresco else self.ttl_acceso) * 1000
+
+    def debe_sincronizar(self):
+        with self._lock:
+            if time.monotonic() < self._proxima_sincronizacion:
+                return False
+            self._proxima_sincronizacion = time.monotonic() + self.intervalo
+            return True
+
+    def cargar_revocaciones(self, version, filas):
+        """`filas` son (jti, cedula, revocado_ms) vigentes de la tabla tokens_revocados."""
+        revocados, desde, accesos_desde = set(), {}, {}
+        for jti, cedula, revocado_ms in filas:
+            if jti.startswith(PREFIJO_USUARIO):
+                desde[cedula] = max(revocado_ms, desde.get(cedula, -1))
+            elif jti.startswith(PREFIJO_ACCESO):
+                accesos_desde[cedula] = max(revocado_ms, accesos_desde.get(cedula, -1))
+            else:
+                revocados.add(jti)
+        with self._lock:
+            self._revocados, self._revocados_desde = revocados, desde
+            self._accesos_revocados_desde = accesos_desde
+            self.version_revocaciones = version
+
+    def revocar(self, jti, cedula, revocado_ms):
+        # Se aplica en este proceso de inmediato; los demás lo ven al sincronizar
+        with self._lock:
+            if jti.startswith(PREFIJO_USUARIO):
+                self._revocados_desde[cedula] = max(revocado_ms, self._revocados_desde.get(cedula, -1))
+            elif jti.startswith(PREFIJO_ACCESO):
+                self._accesos_revocados_desde[cedula] = max(revocado_ms, self._accesos_revocados_desde.get(cedula, -1))
+            else:
+                self._revocados.add(jti)
+
+
+emisor_tokens = EmisorTokens()